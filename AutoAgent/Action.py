@@ -5,3 +5,7 @@ from typing import List, Optional, Dict, Any
 class Action(BaseModel):
     name: str = Field(description="工具或指令名称")
     args: Optional[Dict[str,Any]] = Field(description="工具或指令参数，由参数名称和参数值组成")
+
+
+class ActionList(BaseModel):
+    actions: List[Action] = Field(description="本轮要执行的一组互不依赖、可以同时执行的动作。只有一个动作时也放在列表中")
@@ -0,0 +1,244 @@
+import ast
+import contextlib
+import json
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from langchain.output_parsers import OutputFixingParser, PydanticOutputParser
+from langchain_core.exceptions import OutputParserException
+from pydantic import ValidationError
+
+from AutoAgent.Action import Action, ActionList
+from Utils.LLMCache import cached
+
+# 工具名称和参数的常见别名
+NAME_ALIASES = ("name", "action", "tool", "tool_name", "command")
+ARGS_ALIASES = ("args", "arguments", "parameters", "params", "action_input", "input")
+# {"action": {"name": ..., "args": ...}} 形式包装动作的键
+WRAPPER_KEYS = ("action", "tool")
+
+# 只在json字符串以外替换的中文标点
+_FULLWIDTH_PUNCTUATION = str.maketrans({
+    "，": ",", "：": ":", "［": "[", "］": "]", "【": "[", "】": "]",
+})
+_CHINESE_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+_CODE_FENCE = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def _outside_strings(text: str, transform: Callable[[str], str]) -> str:
+    """ apply transform to the parts of text that are not inside double quoted json strings """
+    parts = []
+    start = 0
+    in_string = False
+    escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                parts.append(text[start:i + 1])
+                start = i + 1
+        elif ch == '"':
+            parts.append(transform(text[start:i]))
+            start = i
+            in_string = True
+    rest = text[start:]
+    parts.append(rest if in_string else transform(rest))
+    return "".join(parts)
+
+
+def _balanced_objects(text: str) -> Iterator[str]:
+    """ top level {...} segments of the text, quotes of both kinds are respected """
+    depth = 0
+    start = None
+    quote = None
+    escape = False
+    for i, ch in enumerate(text):
+        if quote is not None:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == quote:
+                quote = None
+        elif depth > 0 and ch in "\"'":
+            quote = ch
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                yield text[start:i + 1]
+    if depth > 0:
+        # 被截断的对象，补齐缺失的右括号
+        yield text[start:] + "}" * depth
+
+
+def _loads(text: str) -> Any:
+    """ json first, then python literal syntax (single quotes, True/False/None), None if both fail """
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return None
+
+
+# (名称, 对文本的修复) 按代价从低到高依次尝试，修复是累积的
+_REPAIRS: List[Tuple[str, Callable[[str], str]]] = [
+    ("trailing_comma", lambda s: _TRAILING_COMMA.sub(r"\1", s)),
+    ("chinese_punctuation", lambda s: _outside_strings(s, lambda part: part.translate(_FULLWIDTH_PUNCTUATION))),
+    ("chinese_quotes", lambda s: s.translate(_CHINESE_QUOTES)),
+]
+
+
+def repair_json(text: str) -> Iterator[Tuple[str, Any]]:
+    """
+    deterministic fixes for a malformed action. yields (repair name, parsed object) for every object that could be
+    recovered: code fences and prose around the object are removed first, then trailing commas, chinese
+    punctuation and chinese quotes are fixed. python style literals are accepted at every stage.
+    """
+    sources = [("code_fence", block) for block in _CODE_FENCE.findall(text)] + [("extract_object", text)]
+    for source_name, source in sources:
+        for segment in _balanced_objects(source):
+            fixed = segment
+            for name, repair in [(source_name, None)] + _REPAIRS:
+                if repair is not None:
+                    fixed = repair(fixed)
+                obj = _loads(fixed)
+                if obj is not None:
+                    yield name, obj
+                    break
+
+
+def coerce_action(obj: Any, expect_list: bool) -> Any:
+    """ coerce a parsed object to the Action / ActionList schema: aliases, wrapped actions, string args """
+    if isinstance(obj, list):
+        obj = {"actions": obj}
+    if not isinstance(obj, dict):
+        return obj
+    if "actions" in obj and isinstance(obj["actions"], list):
+        actions = [coerce_action(action, False) for action in obj["actions"]]
+        if expect_list:
+            return {"actions": actions}
+        return actions[0] if len(actions) == 1 else obj
+    # {"action": {"name": ..., "args": ...}} 形式的包装
+    if len(obj) == 1:
+        key, inner = next(iter(obj.items()))
+        if key in WRAPPER_KEYS and isinstance(inner, dict) and any(alias in inner for alias in NAME_ALIASES):
+            obj = inner
+
+    action = {}
+    for key in NAME_ALIASES:
+        if isinstance(obj.get(key), str):
+            action["name"] = obj[key].strip()
+            break
+    for key in ARGS_ALIASES:
+        if key in obj:
+            action["args"] = obj[key]
+            break
+    args = action.get("args")
+    if args is None:
+        action["args"] = {}
+    elif isinstance(args, str) and isinstance(_loads(args), dict):
+        action["args"] = _loads(args)
+    if "name" not in action:
+        return obj
+    return {"actions": [action]} if expect_list else action
+
+
+def _as_action_list(parsed) -> List[Action]:
+    if isinstance(parsed, ActionList):
+        return parsed.actions
+    return [parsed]
+
+
+class ActionOutputParser:
+    """
+    parse the llm output of a step into a list of actions.
+
+    the output is parsed directly first, then with deterministic local repairs and schema coercion, and the llm
+    OutputFixingParser (one more llm round trip) is only used when both fail. stats counts how often each path
+    was taken, plus which local repair succeeded.
+    """
+
+    def __init__(self, output_parser: PydanticOutputParser, llm):
+        self.output_parser = output_parser
+        self.expect_list = output_parser.pydantic_object is ActionList
+        # 允许多个动作时，只有一个动作的输出没有放在列表中也是格式正确的输出
+        self._direct_parsers = [output_parser]
+        if self.expect_list:
+            self._direct_parsers.append(PydanticOutputParser(pydantic_object=Action))
+        self.llm = llm
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._fixing_parser = None
+
+    @property
+    def fixing_parser(self) -> OutputFixingParser:
+        """ 用llm修复格式错误的输出，第一次需要修复时才创建（会导入 langchain.chains） """
+        if self._fixing_parser is None:
+            self._fixing_parser = OutputFixingParser.from_llm(parser=self.output_parser, llm=cached(self.llm))
+        return self._fixing_parser
+
+    def _count(self, *keys):
+        with self._stats_lock:
+            for key in keys:
+                self.stats[key] += 1
+
+    def _validate(self, obj) -> Optional[List[Action]]:
+        try:
+            return _as_action_list(self.output_parser.pydantic_object.parse_obj(coerce_action(obj, self.expect_list)))
+        except (ValidationError, TypeError, ValueError):
+            return None
+
+    def try_parse(self, text: str) -> Optional[List[Action]]:
+        """ parse without the llm fixer, None if the text can't be recovered locally """
+        for parser in self._direct_parsers:
+            try:
+                actions = _as_action_list(parser.parse(text))
+                self._count("direct")
+                return actions
+            except (OutputParserException, ValidationError):
+                pass
+        for repair_name, obj in repair_json(text):
+            actions = self._validate(obj)
+            if actions is not None:
+                self._count("local_repair", f"repair:{repair_name}")
+                return actions
+        return None
+
+    def parse(self, text: str) -> List[Action]:
+        actions = self.try_parse(text)
+        if actions is None:
+            with self._llm_fix():
+                actions = _as_action_list(self.fixing_parser.parse(text))
+        return actions
+
+    async def aparse(self, text: str) -> List[Action]:
+        actions = self.try_parse(text)
+        if actions is None:
+            with self._llm_fix():
+                actions = _as_action_list(await self.fixing_parser.aparse(text))
+        return actions
+
+    @contextlib.contextmanager
+    def _llm_fix(self):
+        """ counts whether the llm fixer inside the block succeeded """
+        try:
+            yield
+        except Exception:
+            self._count("failed")
+            raise
+        self._count("llm_fix")
@@ -1,23 +1,76 @@
-﻿from typing import List, Optional
-
-from langchain.memory import ConversationTokenBufferMemory, VectorStoreRetrieverMemory
-from langchain.output_parsers import OutputFixingParser, PydanticOutputParser
+﻿import asyncio
+import contextvars
+import functools
+import threading
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING, AsyncIterator, Callable, Dict, Generator, Iterable, Iterator, List, Optional, Union,
+)
+
+from langchain.output_parsers import PydanticOutputParser
 from langchain_core.language_models import BaseChatModel
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.tools import BaseTool
 from langchain_core.vectorstores import VectorStoreRetriever
 from pydantic import ValidationError
 
-from AutoAgent.Action import Action
-from Utils.PrintUtils import color_print, THOUGHT_COLOR, ROUND_COLOR, OBSERVATION_COLOR
+from AutoAgent.Action import Action, ActionList
+from AutoAgent.ActionOutputParser import ActionOutputParser
+from AutoAgent.Events import (
+    AgentEvent, StepStarted, ThoughtChunk, ActionsChosen, ObservationReceived, FinalChunk, TaskFinished, print_event,
+)
+from AutoAgent.ObservationStore import ObservationStore
+from AutoAgent.StreamingActionParser import StreamingActionParser
+from AutoAgent.ShortTermMemory import ShortTermMemory, get_token_counter
+from Utils.LLMCache import CachedLLM, cached
 from Utils.PromptTemplateBuilder import PromptTemplateBuilder
+from Utils.Tracing import NULL_TRACER, Tracer, new_task_id
+
+if TYPE_CHECKING:
+    from AutoAgent.LongTermMemory import LongTermMemory
 
 
 def _format_short_term_memory(memory):
-    """join the short term memory into a single string. from second message - first is a fake message"""
-    messages = memory.chat_memory.messages
-    string_messages = [messages[i].content for i in range(1, len(messages))]
-    return "\n".join(string_messages)
+    """the short term memory as a single string, kept up to date by the memory itself"""
+    return memory.buffer_as_str
+
+
+def _format_observations(actions, observations):
+    """single action keeps the raw observation, multiple actions are numbered in the order they were given"""
+    if len(actions) == 1:
+        return observations[0]
+    return "\n".join(
+        f"[{i + 1}] {action.name}({action.args}):\n{observation}"
+        for i, (action, observation) in enumerate(zip(actions, observations))
+    )
+
+
+def _tool_not_found(action):
+    return (
+        f"Error:找不到工具或指令{action.name}。"
+        f"请从提供的工具或指令中选择，确保按照格式输出。"
+    )
+
+
+def _tool_error(action, e):
+    if isinstance(e, ValidationError):
+        return f"Validation Error in args:{str(e)}, args:{action.args}"
+    return f"Error:{str(e)},{type(e).__name__}, args:{action.args}"
+
+
+def _answers_task(actions, observations, tools, max_chars) -> bool:
+    """ 最后一轮只调用了一个回答型工具，结果没有出错且足够短，可以直接作为最终回复 """
+    if len(actions) != 1 or actions[0].name not in tools:
+        return False
+    observation = observations[0]
+    return (
+        isinstance(observation, str)
+        and 0 < len(observation.strip()) <= max_chars
+        and not observation.startswith(("Error", "Validation Error"))
+    )
 
 
 def _format_long_term_memory(task_description, memory):
@@ -27,6 +80,25 @@ def _format_long_term_memory(task_description, memory):
     })["history"]
 
 
+@dataclass
+class _TaskState:
+    """ the per task state shared by the sync and the async loop """
+    short_term_memory: ShortTermMemory
+    observation_store: ObservationStore
+    step: int = 0
+    reply: str = ""
+    # 最近一轮执行的动作和未截断的结果，以及执行过的轮数，用于 fast_finish 的判断
+    last_round: Optional[tuple] = None
+    tool_rounds: int = 0
+
+
+@dataclass
+class TaskResult:
+    """ the reply of a task and the number of thought steps it took """
+    reply: str
+    steps: int
+
+
 class AutoGPT:
     """long chain agent"""
 
@@ -39,9 +111,38 @@ class AutoGPT:
             main_prompt_file: str = "main_prompt.json",
             final_prompt_file: str = "final_step.json",
             max_thought_steps: Optional[int] = 10,
-            memory_retriever: Optional[VectorStoreRetriever] = None,
+            memory_retriever: Optional[Union[VectorStoreRetriever, Callable[[], VectorStoreRetriever]]] = None,
+            long_term_memory: Optional[Union["LongTermMemory", Callable[[], "LongTermMemory"]]] = None,
+            max_parallel_actions: int = 1,
+            tool_concurrency: Optional[Dict[str, int]] = None,
+            stream_early_stop: bool = True,
+            observation_budget: Optional[int] = None,
+            observation_budgets: Optional[Dict[str, int]] = None,
+            tracer: Optional[Tracer] = None,
+            fast_finish: bool = False,
+            fast_finish_tools: Iterable[str] = ("AskDocument",),
+            fast_finish_max_chars: int = 500,
     ):
-        """initial the self values, i.e. self.xxx=xxx """
+        """initial the self values, i.e. self.xxx=xxx
+        memory_retriever can be a retriever or a factory that is called on first use, so the vector store is not
+        built at startup
+        long_term_memory is a LongTermMemory or a factory for one, it takes precedence over memory_retriever.
+        either way the task and its reply are saved once, after the task has finished
+        stream_early_stop stops the llm stream as soon as a complete action has been received
+        tool_concurrency limits how many calls of a tool run at the same time, on the thread pool as well as
+        for coroutine tools awaited on the event loop
+        observation_budget is the max number of chars of a tool result kept in short term memory, observation_budgets
+        overrides it per tool name. longer results are written to .cache/observations, outside the work dir, and
+        only their head and tail are kept, add the ReadObservation tool so the agent can page through them. None
+        keeps results unbounded
+        tracer records spans for prompt rendering, llm streaming, parsing, tool calls and the final step, tagged
+        with the task id and step; without one nothing is recorded
+        fast_finish skips the final step when FINISH carries args.answer, or when the task made exactly one round of
+        tool calls, a single call to one of fast_finish_tools whose result is not an error and at most
+        fast_finish_max_chars long; that answer or result is the reply. pass a FINISH tool with the answer arg
+        (Tools.finish_with_answer_placeholder) so the llm knows it can answer there. finish_stats counts how each
+        task was finished
+        """
         self.llm = llm
         self.prompts_path = prompts_path
         self.tools = tools
@@ -50,125 +151,502 @@ class AutoGPT:
         self.final_prompt_file = final_prompt_file
         self.max_thought_steps = max_thought_steps
         self.memory_retriever = memory_retriever
-
-        # PydanticOutputParser ,如果输出格式不正确，则尝试修复
-        self.output_parser = PydanticOutputParser(pydantic_object=Action)
-        self.robust_parser = OutputFixingParser.from_llm(parser=self.output_parser, llm=self.llm)
-
-    def run(self, task_description, verbose=False) -> str:
-        thought_step_count = 0
-
-        # 如果有长时记忆，那么加载长时记忆
-        if self.memory_retriever is not None:
-            long_term_memory = VectorStoreRetrieverMemory(
-                retrievers=self.memory_retriever,
+        self.long_term_memory = long_term_memory
+        self._memory_retriever_lock = threading.Lock()
+        self.max_parallel_actions = max_parallel_actions
+        self.stream_early_stop = stream_early_stop
+        self.observation_budget = observation_budget
+        self.observation_budgets = observation_budgets
+        self.tracer = tracer or NULL_TRACER
+        self._token_counter = get_token_counter(getattr(llm, "model_name", None))
+        self.fast_finish = fast_finish
+        self.fast_finish_tools = frozenset(fast_finish_tools)
+        self.fast_finish_max_chars = fast_finish_max_chars
+        self._finish_stats = Counter()
+        self._finish_stats_lock = threading.Lock()
+
+        # 每个工具允许同时执行的数量，非线程安全的工具应设置为1，未设置的工具不限制
+        self.tool_concurrency = dict(tool_concurrency or {})
+        self._tool_semaphores = {
+            name: threading.BoundedSemaphore(limit)
+            for name, limit in self.tool_concurrency.items()
+        }
+        # 原生异步的工具在事件循环中执行，使用 asyncio 的信号量；信号量绑定事件循环，每个循环一组
+        self._async_tool_semaphores = weakref.WeakKeyDictionary()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        # PydanticOutputParser ,如果输出格式不正确，先在本地修复，仍然失败再交给llm修复
+        # 允许并行动作时，一轮输出一组互不依赖的动作
+        self.output_parser = PydanticOutputParser(
+            pydantic_object=ActionList if max_parallel_actions > 1 else Action
+        )
+        self.action_output_parser = ActionOutputParser(self.output_parser, self.llm)
+
+    @property
+    def parse_stats(self) -> Dict[str, int]:
+        """ how often the step output was parsed directly, repaired locally or fixed by the llm """
+        return dict(self.action_output_parser.stats)
+
+    @property
+    def finish_stats(self) -> Dict[str, int]:
+        """ how often a task ended with the final step, with the answer in FINISH or with the last observation """
+        with self._finish_stats_lock:
+            return dict(self._finish_stats)
+
+    def _get_memory_retriever(self):
+        with self._memory_retriever_lock:
+            if self.memory_retriever is not None and not isinstance(self.memory_retriever, VectorStoreRetriever):
+                self.memory_retriever = self.memory_retriever()
+            return self.memory_retriever
+
+    def _long_term_memory(self):
+        """ 如果有长时记忆，那么加载长时记忆 """
+        with self._memory_retriever_lock:
+            if self.long_term_memory is not None and not hasattr(self.long_term_memory, "load_memory_variables"):
+                self.long_term_memory = self.long_term_memory()
+            if self.long_term_memory is not None:
+                return self.long_term_memory
+        retriever = self._get_memory_retriever()
+        if retriever is not None:
+            # langchain.memory 导入很慢，用到长时记忆时才导入
+            from langchain.memory import VectorStoreRetrieverMemory
+
+            return VectorStoreRetrieverMemory(
+                retriever=retriever,
             )
-        else:
-            long_term_memory = None
+        return None
 
+    def _prepare(self, task_description, work_dir=None):
+        """
+        build the main prompt and a fresh short term memory for one task. the long term memory is filled in by
+        _main_chain, so retrieving it can overlap with this
+        """
         prompt_template = PromptTemplateBuilder(
             self.prompts_path,
             self.main_prompt_file,
+            # 允许并行动作时，约束和计划说明改为一轮可以输出多个互不依赖的动作
+            variant="parallel" if self.max_parallel_actions > 1 else None,
         ).build(
             tools=self.tools,
-            output_parser=self.output_parser,
+            parser=self.output_parser,
         ).partial(
-            work_dir=self.work_dir,
-            task_description=self.task_description,
-            long_term_memory=_format_long_term_memory(task_description, long_term_memory)
-            if long_term_memory is not None else "",
-
+            work_dir=work_dir or self.work_dir,
+            task_description=task_description,
         )
 
-        # 初始化短期记忆
-        short_term_memory = ConversationTokenBufferMemory(
-            llm=self.llm,
+        # 初始化短期记忆，每个任务独立一份
+        short_term_memory = ShortTermMemory(
             max_token_limit=4000,
+            # 本地分词器计数，不需要通过llm；分词器在第一次使用时加载并缓存
+            token_counter=get_token_counter(getattr(self.llm, "model_name", None)),
         )
 
-        short_term_memory.save_context(
-            {"input": "\n初始化"},
-            {"output": "\n开始"}
+        # 超出预算的工具结果写入缓存目录下的文件，任务结束时删除
+        observation_store = ObservationStore(
+            budget=self.observation_budget,
+            budgets=self.observation_budgets,
+        )
+        return prompt_template, short_term_memory, observation_store
+
+    def _main_chain(self, prompt_template, long_term_memory_text):
+        """
+        the prompt and the llm chain are kept apart, so rendering and streaming can be timed separately. the llm is
+        returned as well, so a stream stopped early can cache the accepted action text
+        """
+        prompt_template = prompt_template.partial(long_term_memory=long_term_memory_text)
+        llm = cached(self.llm)
+        return prompt_template, llm, llm | StrOutputParser()
+
+    @staticmethod
+    def _remember(long_term_memory, task_description, reply):
+        """ 任务结束后保存一次长时记忆，支持批量写入的记忆在这里一次写入 """
+        long_term_memory.save_context(
+            {"input": task_description},
+            {"output": reply},
+        )
+        flush = getattr(long_term_memory, "flush", None)
+        if flush is not None:
+            flush()
+
+    def run(self, task_description, verbose=False, work_dir=None) -> str:
+        return self.run_task(task_description, verbose=verbose, work_dir=work_dir).reply
+
+    def run_task(self, task_description, verbose=False, work_dir=None) -> TaskResult:
+        """ run a task, work_dir overrides the agent's work dir for this task only """
+        result = None
+        # TaskFinished 是最后一个事件，消费完整个事件流，生成器在这里正常结束
+        for event in self.stream_events(task_description, work_dir=work_dir):
+            if verbose:
+                print_event(event)
+            if isinstance(event, TaskFinished):
+                result = TaskResult(reply=event.reply, steps=event.steps)
+        return result
+
+    async def arun(self, task_description, verbose=False, work_dir=None) -> str:
+        """
+        asyncio version of run. llm calls use astream/ainvoke, blocking tools run in the default executor,
+        so one event loop can drive many tasks concurrently. every call owns its own memory objects.
+        """
+        reply = None
+        async for event in self.astream_events(task_description, work_dir=work_dir):
+            if verbose:
+                print_event(event)
+            if isinstance(event, TaskFinished):
+                reply = event.reply
+        return reply
+
+    def stream_events(self, task_description, work_dir=None) -> Iterator[AgentEvent]:
+        """
+        run a task and yield its events as they happen: step start, thought chunks, actions, observations,
+        chunks of the final reply and finally TaskFinished. closing the generator cancels the task after the
+        current llm chunk or tool call
+        """
+        token = self.tracer.tag(task_id=new_task_id())
+        try:
+            with self.tracer.span("task") as span:
+                for event in self._events(task_description, work_dir):
+                    if isinstance(event, TaskFinished):
+                        span.set(steps=event.steps)
+                    yield event
+        finally:
+            self.tracer.reset(token)
+
+    async def astream_events(self, task_description, work_dir=None) -> AsyncIterator[AgentEvent]:
+        """ async version of stream_events, cancel it with aclose() or by cancelling the consuming task """
+        token = self.tracer.tag(task_id=new_task_id())
+        try:
+            with self.tracer.span("task") as span:
+                async for event in self._aevents(task_description, work_dir):
+                    if isinstance(event, TaskFinished):
+                        span.set(steps=event.steps)
+                    yield event
+        finally:
+            self.tracer.reset(token)
+
+    def _events(self, task_description, work_dir) -> Iterator[AgentEvent]:
+        # 检索长时记忆（embedding 调用）与构建提示词同时进行
+        long_term_memory = self._long_term_memory()
+        long_term_memory_future = None
+        if long_term_memory is not None:
+            long_term_memory_future = self._get_executor().submit(
+                _format_long_term_memory, task_description, long_term_memory
+            )
+        prompt_template, short_term_memory, observation_store = self._prepare(task_description, work_dir)
+        chain = self._main_chain(
+            prompt_template,
+            long_term_memory_future.result() if long_term_memory_future is not None else "",
         )
+        state = _TaskState(short_term_memory, observation_store)
+
+        try:
+            while state.step < self.max_thought_steps:
+                yield self._start_step(state)
+                actions, response = yield from self._step(chain, short_term_memory, state.step)
+                yield ActionsChosen(step=state.step, actions=actions)
+
+                finish_action, actions = self._split_finish(actions)
+                if actions:
+                    results = self._exec_actions(actions)
+                    yield from self._record_round(state, response, actions, results)
+
+                if finish_action is not None:
+                    state.reply = self._fast_reply(finish_action, state)
+                    if state.reply is not None:
+                        yield FinalChunk(text=state.reply)
+                    else:
+                        state.reply = yield from self._final_step(short_term_memory, task_description)
+                    break
+
+                state.step += 1
+
+            reply = self._final_reply(state)
+            if long_term_memory is not None:
+                self._remember(long_term_memory, task_description, reply)
+        finally:
+            observation_store.close()
 
-        chain = (prompt_template | self.llm | StrOutputParser())
+        yield TaskFinished(reply=reply, steps=state.step)
 
-        reply = ""
+    async def _aevents(self, task_description, work_dir) -> AsyncIterator[AgentEvent]:
+        loop = asyncio.get_running_loop()
 
-        while thought_step_count < self.max_thought_steps:
-            if verbose:
-                color_print(f">>>>round: {thought_step_count}<<<<", ROUND_COLOR)
-            action, response = self._step(
-                chain,
-                short_term_memory=short_term_memory,
-                verbose=verbose,
+        long_term_memory = self._long_term_memory()
+        long_term_memory_future = None
+        if long_term_memory is not None:
+            long_term_memory_future = loop.run_in_executor(
+                None, _format_long_term_memory, task_description, long_term_memory
             )
+        prompt_template, short_term_memory, observation_store = self._prepare(task_description, work_dir)
+        chain = self._main_chain(
+            prompt_template,
+            await long_term_memory_future if long_term_memory_future is not None else "",
+        )
+        state = _TaskState(short_term_memory, observation_store)
+
+        try:
+            while state.step < self.max_thought_steps:
+                yield self._start_step(state)
+                # 异步生成器不能有返回值，解析出的动作放在 outcome 中
+                outcome = []
+                async for event in self._astep(chain, short_term_memory, state.step, outcome):
+                    yield event
+                actions, response = outcome[0]
+                yield ActionsChosen(step=state.step, actions=actions)
+
+                finish_action, actions = self._split_finish(actions)
+                if actions:
+                    results = await self._aexec_actions(actions)
+                    for event in self._record_round(state, response, actions, results):
+                        yield event
+
+                if finish_action is not None:
+                    state.reply = self._fast_reply(finish_action, state)
+                    if state.reply is not None:
+                        yield FinalChunk(text=state.reply)
+                    else:
+                        outcome = []
+                        async for event in self._afinal_step(short_term_memory, task_description, outcome):
+                            yield event
+                        state.reply = outcome[0]
+                    break
+
+                state.step += 1
+
+            reply = self._final_reply(state)
+            if long_term_memory is not None:
+                await loop.run_in_executor(None, self._remember, long_term_memory, task_description, reply)
+        finally:
+            observation_store.close()
+
+        yield TaskFinished(reply=reply, steps=state.step)
+
+    def _start_step(self, state) -> StepStarted:
+        self.tracer.tag(step=state.step)
+        return StepStarted(step=state.step)
+
+    @staticmethod
+    def _split_finish(actions):
+        """ FINISH 与其他动作同时出现时，先执行其他动作并记录结果，再结束任务 """
+        finish_action = next((action for action in actions if action.name == "FINISH"), None)
+        return finish_action, [action for action in actions if action.name != "FINISH"]
+
+    def _record_round(self, state, response, actions, results) -> Iterator[AgentEvent]:
+        """ bound the results of a round of tool calls, yield them as observations and save the round """
+        state.last_round = (actions, results)
+        state.tool_rounds += 1
+        observations = self._bound(state.observation_store, actions, results)
+        for action, observation in zip(actions, observations):
+            yield ObservationReceived(step=state.step, action=action, observation=observation)
+        self._observe(state.short_term_memory, response, _format_observations(actions, observations))
+
+    @staticmethod
+    def _final_reply(state) -> str:
+        return state.reply or "抱歉，我没能完成你的任务"
+
+    def _fast_reply(self, finish_action, state) -> Optional[str]:
+        """
+        the reply without the final step in fast_finish mode, None when the final step is needed. the last
+        observation only answers the task when it came from the task's only round of tool calls, after several
+        rounds the final step has to combine them
+        """
+        reason, reply = "final_step", None
+        if self.fast_finish:
+            answer = (finish_action.args or {}).get("answer")
+            if isinstance(answer, str) and answer.strip():
+                reason, reply = "finish_answer", answer.strip()
+            elif state.tool_rounds == 1 and _answers_task(*state.last_round, self.fast_finish_tools,
+                                                          self.fast_finish_max_chars):
+                reason, reply = "last_observation", state.last_round[1][0].strip()
+        with self._finish_stats_lock:
+            self._finish_stats[reason] += 1
+        self.tracer.count("finish", reason=reason)
+        return reply
+
+    @staticmethod
+    def _bound(observation_store, actions, observations):
+        """ keep every observation within its tool's budget """
+        return [
+            observation_store.bound(action.name, observation)
+            for action, observation in zip(actions, observations)
+        ]
+
+    @staticmethod
+    def _observe(short_term_memory, response, observation):
+        """ save the round into short term memory """
+        short_term_memory.save_context(
+            {"input": response},
+            {"output": "返回结果:\n" + observation}
+        )
 
-            if action.name == "FINISH":
-                if verbose:
-                    color_print(f"\n-----\nfinish", OBSERVATION_COLOR)
-                reply = self._final_step(short_term_memory, task_description)
-                break
+    def _render_prompt(self, prompt_template, short_term_memory):
+        with self.tracer.span("render_prompt"):
+            return prompt_template.invoke({
+                "short_term_memory": _format_short_term_memory(short_term_memory),
+            })
 
-            observation = action._exec_action(action)
+    def _trace_tokens(self, span, prompt_value, completion):
+        """ token 计数需要分词，只在启用 tracer 时计算 """
+        if not self.tracer.enabled:
+            return
+        prompt_tokens = self._token_counter(prompt_value.to_string())
+        completion_tokens = self._token_counter(completion)
+        span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        self.tracer.count("tokens", prompt_tokens, kind="prompt")
+        self.tracer.count("tokens", completion_tokens, kind="completion")
 
-            if verbose:
-                color_print(f"\n-----\n{observation}", OBSERVATION_COLOR)
+    def _step(self, reason_chain, short_term_memory, step) -> Generator[AgentEvent, None, tuple]:
+        """ run a step get a short memory and parse an action, yields the thought chunks and returns the actions """
 
-            short_term_memory.save_context(
-                {"input": response},
-                {"output": "返回结果:\n" + observation}
-            )
+        prompt_template, llm, llm_chain = reason_chain
+        prompt_value = self._render_prompt(prompt_template, short_term_memory)
 
-            thought_step_count += 1
+        response = ""
+        stream_parser = StreamingActionParser()
+        with self.tracer.span("llm") as llm_span:
+            stream = llm_chain.stream(prompt_value)
+            try:
+                for s in stream:
+                    if not response:
+                        llm_span.set(ttft=llm_span.elapsed())
+                    yield ThoughtChunk(step=step, text=s)
+                    response += s
+                    actions = self._early_actions(stream_parser, s)
+                    if actions is not None:
+                        # 动作已经完整，不再等待模型输出剩余的文本，关闭流后立即执行
+                        llm_span.set(early_stop=True)
+                        self._trace_tokens(llm_span, prompt_value, stream_parser.accepted_text)
+                        self._cache_accepted(llm, prompt_value, stream_parser.accepted_text)
+                        return actions, stream_parser.accepted_text
+            finally:
+                stream.close()
+            self._trace_tokens(llm_span, prompt_value, response)
+
+        with self.tracer.span("parse"):
+            return self.action_output_parser.parse(response), response
+
+    async def _astep(self, reason_chain, short_term_memory, step, outcome: list) -> AsyncIterator[AgentEvent]:
+        """ async version of _step, the actions and the response are appended to outcome """
+
+        prompt_template, llm, llm_chain = reason_chain
+        prompt_value = self._render_prompt(prompt_template, short_term_memory)
 
-            if not reply:
-                reply = "抱歉，我没能完成你的任务"
+        response = ""
+        stream_parser = StreamingActionParser()
+        with self.tracer.span("llm") as llm_span:
+            stream = llm_chain.astream(prompt_value)
+            try:
+                async for s in stream:
+                    if not response:
+                        llm_span.set(ttft=llm_span.elapsed())
+                    yield ThoughtChunk(step=step, text=s)
+                    response += s
+                    actions = self._early_actions(stream_parser, s)
+                    if actions is not None:
+                        llm_span.set(early_stop=True)
+                        self._trace_tokens(llm_span, prompt_value, stream_parser.accepted_text)
+                        self._cache_accepted(llm, prompt_value, stream_parser.accepted_text)
+                        outcome.append((actions, stream_parser.accepted_text))
+                        return
+            finally:
+                await stream.aclose()
+            self._trace_tokens(llm_span, prompt_value, response)
+
+        with self.tracer.span("parse"):
+            outcome.append((await self.action_output_parser.aparse(response), response))
+
+    @staticmethod
+    def _cache_accepted(llm, prompt_value, accepted_text):
+        """ 提前停止的流不会被缓存；动作已经完整时，把接受的文本作为这次调用的完整结果缓存 """
+        if isinstance(llm, CachedLLM):
+            llm.store(prompt_value, accepted_text)
+
+    def _early_actions(self, stream_parser, chunk) -> Optional[List[Action]]:
+        """ feed a streamed chunk, return the actions once a valid action object has closed """
+        if not self.stream_early_stop:
+            return None
+        for candidate in stream_parser.feed(chunk):
+            with self.tracer.span("parse", early=True):
+                actions = self.action_output_parser.try_parse(candidate)
+            if actions is not None:
+                return actions
+        return None
 
-            if long_term_memory is not None:
-                long_term_memory.save_context(
-                    {"input": task_description},
-                    {"output": reply},
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_parallel_actions,
+                    thread_name_prefix="autogpt-action",
                 )
+            return self._executor
 
-        return reply
+    def _exec_actions(self, actions: List[Action]) -> List[str]:
+        """并行执行一组互不依赖的动作，返回结果的顺序与动作顺序一致"""
+        if len(actions) == 1:
+            return [self._exec_action(actions[0])]
+        # 每个动作复制一份当前上下文，工具线程中的 trace 片段带有同样的任务和步骤标签
+        executor = self._get_executor()
+        futures = [executor.submit(contextvars.copy_context().run, self._exec_action, action) for action in actions]
+        return [future.result() for future in futures]
 
-    def _step(self, reason_chain, short_term_memory, verbose):
-        """ run a step get a short memory and parse an action """
+    async def _aexec_actions(self, actions: List[Action]) -> List[str]:
+        """async version of _exec_actions, at most max_parallel_actions run at the same time"""
+        semaphore = asyncio.Semaphore(self.max_parallel_actions)
 
-        response = ""
+        async def exec_one(action):
+            async with semaphore:
+                return await self._aexec_action(action)
 
-        for s in reason_chain.stream({
-            "short_term_memory": _format_short_term_memory(short_term_memory),
-        }):
-            if verbose:
-                color_print(s, THOUGHT_COLOR, end="")
-            response += s
-
-        action = self.robust_parser.parse(response)
-        return action, response
+        return list(await asyncio.gather(*(exec_one(action) for action in actions)))
 
     def _exec_action(self, action):
         """查找工具，执行工具，并处理异常"""
 
+        with self.tracer.span("tool", tool=action.name) as span:
+            tool = self._find_tool(action.name)
+            if tool is None:
+                span.set(error="ToolNotFound")
+                return _tool_not_found(action)
+            try:
+                semaphore = self._tool_semaphores.get(tool.name)
+                if semaphore is None:
+                    return tool.run(action.args)
+                with semaphore:
+                    return tool.run(action.args)
+            except Exception as e:
+                span.set(error=type(e).__name__)
+                return _tool_error(action, e)
+
+    async def _aexec_action(self, action):
+        """原生异步的工具直接await，阻塞的工具（pandas、PDF解析、PythonREPL）放到线程池中执行"""
+
         tool = self._find_tool(action.name)
-        if tool is None:
-            observation = (
-                f"Error:找不到工具或指令{action.name}。"
-                f"请从提供的工具或指令中选择，确保按照格式输出。"
+        if tool is None or getattr(tool, "coroutine", None) is None:
+            # run_in_executor 不会传递 contextvars，手动复制当前上下文
+            return await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(contextvars.copy_context().run, self._exec_action, action)
             )
-        else:
+        with self.tracer.span("tool", tool=action.name) as span:
             try:
-                observation = tool.run(action.args)
-            except ValidationError as e:
-                observation = (
-                    f"Validation Error in args:{str(e)}, args:{action.args}"
-                )
+                semaphore = self._async_tool_semaphore(tool.name)
+                if semaphore is None:
+                    return await tool.arun(action.args)
+                async with semaphore:
+                    return await tool.arun(action.args)
             except Exception as e:
-                observation = (
-                    f"Error:{str(e)},{type(e).__name__}, args:{action.args}"
-                )
-        return observation
+                span.set(error=type(e).__name__)
+                return _tool_error(action, e)
+
+    def _async_tool_semaphore(self, name) -> Optional[asyncio.Semaphore]:
+        """ tool_concurrency 限制原生异步工具在当前事件循环中的并发数 """
+        limit = self.tool_concurrency.get(name)
+        if limit is None:
+            return None
+        semaphores = self._async_tool_semaphores.setdefault(asyncio.get_running_loop(), {})
+        if name not in semaphores:
+            semaphores[name] = asyncio.Semaphore(limit)
+        return semaphores[name]
 
     def _find_tool(self, name):
         """ find tool from tools by name """
@@ -177,8 +655,8 @@ class AutoGPT:
                 return tool
         return None
 
-    def _final_step(self, short_term_memory, task_description):
-        """生成最终提示词模板，然后组成 long chain expression language 并执行，最后返回结果"""
+    def _final_chain(self, short_term_memory, task_description):
+        """生成最终提示词模板，然后组成 long chain expression language"""
         final_prompt = PromptTemplateBuilder(
             self.prompts_path,
             self.final_prompt_file,
@@ -186,6 +664,36 @@ class AutoGPT:
             task_description=task_description,
             short_term_memory=_format_short_term_memory(short_term_memory),
         )
-        chain = (final_prompt | self.llm | StrOutputParser())
-        response = chain.invoke({})
-        return response
+        return final_prompt | cached(self.llm) | StrOutputParser()
+
+    def _final_step(self, short_term_memory, task_description) -> Generator[AgentEvent, None, str]:
+        """流式执行最终的 chain，逐块产生回复并返回完整的结果"""
+        reply = ""
+        with self.tracer.span("final_step") as span:
+            chain = self._final_chain(short_term_memory, task_description)
+            stream = chain.stream({})
+            try:
+                for s in stream:
+                    if not reply:
+                        span.set(ttft=span.elapsed())
+                    reply += s
+                    yield FinalChunk(text=s)
+            finally:
+                stream.close()
+        return reply
+
+    async def _afinal_step(self, short_term_memory, task_description, outcome: list) -> AsyncIterator[AgentEvent]:
+        """async version of _final_step, the reply is appended to outcome"""
+        reply = ""
+        with self.tracer.span("final_step") as span:
+            chain = self._final_chain(short_term_memory, task_description)
+            stream = chain.astream({})
+            try:
+                async for s in stream:
+                    if not reply:
+                        span.set(ttft=span.elapsed())
+                    reply += s
+                    yield FinalChunk(text=s)
+            finally:
+                await stream.aclose()
+        outcome.append(reply)
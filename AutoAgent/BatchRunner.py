@@ -0,0 +1,170 @@
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+from AutoAgent.AutoGPT import AutoGPT
+
+# 任务工作目录的根目录。目录名只由任务 id 决定，提示词中的 work_dir 在每次运行中相同，llm 缓存可以命中
+DEFAULT_WORK_ROOT = os.path.join(".cache", "batch_tasks")
+
+_UNSAFE_CHARS = re.compile(r"[^\w.-]")
+
+# 每个工作进程只构建一次智能体，之后的任务复用它
+_worker_agent: Optional[AutoGPT] = None
+
+
+def load_tasks(tasks_file: str) -> List[dict]:
+    """
+    读取任务文件。.jsonl 文件每行一个对象，包含 task 字段，可选 id 字段；
+    其他文件每个非空行是一个任务。任务 id 决定任务的工作目录，不能重复。
+    """
+    tasks = []
+    with open(tasks_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if tasks_file.endswith(".jsonl"):
+                record = json.loads(line)
+            else:
+                record = {"task": line}
+            record.setdefault("id", len(tasks))
+            tasks.append(record)
+    ids = [str(record["id"]) for record in tasks]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"duplicate task ids in {tasks_file}")
+    return tasks
+
+
+def _init_worker(agent_factory: Callable[[], AutoGPT]):
+    global _worker_agent
+    _worker_agent = agent_factory()
+
+
+def _isolated_work_dir(base_dir: str, work_root: str, task_id) -> str:
+    """
+    为任务创建独立的工作目录 work_root/task-<id>，目录中以符号链接引用原工作目录的内容，任务新写的文件互不干扰。
+    上次运行中断时留下的同名目录先删除
+    """
+    work_dir = os.path.abspath(os.path.join(work_root, f"task-{_UNSAFE_CHARS.sub('_', str(task_id))}"))
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    for name in os.listdir(base_dir):
+        source = os.path.abspath(os.path.join(base_dir, name))
+        target = os.path.join(work_dir, name)
+        try:
+            os.symlink(source, target)
+        except OSError:
+            if os.path.isdir(source):
+                shutil.copytree(source, target)
+            else:
+                shutil.copy2(source, target)
+    return work_dir
+
+
+def _release_work_dir(work_dir: str):
+    """删除任务的工作目录，以及进程内以这个目录为键的状态，长时间运行的工作进程不会累积"""
+    shutil.rmtree(work_dir, ignore_errors=True)
+    # 只有用到过目录检索的进程才有这个模块
+    corpus_index = sys.modules.get("Tools.CorpusIndex")
+    if corpus_index is not None:
+        corpus_index.drop_corpus_index(work_dir)
+
+
+def _run_task(record: dict, work_root: str) -> dict:
+    """在工作进程中执行一个任务"""
+    start = time.perf_counter()
+    result = {"type": "result", "id": record["id"], "task": record["task"], "pid": os.getpid()}
+    work_dir = None
+    try:
+        work_dir = _isolated_work_dir(_worker_agent.work_dir, work_root, record["id"])
+        task_result = _worker_agent.run_task(record["task"], work_dir=work_dir)
+        result.update(reply=task_result.reply, steps=task_result.steps, error=None)
+    except Exception as e:
+        result.update(reply=None, steps=None, error=f"{type(e).__name__}: {e}")
+    finally:
+        if work_dir is not None:
+            _release_work_dir(work_dir)
+    result["latency"] = time.perf_counter() - start
+    return result
+
+
+def _error_result(record: dict, error: BaseException) -> dict:
+    """工作进程没有返回结果（初始化失败、进程崩溃）时的记录"""
+    return {
+        "type": "result", "id": record["id"], "task": record["task"], "pid": None,
+        "reply": None, "steps": None, "error": f"{type(error).__name__}: {error}", "latency": None,
+    }
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class BatchRunner:
+    """
+    用进程池批量执行任务。
+
+    每个工作进程通过 agent_factory 构建一次 AutoGPT 并复用，每个任务使用独立的短期记忆和工作目录
+    work_root/task-<id>，任务结束后删除。结果按完成顺序逐行写入 JSONL 文件，最后一行是吞吐量统计；
+    单个任务或工作进程的失败记为该任务的错误，不影响其他任务和统计。
+    agent_factory 需要能被 pickle，例如模块级函数或 functools.partial。
+    """
+
+    def __init__(self, agent_factory: Callable[[], AutoGPT], workers: int = 4, work_root: str = DEFAULT_WORK_ROOT):
+        self.agent_factory = agent_factory
+        self.workers = workers
+        self.work_root = work_root
+
+    def run(self, tasks_file: str, output_file: str) -> dict:
+        tasks = load_tasks(tasks_file)
+        latencies = []
+        steps = []
+        failed = 0
+        start = time.perf_counter()
+
+        with open(output_file, "w", encoding="utf-8") as out, ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.agent_factory,),
+        ) as pool:
+            futures = {pool.submit(_run_task, record, self.work_root): record for record in tasks}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 例如工作进程初始化失败或崩溃时的 BrokenProcessPool
+                    result = _error_result(futures[future], e)
+                if result["error"] is None:
+                    latencies.append(result["latency"])
+                    steps.append(result["steps"])
+                else:
+                    failed += 1
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+
+            elapsed = time.perf_counter() - start
+            summary = {
+                "type": "summary",
+                "tasks": len(tasks),
+                "succeeded": len(tasks) - failed,
+                "failed": failed,
+                "workers": self.workers,
+                "elapsed": elapsed,
+                "throughput": len(tasks) / elapsed if elapsed > 0 else None,
+                "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+                "latency_p50": _percentile(latencies, 0.5),
+                "latency_p95": _percentile(latencies, 0.95),
+                "steps_mean": sum(steps) / len(steps) if steps else None,
+            }
+            out.write(json.dumps(summary, ensure_ascii=False) + "\n")
+
+        return summary
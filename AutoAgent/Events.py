@@ -0,0 +1,78 @@
+from dataclasses import asdict, dataclass, field
+from typing import ClassVar, List
+
+from AutoAgent.Action import Action
+from Utils.PrintUtils import color_print, THOUGHT_COLOR, ROUND_COLOR, OBSERVATION_COLOR
+
+
+@dataclass
+class AgentEvent:
+    """ AutoGPT.stream_events 产生的事件，type 用于序列化后区分事件类型 """
+    type: ClassVar[str] = "event"
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["type"] = self.type
+        return data
+
+
+@dataclass
+class StepStarted(AgentEvent):
+    type: ClassVar[str] = "step_start"
+    step: int
+
+
+@dataclass
+class ThoughtChunk(AgentEvent):
+    """ 模型输出的思考过程（包括动作 json）的一个流式分块 """
+    type: ClassVar[str] = "thought"
+    step: int
+    text: str
+
+
+@dataclass
+class ActionsChosen(AgentEvent):
+    """ 这一步解析出的动作，包括 FINISH """
+    type: ClassVar[str] = "action"
+    step: int
+    actions: List[Action] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {"type": self.type, "step": self.step, "actions": [action.dict() for action in self.actions]}
+
+
+@dataclass
+class ObservationReceived(AgentEvent):
+    type: ClassVar[str] = "observation"
+    step: int
+    action: Action
+    observation: str
+
+    def to_dict(self) -> dict:
+        return {"type": self.type, "step": self.step, "action": self.action.dict(), "observation": self.observation}
+
+
+@dataclass
+class FinalChunk(AgentEvent):
+    """ 最终回复的一个流式分块 """
+    type: ClassVar[str] = "final_chunk"
+    text: str
+
+
+@dataclass
+class TaskFinished(AgentEvent):
+    type: ClassVar[str] = "finished"
+    reply: str
+    steps: int
+
+
+def print_event(event: AgentEvent):
+    """ verbose 模式下的彩色输出，最终回复由调用方输出 """
+    if isinstance(event, StepStarted):
+        color_print(f">>>>round: {event.step}<<<<", ROUND_COLOR)
+    elif isinstance(event, ThoughtChunk):
+        color_print(event.text, THOUGHT_COLOR, end="")
+    elif isinstance(event, ObservationReceived):
+        color_print(f"\n-----\n{event.observation}", OBSERVATION_COLOR)
+    elif isinstance(event, ActionsChosen) and any(action.name == "FINISH" for action in event.actions):
+        color_print("\n-----\nfinish", OBSERVATION_COLOR)
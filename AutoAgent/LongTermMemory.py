@@ -0,0 +1,221 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 上没有 fcntl，只保证同一进程内的一致性
+    fcntl = None
+
+DEFAULT_PATH = os.path.join(".cache", "long_term_memory")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    离线的本地 embedding：字符一元和二元组哈希到固定维度后归一化。
+    不需要网络和模型文件，用于测试和没有 embedding 服务的环境，检索效果只相当于字面相似度。
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        grams = list(text) + [text[i:i + 2] for i in range(len(text) - 1)]
+        for gram in grams:
+            digest = hashlib.md5(gram.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += 1.0 if digest[4] & 1 else -1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def _pair_hash(input_text: str, output_text: str) -> str:
+    return hashlib.sha256(json.dumps([input_text, output_text], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class LongTermMemory:
+    """
+    保存在本地磁盘上的长时记忆。
+
+    每条记忆是一次任务的输入和输出。向量以 float32 追加写入 vectors.f32，记忆内容逐行追加到 records.jsonl，
+    检索时对归一化的向量做暴力的余弦相似度计算（flat index），几万条以内不需要近似索引。
+    save_context 只把记忆放进缓冲区，flush() 时一次批量计算 embedding 并写入磁盘；相同的输入输出只保存一次。
+    接口与 VectorStoreRetrieverMemory 的 load_memory_variables / save_context 一致。
+    """
+
+    def __init__(self, embedding: Embeddings, path: str = DEFAULT_PATH, k: int = 1,
+                 memory_key: str = "history", input_key: str = "input", output_key: str = "output"):
+        self.embedding = embedding
+        self.path = path
+        self.k = k
+        self.memory_key = memory_key
+        self.input_key = input_key
+        self.output_key = output_key
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._records_path = os.path.join(path, "records.jsonl")
+        self._meta_path = os.path.join(path, "meta.json")
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._dim = None
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._records: List[Dict[str, str]] = []
+        self._hashes = set()
+        self._pending: List[Dict[str, str]] = []
+        # 正在计算 embedding 的记忆的 hash，这期间相同的记忆不再放入缓冲区
+        self._flushing = set()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """批量执行时多个进程共用同一个目录，加载和追加写入都持有文件锁，保证两个文件对齐"""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        """第一次读写时加载，记录数和向量数不一致（写入中断）时以较少的为准"""
+        if self._loaded:
+            return
+        with self._file_lock():
+            self._read()
+        self._loaded = True
+
+    def _read(self):
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self._dim = json.load(f)["dim"]
+            records = []
+            if os.path.exists(self._records_path):
+                with open(self._records_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            # 写了一半的最后一行
+                            break
+            vectors = np.zeros(0, dtype=np.float32)
+            if os.path.exists(self._vectors_path):
+                vectors = np.fromfile(self._vectors_path, dtype=np.float32)
+            rows = min(len(records), len(vectors) // self._dim)
+            if rows != len(records) or rows * self._dim != len(vectors):
+                self._truncate(records[:rows])
+            self._vectors = vectors[:rows * self._dim].reshape(rows, self._dim)
+            self._records = records[:rows]
+            self._hashes = {record["hash"] for record in self._records}
+
+    def _truncate(self, records):
+        """丢弃中断的写入留下的多余部分，使两个文件重新对齐"""
+        if os.path.exists(self._vectors_path):
+            os.truncate(self._vectors_path, len(records) * self._dim * np.dtype(np.float32).itemsize)
+        with open(self._records_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def search(self, query: str, k: Optional[int] = None) -> List[Dict[str, str]]:
+        """与 query 最相似的 k 条记忆，按相似度从高到低"""
+        k = k or self.k
+        with self._lock:
+            self._load()
+            if not self._records:
+                return []
+            vectors, records = self._vectors, self._records
+        query_vector = self._normalize(np.asarray([self.embedding.embed_query(query)], dtype=np.float32))[0]
+        scores = vectors @ query_vector
+        k = min(k, len(records))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [records[i] for i in top[np.argsort(-scores[top])]]
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        query = inputs.get("prompt") or next(iter(inputs.values()), "")
+        records = self.search(str(query))
+        text = "\n".join(
+            f"{self.input_key}: {record['input']}\n{self.output_key}: {record['output']}" for record in records
+        )
+        return {self.memory_key: text}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]):
+        """放入缓冲区，flush() 时写入"""
+        input_text = str(inputs.get(self.input_key, ""))
+        output_text = str(outputs.get(self.output_key, ""))
+        record_hash = _pair_hash(input_text, output_text)
+        with self._lock:
+            self._load()
+            if record_hash in self._hashes or record_hash in self._flushing \
+                    or any(r["hash"] == record_hash for r in self._pending):
+                return
+            self._pending.append({"input": input_text, "output": output_text, "hash": record_hash})
+
+    def flush(self):
+        """
+        批量计算缓冲区中记忆的 embedding，追加到磁盘和内存中的索引。
+        embedding 可能是网络请求，在锁外计算，期间 search 不受影响；计算失败时记忆放回缓冲区
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            pending = self._pending
+            self._pending = []
+            self._flushing.update(r["hash"] for r in pending)
+        texts = [f"{self.input_key}: {r['input']}\n{self.output_key}: {r['output']}" for r in pending]
+        try:
+            vectors = self._normalize(np.asarray(self.embedding.embed_documents(texts), dtype=np.float32))
+        except BaseException:
+            with self._lock:
+                self._pending = pending + self._pending
+                self._flushing.difference_update(r["hash"] for r in pending)
+            raise
+
+        with self._lock:
+            self._flushing.difference_update(r["hash"] for r in pending)
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                self._vectors = np.zeros((0, self._dim), dtype=np.float32)
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(
+                    f"embedding dimension {vectors.shape[1]} does not match the stored index ({self._dim}), "
+                    f"use another path for a different embedding model"
+                )
+
+            with self._file_lock():
+                if not os.path.exists(self._meta_path):
+                    with open(self._meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"dim": self._dim}, f)
+                # 先写向量再写记录，中断时多出的向量在加载时被丢弃
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors.tobytes())
+                with open(self._records_path, "a", encoding="utf-8") as f:
+                    for record in pending:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            self._vectors = np.vstack([self._vectors, vectors])
+            self._records = self._records + pending
+            self._hashes.update(record["hash"] for record in pending)
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._records) + len(self._pending)
@@ -0,0 +1,87 @@
+import os
+import re
+import uuid
+from typing import Dict, Optional
+
+# 截断的工具结果保存在缓存目录中，不写入用户的工作目录
+SPILL_DIR = os.path.join(".cache", "observations")
+PAGE_SIZE = 2000
+READ_TOOL_NAME = "ReadObservation"
+
+_HANDLE_PATTERN = re.compile(r"^[\w\-]+\.txt$")
+
+
+def _cut_head(text: str, size: int) -> str:
+    """ first size chars, cut at the last line break if there is one in the second half """
+    head = text[:size]
+    cut = head.rfind("\n")
+    return head[:cut] if cut > size // 2 else head
+
+
+def _cut_tail(text: str, size: int) -> str:
+    tail = text[-size:]
+    cut = tail.find("\n")
+    return tail[cut + 1:] if 0 <= cut < size // 2 else tail
+
+
+class ObservationStore:
+    """
+    keep tool observations within a budget of chars in the prompt.
+
+    an observation over its tool's budget is written in full to a spill file under SPILL_DIR, the prompt gets its
+    head and tail plus the file as a handle that the agent can page through with the ReadObservation tool. one
+    store per task, close() removes the task's spill files.
+    """
+
+    def __init__(self, budget: Optional[int] = 2000, budgets: Optional[Dict[str, int]] = None):
+        self.budget = budget
+        self.budgets = budgets or {}
+        self.task_id = uuid.uuid4().hex[:8]
+        self._files = []
+
+    def bound(self, tool_name: str, observation):
+        budget = self.budgets.get(tool_name, self.budget)
+        if budget is None or tool_name == READ_TOOL_NAME or len(str(observation)) <= budget:
+            return observation
+        observation = str(observation)
+
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        handle = os.path.join(SPILL_DIR, f"{tool_name}-{self.task_id}-{len(self._files)}.txt")
+        with open(handle, "w", encoding="utf-8") as f:
+            f.write(observation)
+        self._files.append(handle)
+
+        head = _cut_head(observation, budget * 2 // 3)
+        tail = _cut_tail(observation, budget // 3)
+        omitted = len(observation) - len(head) - len(tail)
+        pages = (len(observation) + PAGE_SIZE - 1) // PAGE_SIZE
+        return (
+            f"{head}\n"
+            f"...（省略 {omitted} 个字符。完整结果共 {len(observation)} 个字符，已保存到 {handle}，"
+            f"共 {pages} 页，可以用 {READ_TOOL_NAME} 工具按页查看）...\n"
+            f"{tail}"
+        )
+
+    def close(self):
+        for handle in self._files:
+            try:
+                os.remove(handle)
+            except OSError:
+                pass
+        self._files.clear()
+
+
+def read_observation(handle: str, page: int = 1) -> str:
+    """按页读取被截断的工具结果"""
+    path = os.path.realpath(handle)
+    if os.path.dirname(path) != os.path.realpath(SPILL_DIR) or not _HANDLE_PATTERN.match(os.path.basename(path)):
+        return f"Error: {handle} 不是有效的结果句柄"
+    if not os.path.exists(path):
+        return f"Error: 结果 {handle} 不存在或已过期"
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    pages = max(1, (len(text) + PAGE_SIZE - 1) // PAGE_SIZE)
+    if page < 1 or page > pages:
+        return f"Error: 页码 {page} 超出范围，共 {pages} 页"
+    content = text[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+    return f"第 {page}/{pages} 页：\n{content}"
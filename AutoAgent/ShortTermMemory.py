@@ -0,0 +1,102 @@
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name: Optional[str]):
+    """ local tiktoken encoding for the model, None if tiktoken is not installed or the encoding can't be loaded """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        if model_name is not None:
+            try:
+                return tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # 首次使用时 tiktoken 需要下载词表，离线环境下退回到估算
+        return None
+
+
+def _estimate_tokens(text: str) -> int:
+    """ rough count without a tokenizer: one token per CJK char, four chars per token otherwise """
+    cjk = sum(1 for ch in text if ord(ch) > 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def get_token_counter(model_name: Optional[str] = None) -> Callable[[str], int]:
+    """ count tokens locally, no llm call needed """
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return _estimate_tokens
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+class ShortTermMemory:
+    """
+    token budgeted short term memory, a drop in for ConversationTokenBufferMemory in the agent loop.
+
+    every turn (the llm response and its observation) is counted once when it is saved. the turns are kept as a
+    list of parts, evicting the oldest turn only moves a start offset, and the rendered string is joined once
+    after each change, so neither saving nor formatting gets slower as the task runs more steps.
+    """
+
+    def __init__(
+            self,
+            max_token_limit: int = 4000,
+            token_counter: Optional[Callable[[str], int]] = None,
+    ):
+        self.max_token_limit = max_token_limit
+        self.token_counter = token_counter or get_token_counter()
+        # (turn 的文本, token 数)，_start 之前的是已经淘汰的 turn
+        self._turns: List[Tuple[str, int]] = []
+        self._start = 0
+        self._total_tokens = 0
+        self._rendered: Optional[str] = ""
+
+    @property
+    def total_tokens(self) -> int:
+        return self._total_tokens
+
+    def __len__(self):
+        return len(self._turns) - self._start
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        """ same signature as langchain memories: the first value of each dict is used """
+        self.add_turn(str(next(iter(inputs.values()))), str(next(iter(outputs.values()))))
+
+    def add_turn(self, input_text: str, output_text: str) -> None:
+        text = f"{input_text}\n{output_text}"
+        tokens = self.token_counter(text)
+        self._turns.append((text, tokens))
+        self._total_tokens += tokens
+        self._rendered = None
+        self._prune()
+
+    def _prune(self):
+        """ evict the oldest turns until the buffer is under budget, the latest turn is always kept """
+        while self._total_tokens > self.max_token_limit and len(self) > 1:
+            self._total_tokens -= self._turns[self._start][1]
+            self._start += 1
+        # 已淘汰的 turn 超过一半时删除它们，均摊 O(1)
+        if self._start > len(self._turns) // 2:
+            del self._turns[:self._start]
+            self._start = 0
+
+    @property
+    def buffer_as_str(self) -> str:
+        if self._rendered is None:
+            self._rendered = "\n".join(text for text, _ in self._turns[self._start:])
+        return self._rendered
+
+    def load_memory_variables(self, inputs: Dict[str, Any] = None) -> Dict[str, str]:
+        return {"history": self.buffer_as_str}
+
+    def clear(self) -> None:
+        self._turns.clear()
+        self._start = 0
+        self._total_tokens = 0
+        self._rendered = ""
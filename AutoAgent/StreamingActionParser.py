@@ -0,0 +1,73 @@
+import json
+from typing import List, Optional
+
+# 顶层对象包含这些键之一时才被认为是动作：单个 Action 或 ActionList
+ACTION_KEYS = ("name", "actions")
+
+
+class StreamingActionParser:
+    """
+    incremental scanner over the streamed llm output.
+
+    feed() consumes chunks as they arrive and returns the json text of every top level object that closes in
+    them and looks like an action, so the caller can validate it and stop the stream without waiting for the
+    model to finish any trailing text. braces inside json strings are ignored, objects that are not valid json
+    (for example braces in the thought text) are skipped.
+    """
+
+    def __init__(self, keys=ACTION_KEYS):
+        self.keys = keys
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = None
+        self._in_string = False
+        self._escape = False
+        self.end = None
+
+    def feed(self, chunk: str) -> List[str]:
+        """ append a chunk, return the candidate action objects that were completed by it """
+        self.text += chunk
+        candidates = []
+        while self._pos < len(self.text):
+            ch = self.text[self._pos]
+            self._pos += 1
+            if self._depth == 0:
+                if ch == "{":
+                    self._start = self._pos - 1
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = self._check(self.text[self._start:self._pos])
+                    if candidate is not None:
+                        candidates.append(candidate)
+        return candidates
+
+    def _check(self, candidate: str) -> Optional[str]:
+        try:
+            obj = json.loads(candidate)
+        except ValueError:
+            return None
+        if isinstance(obj, dict) and any(key in obj for key in self.keys):
+            self.end = self._pos
+            return candidate
+        return None
+
+    @property
+    def accepted_text(self) -> str:
+        """ the text received up to the end of the last candidate """
+        return self.text[:self.end]
@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import contextlib
+import inspect
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field, replace
+from typing import Dict, List
+
+from langchain_core.tools import StructuredTool
+
+from AutoAgent.AutoGPT import AutoGPT, TaskResult
+from AutoAgent.Events import TaskFinished, print_event
+from Benchmarks.ScriptedChatModel import ScriptedChatModel
+from Tools import finish_placeholder
+
+PROMPTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts", "main")
+
+# 每一步模型输出的思考过程，动作 json 紧跟在后面
+THOUGHT = "关键概念: 基准测试\n概念拆解: 无\n反思: 无\n思考: 调用工具获取数据\n推理: 无\n计划: 继续执行\n"
+
+
+@dataclass(frozen=True)
+class BenchmarkConfig:
+    steps: int = 5
+    observation_chars: int = 1000
+    tools: int = 7
+    sessions: int = 1
+    tokens_per_second: float = 0.0
+    verbose: bool = False
+
+
+@dataclass
+class BenchmarkResult:
+    config: BenchmarkConfig
+    wall_seconds: float
+    model_seconds: float
+    overhead_seconds: float
+    overhead_ms_per_step: float
+    steps: int
+    stages: Dict[str, float] = field(default_factory=dict)
+    max_prompt_chars: int = 0
+    peak_memory_bytes: int = 0
+
+
+def _make_tools(count: int, observation_chars: int) -> List[StructuredTool]:
+    """count 个立即返回的工具，结果长度固定为 observation_chars"""
+    observation = ("0123456789" * (observation_chars // 10 + 1))[:observation_chars]
+
+    def run(query: str = "") -> str:
+        return observation
+
+    def make(i):
+        # from_function 会在描述前加上 BenchTool{i}(query: str = '') -> str 形式的签名
+        return StructuredTool.from_function(
+            func=run,
+            name=f"BenchTool{i}",
+            description=f"基准测试用的第{i}个工具，返回固定长度的文本",
+        )
+
+    return [make(i) for i in range(count)]
+
+
+def _script(config: BenchmarkConfig) -> List[str]:
+    """steps 轮工具调用，然后 FINISH 和最终回复"""
+    responses = [
+        THOUGHT + json.dumps({"name": f"BenchTool{step % config.tools}", "args": {"query": f"step {step}"}})
+        for step in range(config.steps)
+    ]
+    responses.append(THOUGHT + json.dumps({"name": "FINISH", "args": {}}))
+    responses.append("基准测试完成")
+    return responses
+
+
+class _StageTimer:
+    """包装 agent 实例上的方法，累计各阶段的耗时"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    def wrap(self, obj, method: str, stage: str, parent: str = None):
+        """parent 是调用这个方法的阶段，方法的耗时从 parent 中扣除，两个阶段互不重叠"""
+        func = getattr(obj, method)
+        # 事件流的各阶段是生成器，耗时只累计生成器内部的执行时间，不包括消费者处理事件的时间
+        if inspect.isgeneratorfunction(func):
+            def timed(*args, **kwargs):
+                generator = func(*args, **kwargs)
+                value = None
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        event = generator.send(value)
+                    except StopIteration as stop:
+                        return stop.value
+                    finally:
+                        self.seconds[stage] += time.perf_counter() - start
+                    value = yield event
+        elif inspect.isasyncgenfunction(func):
+            async def timed(*args, **kwargs):
+                generator = func(*args, **kwargs)
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        event = await generator.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        self.seconds[stage] += time.perf_counter() - start
+                    yield event
+        elif asyncio.iscoroutinefunction(func):
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.seconds[stage] += time.perf_counter() - start
+        else:
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    self.seconds[stage] += elapsed
+                    if parent is not None:
+                        self.seconds[parent] -= elapsed
+        setattr(obj, method, timed)
+
+
+def _build_session(config: BenchmarkConfig, work_dir: str, timer: _StageTimer):
+    llm = ScriptedChatModel(responses=_script(config), tokens_per_second=config.tokens_per_second)
+    agent = AutoGPT(
+        llm=llm,
+        prompts_path=PROMPTS_PATH,
+        tools=_make_tools(config.tools, config.observation_chars) + [finish_placeholder],
+        work_dir=work_dir,
+        main_prompt_file="main.json",
+        final_prompt_file="final_step.json",
+        max_thought_steps=config.steps + 1,
+    )
+    for method, stage in [
+        ("_prepare", "prepare"),
+        ("_main_chain", "prepare"),
+        ("_step", "step"),
+        ("_astep", "step"),
+        ("_exec_actions", "tools"),
+        ("_aexec_actions", "tools"),
+        ("_observe", "observe"),
+        ("_final_step", "final_step"),
+        ("_afinal_step", "final_step"),
+    ]:
+        timer.wrap(agent, method, stage)
+    # 提示词渲染在 _step / _astep 中同步执行，单独计时
+    timer.wrap(agent, "_render_prompt", "render_prompt", parent="step")
+    # parse / aparse 内部先调用 try_parse，只包装 try_parse 以免重复计时
+    timer.wrap(agent.action_output_parser, "try_parse", "parse")
+    return agent, llm
+
+
+async def _arun_task(agent: AutoGPT, task_description: str, verbose: bool) -> TaskResult:
+    """与 arun 相同，但和 run_task 一样返回回复和实际的步数"""
+    result = None
+    async for event in agent.astream_events(task_description):
+        if verbose:
+            print_event(event)
+        if isinstance(event, TaskFinished):
+            result = TaskResult(reply=event.reply, steps=event.steps)
+    return result
+
+
+def _run_once(config: BenchmarkConfig, work_dir: str):
+    timer = _StageTimer()
+    sessions = [_build_session(config, work_dir, timer) for _ in range(config.sessions)]
+    output = io.StringIO() if config.verbose else None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output) if output is not None else contextlib.nullcontext():
+        if config.sessions == 1:
+            agent, _ = sessions[0]
+            steps = agent.run_task("基准测试任务", verbose=config.verbose).steps
+        else:
+            async def run_all():
+                return await asyncio.gather(*(
+                    _arun_task(agent, f"基准测试任务 {i}", config.verbose)
+                    for i, (agent, _) in enumerate(sessions)
+                ))
+
+            steps = sum(result.steps for result in asyncio.run(run_all()))
+    wall = time.perf_counter() - start
+    for agent, _ in sessions:
+        if agent._executor is not None:
+            agent._executor.shutdown()
+    llms = [llm for _, llm in sessions]
+    return wall, steps, timer.seconds, llms
+
+
+def run_benchmark(config: BenchmarkConfig, repeat: int = 3, measure_memory: bool = True) -> BenchmarkResult:
+    """
+    重复运行 repeat 次取耗时的中位数。各阶段耗时在所有会话上累加，step 阶段包含模型耗时和解析，
+    不包含单独计时的提示词渲染（render_prompt）；overhead 是墙钟时间减去模拟的模型耗时（并发会话时模型耗时按会话平均）。
+    峰值内存在单独的一次运行中用 tracemalloc 测量，以免影响计时。
+    """
+    work_dir = tempfile.mkdtemp(prefix="agent-benchmark-")
+    try:
+        # 预热：模板编译、分词器加载等一次性开销不计入结果
+        _run_once(config, work_dir)
+        runs = [_run_once(config, work_dir) for _ in range(repeat)]
+        runs.sort(key=lambda run: run[0])
+        wall, steps, stages, llms = runs[len(runs) // 2]
+        model_seconds = sum(llm.model_seconds for llm in llms) / len(llms)
+        overhead = max(wall - model_seconds, 0.0)
+
+        peak = 0
+        if measure_memory:
+            tracemalloc.start()
+            try:
+                _run_once(config, work_dir)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return BenchmarkResult(
+        config=config,
+        wall_seconds=wall,
+        model_seconds=model_seconds,
+        overhead_seconds=overhead,
+        overhead_ms_per_step=overhead * 1000 / max(steps / config.sessions, 1),
+        steps=steps,
+        stages={stage: seconds for stage, seconds in sorted(stages.items())},
+        max_prompt_chars=max(max(llm.prompt_chars, default=0) for llm in llms),
+        peak_memory_bytes=peak,
+    )
+
+
+def sweep_configs(base: BenchmarkConfig, quick: bool = False) -> List[BenchmarkConfig]:
+    """以 base 为中心，每次只改变一个维度"""
+    sweeps = {
+        "steps": [1, 5, 20] if not quick else [1, 5],
+        "observation_chars": [100, 2000, 20000] if not quick else [100, 5000],
+        "tools": [2, 10, 50] if not quick else [2, 20],
+        "sessions": [1, 8, 32] if not quick else [1, 4],
+    }
+    configs = [base]
+    for name, values in sweeps.items():
+        for value in values:
+            config = replace(base, **{name: value})
+            if config not in configs:
+                configs.append(config)
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线测量 AutoGPT 主循环的框架开销")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果写入的json文件")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="模拟的模型输出速度，0 表示立即返回")
+    parser.add_argument("--verbose", action="store_true", help="包含彩色打印的开销（输出被丢弃）")
+    parser.add_argument("--quick", action="store_true", help="缩小的扫描范围，用于CI")
+    parser.add_argument("--no-memory", action="store_true", help="不测量峰值内存")
+    args = parser.parse_args()
+
+    base = BenchmarkConfig(tokens_per_second=args.tokens_per_second, verbose=args.verbose)
+    results = []
+    for config in sweep_configs(base, quick=args.quick):
+        result = run_benchmark(config, repeat=args.repeat, measure_memory=not args.no_memory)
+        results.append(result)
+        print(
+            f"steps={config.steps:<3} obs={config.observation_chars:<6} tools={config.tools:<3} "
+            f"sessions={config.sessions:<3} wall={result.wall_seconds:.3f}s "
+            f"overhead/step={result.overhead_ms_per_step:.2f}ms peak={result.peak_memory_bytes / 1e6:.1f}MB"
+        )
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": [asdict(result) for result in results],
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    离线的聊天模型替身，按顺序返回预先写好的回复，用于在没有网络的情况下测量框架本身的开销。
+
+    tokens_per_second 模拟模型的输出速度（0 表示立即返回），每个 token 按 chars_per_token 个字符计算，
+    流式输出时每个 token 一个分块。model_seconds 累计模拟的模型耗时，prompt_chars 记录每次调用的提示词长度，
+    基准测试用它们把框架开销和模型耗时分开。
+    """
+
+    responses: List[str]
+    tokens_per_second: float = 0.0
+    chars_per_token: int = 4
+    i: int = 0
+    model_seconds: float = 0.0
+    prompt_chars: List[int] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat-model"
+
+    def _next_response(self, messages: List[BaseMessage]) -> str:
+        self.prompt_chars.append(sum(len(str(m.content)) for m in messages))
+        response = self.responses[self.i % len(self.responses)]
+        self.i += 1
+        return response
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _chunks(self, response: str) -> Iterator[str]:
+        for start in range(0, len(response), self.chars_per_token):
+            yield response[start:start + self.chars_per_token]
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        response = self._next_response(messages)
+        delay = self._token_delay() * len(list(self._chunks(response)))
+        if delay:
+            time.sleep(delay)
+        self.model_seconds += delay
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=response))])
+
+    def _stream(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        delay = self._token_delay()
+        for chunk in self._chunks(self._next_response(messages)):
+            if delay:
+                time.sleep(delay)
+                self.model_seconds += delay
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    async def _astream(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        delay = self._token_delay()
+        for chunk in self._chunks(self._next_response(messages)):
+            if delay:
+                await asyncio.sleep(delay)
+                self.model_seconds += delay
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
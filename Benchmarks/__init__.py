@@ -0,0 +1 @@
+from .ScriptedChatModel import ScriptedChatModel
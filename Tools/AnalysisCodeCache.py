@@ -0,0 +1,111 @@
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter
+from typing import Optional
+
+from Utils.DiskCache import DiskCache
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "analysis_code.sqlite")
+
+# 缓存的代码中用来代替文件路径的占位符
+FILE_PLACEHOLDER = "__ANALYSIS_FILE__"
+
+# 推断列类型时读取的数据行数
+SAMPLE_ROWS = 5
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = "。.？?！!；;，, "
+
+
+def normalize_query(query: str, filename: str) -> str:
+    """去掉查询中的文件名、大小写、多余空白和结尾标点，同一个问题换一个文件时得到相同的结果"""
+    for name in (filename, os.path.basename(filename), os.path.splitext(os.path.basename(filename))[0]):
+        if name:
+            query = query.replace(name, " ")
+    query = _WHITESPACE.sub(" ", query).strip().lower()
+    return query.rstrip(_TRAILING_PUNCTUATION)
+
+
+@functools.lru_cache(maxsize=256)
+def _schema_fingerprint(path: str, mtime: int, size: int) -> str:
+    from .WorkbookPreview import preview_sheet
+
+    schema = []
+    sheet_names = preview_sheet(path, 0, n=SAMPLE_ROWS).sheet_names
+    for i, sheet_name in enumerate(sheet_names):
+        preview = preview_sheet(path, i, n=SAMPLE_ROWS)
+        schema.append([sheet_name, [[column, str(dtype)] for column, dtype in preview.to_frame().dtypes.items()]])
+    return hashlib.sha256(json.dumps(schema, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def schema_fingerprint(filename: str) -> str:
+    """
+    工作簿结构的指纹：工作表名称，以及每个工作表的列名和类型，与文件中的数据无关。
+    xlsx 只读取表头和前 SAMPLE_ROWS 行推断类型，不解析整个工作簿；结果按 (文件, mtime, 大小) 缓存
+    """
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    return _schema_fingerprint(path, stat.st_mtime_ns, stat.st_size)
+
+
+def _escape(filename: str) -> str:
+    """文件路径放进代码里的字符串字面量时需要的转义"""
+    return filename.replace("\\", "\\\\").replace("'", "\\'").replace('"', '\\"')
+
+
+class AnalysisCodeCache:
+    """
+    缓存生成的分析代码。
+
+    以规范化的查询和工作簿结构指纹为键，不依赖文件内容，同样格式的月度报表可以复用同一段代码；
+    代码中的文件路径替换成占位符保存，命中时换成新的文件路径后直接执行，不再调用llm生成代码。
+    只有成功执行过的代码才会被保存，命中的代码执行失败时删除该条目。
+    key() 需要读取工作簿结构，一次分析中只计算一次，再传给 get / put / evict。
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: Optional[float] = 30 * 24 * 3600,
+                 max_entries: int = 2000):
+        self.cache = DiskCache(path, ttl=ttl, max_entries=max_entries)
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def key(query: str, filename: str) -> Optional[str]:
+        """缓存键，文件无法读取时返回 None"""
+        try:
+            fingerprint = schema_fingerprint(filename)
+        except Exception:
+            return None
+        payload = json.dumps([normalize_query(query, filename), fingerprint], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: Optional[str], filename: str) -> Optional[str]:
+        """命中时返回替换成当前文件路径的代码"""
+        code = self.cache.get(key) if key is not None else None
+        self._count("hits" if code is not None else "misses")
+        if code is None:
+            return None
+        return code.replace(FILE_PLACEHOLDER, _escape(filename))
+
+    def put(self, key: Optional[str], filename: str, code: str) -> bool:
+        """保存成功执行过的代码；代码中没有出现文件路径时无法换文件复用，不保存"""
+        escaped = _escape(filename)
+        if key is None or escaped not in code:
+            return False
+        self.cache.set(key, code.replace(escaped, FILE_PLACEHOLDER))
+        self._count("stored")
+        return True
+
+    def evict(self, key: Optional[str]):
+        """命中的代码执行失败，删除该条目"""
+        if key is not None:
+            self.cache.delete(key)
+            self._count("evicted")
@@ -0,0 +1,162 @@
+import heapq
+import json
+import math
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+# 英文单词和数字（包括小数）作为整体，连续的汉字拆成单字和相邻两字
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?|[\u3400-\u9fff\uf900-\ufaff]+")
+
+INDEX_FILE = "bm25.json"
+
+
+def tokenize(text: str) -> List[str]:
+    """中文没有空格分词，用单字加二元组：单字保证召回，二元组让词语的匹配得分更高"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        word = match.group()
+        if word[0].isascii():
+            tokens.append(word)
+        else:
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class BM25Index:
+    """
+    文档分块的倒排索引，按 BM25 打分。
+
+    构建时对每个分块分词一次，保存词项到 (分块序号, 词频) 的倒排表和分块长度，
+    查询时只遍历查询词项的倒排表。to_json / from_json 用于缓存到磁盘，加载时不需要重新分词。
+    """
+
+    def __init__(self, documents: List[Document], postings: Dict[str, List[Tuple[int, int]]],
+                 lengths: List[int], k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.postings = postings
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, documents: Iterable[Document], **kwargs) -> "BM25Index":
+        documents = list(documents)
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for i, document in enumerate(documents):
+            counts = Counter(tokenize(document.page_content))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((i, tf))
+        return cls(documents, postings, lengths, **kwargs)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def scores(self, idfs: Dict[str, float], avg_length: float) -> Dict[int, float]:
+        """按给定的 idf 和平均长度为分块打分；多个索引一起检索时使用全体的统计量"""
+        scores: Dict[int, float] = {}
+        for term, idf in idfs.items():
+            for i, tf in self.postings.get(term, ()):
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """得分最高的 k 个分块，没有任何词项匹配的分块不返回"""
+        return search_indexes([self], query, k)
+
+    def to_json(self) -> dict:
+        return {
+            "documents": [{"text": d.page_content, "metadata": d.metadata} for d in self.documents],
+            "postings": self.postings,
+            "lengths": self.lengths,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict, **kwargs) -> "BM25Index":
+        documents = [Document(page_content=d["text"], metadata=d["metadata"]) for d in data["documents"]]
+        postings = {term: [tuple(p) for p in plist] for term, plist in data["postings"].items()}
+        return cls(documents, postings, data["lengths"], **kwargs)
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_json(json.load(f), **kwargs)
+
+
+def _idf(n: int, df: int) -> float:
+    return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+
+def search_indexes(indexes: List[BM25Index], query: str, k: int = 4) -> List[Tuple[Document, float]]:
+    """在多个索引中检索，文档数、文档频率和平均长度按所有索引合计，得分可以互相比较"""
+    n = sum(len(index) for index in indexes)
+    if n == 0:
+        return []
+    avg_length = sum(sum(index.lengths) for index in indexes) / n
+    idfs = {}
+    for term in set(tokenize(query)):
+        df = sum(len(index.postings.get(term, ())) for index in indexes)
+        if df:
+            idfs[term] = _idf(n, df)
+    if not idfs:
+        return []
+    scored = (
+        (score, index.documents[i])
+        for index in indexes
+        for i, score in index.scores(idfs, avg_length or 1.0).items()
+    )
+    top = heapq.nlargest(k, scored, key=lambda item: item[0])
+    return [(document, score) for score, document in top]
+
+
+class BM25Retriever(BaseRetriever):
+    """
+    BM25 检索器。设置 embedding 时为混合检索：BM25 先取 candidates 个候选，
+    只对候选分块和问题计算 embedding，按余弦相似度重排后取前 k 个；embedding 失败时退回 BM25 的排序。
+    换了说法的问题和原文可能没有共同的词项，设置 fallback 时，BM25 的候选不足 k 个就改用 fallback 返回的检索器。
+    """
+
+    index: BM25Index
+    k: int = 4
+    embedding: Optional[Embeddings] = None
+    candidates: int = 20
+    fallback: Optional[Callable[[], Optional[BaseRetriever]]] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(
+            self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        candidates = [
+            document for document, _ in self.index.search(query, self.k if self.embedding is None else self.candidates)
+        ]
+        if len(candidates) < self.k and self.fallback is not None:
+            retriever = self.fallback()
+            if retriever is not None:
+                return retriever.get_relevant_documents(query, callbacks=run_manager.get_child())
+        if self.embedding is None or len(candidates) <= self.k:
+            return candidates
+        try:
+            vectors = np.asarray(self.embedding.embed_documents([d.page_content for d in candidates]))
+            query_vector = np.asarray(self.embedding.embed_query(query))
+        except Exception:
+            return candidates[:self.k]
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+        norms[norms == 0] = 1.0
+        scores = vectors @ query_vector / norms
+        return [candidates[i] for i in np.argsort(-scores, kind="stable")[:self.k]]
@@ -0,0 +1,216 @@
+import atexit
+import contextlib
+import io
+import multiprocessing
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+
+DEFAULT_TIMEOUT = 60
+DEFAULT_MEMORY_LIMIT = 2 * 1024 * 1024 * 1024
+
+
+@dataclass
+class ExecutionResult:
+    """ 代码的标准输出（出错时附带异常），以及是否正常执行完毕 """
+    output: str
+    ok: bool
+    duration: float = 0.0
+
+
+def _run_code(code: str) -> ExecutionResult:
+    """ 在独立的命名空间中执行代码并捕获标准输出，与 PythonREPL.run 的输出一致 """
+    start = time.perf_counter()
+    buffer = io.StringIO()
+    ok = True
+    try:
+        with contextlib.redirect_stdout(buffer):
+            exec(code, {"__name__": "__main__"})
+    except Exception as e:
+        buffer.write(repr(e))
+        ok = False
+    return ExecutionResult(buffer.getvalue(), ok, time.perf_counter() - start)
+
+
+class CodeExecutor(ABC):
+    """ 执行生成的分析代码的后端 """
+
+    @abstractmethod
+    def execute(self, code: str, timeout: Optional[float] = None) -> ExecutionResult:
+        ...
+
+    def close(self):
+        pass
+
+
+class InProcessExecutor(CodeExecutor):
+    """
+    在当前进程中执行，pd.read_excel 复用进程内的 workbook_cache。
+    没有超时和内存限制；代码执行时替换的 sys.stdout 是整个进程共用的，并行的动作同时分析时依次执行，输出不会混在一起。
+    """
+
+    # 所有实例共用：stdout 和 pd.read_excel 的替换都是进程级的
+    _lock = threading.Lock()
+
+    def execute(self, code: str, timeout: Optional[float] = None) -> ExecutionResult:
+        from .WorkbookCache import workbook_cache
+
+        with self._lock, workbook_cache.patched_read_excel():
+            return _run_code(code)
+
+
+def _worker_main(conn, memory_limit: Optional[int]):
+    """ 工作进程：预先导入 pandas/numpy，之后逐个执行收到的代码 """
+    if memory_limit:
+        try:
+            import resource
+
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        except (ImportError, ValueError, OSError):
+            # 非 Linux 平台没有 RLIMIT_AS
+            pass
+
+    import numpy  # noqa: F401
+    import pandas as pd
+
+    from Tools.WorkbookCache import workbook_cache
+
+    # 工作进程只执行分析代码，read_excel 始终走缓存，读取过的 DataFrame 在多次执行之间常驻内存
+    pd.read_excel = workbook_cache.read_excel
+    conn.send("ready")
+
+    while True:
+        try:
+            code = conn.recv()
+        except EOFError:
+            break
+        if code is None:
+            break
+        try:
+            result = _run_code(code)
+        except MemoryError:
+            result = ExecutionResult("MemoryError: 超出内存限制", False)
+        conn.send(result)
+
+
+class _Worker:
+
+    def __init__(self, context, memory_limit):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_limit), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+        self.ready = False
+
+    def wait_ready(self, timeout):
+        if not self.ready:
+            if not self.conn.poll(timeout):
+                raise TimeoutError("工作进程启动超时")
+            self.conn.recv()
+            self.ready = True
+
+    def stop(self, kill=False):
+        if not kill:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPoolExecutor(CodeExecutor):
+    """
+    预热的工作进程池。
+
+    每个工作进程启动时就导入了 pandas/numpy，并在进程内缓存读取过的工作簿，后续的代码不必重新导入和解析。
+    每次执行有超时时间，超时的进程被杀死并替换；RLIMIT_AS 限制每个进程的内存，
+    进程崩溃时同样被替换；执行 max_tasks_per_worker 次后回收进程，避免内存持续增长。
+    所有进程都在忙时，新的执行请求排队等待空闲进程，因此可以同时执行 workers 个分析。
+    """
+
+    def __init__(
+            self,
+            workers: int = 2,
+            timeout: float = DEFAULT_TIMEOUT,
+            memory_limit: Optional[int] = DEFAULT_MEMORY_LIMIT,
+            max_tasks_per_worker: int = 50,
+            startup_timeout: float = 60,
+    ):
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.startup_timeout = startup_timeout
+        # spawn 的子进程不继承父进程的线程和锁
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"executions": 0, "timeouts": 0, "crashes": 0, "recycled": 0}
+        for _ in range(workers):
+            self._idle.put(self._spawn())
+        atexit.register(self.close)
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context, self.memory_limit)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _replace(self, worker: _Worker, reason: str) -> _Worker:
+        with self._lock:
+            self._workers.discard(worker)
+            self.stats[reason] += 1
+        # 超时或异常的进程直接杀死，正常回收的进程先通知退出
+        worker.stop(kill=reason != "recycled")
+        return self._spawn()
+
+    def execute(self, code: str, timeout: Optional[float] = None) -> ExecutionResult:
+        if self._closed:
+            raise RuntimeError("WorkerPoolExecutor is closed")
+        timeout = timeout or self.timeout
+        worker = self._idle.get()
+        try:
+            worker.wait_ready(self.startup_timeout)
+            start = time.perf_counter()
+            worker.conn.send(code)
+            if not worker.conn.poll(timeout):
+                duration = time.perf_counter() - start
+                worker = self._replace(worker, "timeouts")
+                return ExecutionResult(f"Error: 代码执行超过 {timeout} 秒，已终止", False, duration)
+            try:
+                result = worker.conn.recv()
+            except EOFError:
+                duration = time.perf_counter() - start
+                worker = self._replace(worker, "crashes")
+                return ExecutionResult("Error: 执行代码的进程异常退出（可能超出内存限制）", False, duration)
+            with self._lock:
+                self.stats["executions"] += 1
+            worker.tasks += 1
+            if worker.tasks >= self.max_tasks_per_worker:
+                worker = self._replace(worker, "recycled")
+            return result
+        except BaseException:
+            # 启动失败或被中断，进程状态未知，换一个新进程
+            worker = self._replace(worker, "crashes")
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from .BM25Index import BM25Index, search_indexes
+from .DocumentIndexCache import DocumentIndexCache
+from .DocumentIngestion import iter_chunks, iter_pages
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".doc", ".xlsx")
+DEFAULT_CACHE_DIR = os.path.join(".cache", "corpus_index")
+# 跨文档检索返回的是段落，分块比单文档问答的大一些
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+# 两次扫描目录的最小间隔（秒），连续的查询共用一次扫描
+REFRESH_INTERVAL = 2.0
+# 进程内最多保留的目录索引数，按最近使用淘汰
+MAX_CORPORA = 8
+
+
+class CorpusIndex:
+    """
+    目录下所有 PDF / Word / xlsx 文件的 BM25 索引。
+
+    refresh() 扫描目录，只处理 mtime 或大小变化的文件：内容 hash 也没变的文件直接复用缓存的索引，
+    内容变化的文件重新切分建索引，已删除的文件移出索引。每个文件的索引由 DocumentIndexCache 持久化，
+    重启后不需要重新解析。search() 在所有文件中检索，得分按全体文件的统计量计算。
+    索引在锁外构建，完成后整体替换；已经扫描过一次之后，正在刷新时的检索直接使用上一次的索引，不等待。
+    """
+
+    def __init__(self, root: str, cache: Optional[DocumentIndexCache] = None,
+                 refresh_interval: float = REFRESH_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.cache = cache or DocumentIndexCache(DEFAULT_CACHE_DIR, max_entries=10000)
+        self.refresh_interval = refresh_interval
+        # 文件路径 -> (mtime, 大小, 索引)，无法解析或没有内容的文件索引为 None
+        self._files: Dict[str, Tuple[int, int, Optional[BM25Index]]] = {}
+        self._lock = threading.Lock()
+        # 同一时间只有一个线程扫描目录
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = None
+        self.stats = Counter()
+
+    def _scan(self) -> Dict[str, os.stat_result]:
+        """递归列出支持的文件，跳过隐藏目录和 Office 的临时文件"""
+        found = {}
+        stack = [self.root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.name.startswith((".", "~$")):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.lower().endswith(SUPPORTED_EXTENSIONS) and entry.is_file():
+                            found[entry.path] = entry.stat()
+            except OSError:
+                continue
+        return found
+
+    def _index_file(self, path: str) -> Optional[BM25Index]:
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            length_function=len,
+            add_start_index=True,
+        )
+
+        def load_documents():
+            self.stats["indexed"] += 1
+            return iter_chunks(iter_pages(path), text_splitter)
+
+        try:
+            index = self.cache.get_or_build_bm25(
+                path,
+                settings={"index": "bm25", "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP},
+                load_documents=load_documents,
+            )
+        except Exception:
+            # 损坏或加密的文件不影响其他文件的检索，文件修改后会再次尝试
+            self.stats["errors"] += 1
+            return None
+        if index is not None:
+            # 缓存以文件内容为键，内容相同的文件共用一份索引，来源以当前路径为准
+            for document in index.documents:
+                document.metadata["source"] = path
+        return index
+
+    def refresh(self, force: bool = False, wait: bool = True):
+        """
+        增量更新索引，距上次扫描不到 refresh_interval 秒时跳过。
+        wait=False 时如果其他线程正在扫描就直接返回
+        """
+        if not self._refresh_lock.acquire(blocking=wait):
+            return
+        try:
+            with self._lock:
+                if not force and self._refreshed_at is not None \
+                        and time.monotonic() - self._refreshed_at < self.refresh_interval:
+                    return
+                files = dict(self._files)
+            found = self._scan()
+            removed = set(files) - set(found)
+            # 所有文件的索引建好后只写回一次清单
+            with self.cache.deferred_saves():
+                for path, stat in found.items():
+                    record = files.get(path)
+                    if record is not None and record[0] == stat.st_mtime_ns and record[1] == stat.st_size:
+                        continue
+                    files[path] = (stat.st_mtime_ns, stat.st_size, self._index_file(path))
+            for path in removed:
+                del files[path]
+            with self._lock:
+                self._files = files
+                self.stats["removed"] += len(removed)
+                self._refreshed_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        # 第一次扫描完成之前没有可用的索引，只能等待
+        self.refresh(wait=self._refreshed_at is None)
+        with self._lock:
+            indexes = [index for _, _, index in self._files.values() if index is not None]
+        return search_indexes(indexes, query, k)
+
+
+# 每个目录一个索引，进程内共享，最多 MAX_CORPORA 个
+_corpora: "OrderedDict[str, CorpusIndex]" = OrderedDict()
+_corpora_lock = threading.Lock()
+
+
+def get_corpus_index(root: str) -> CorpusIndex:
+    root = os.path.abspath(root)
+    with _corpora_lock:
+        corpus = _corpora.get(root)
+        if corpus is None:
+            corpus = _corpora[root] = CorpusIndex(root)
+            while len(_corpora) > MAX_CORPORA:
+                _corpora.popitem(last=False)
+        _corpora.move_to_end(root)
+        return corpus
+
+
+def drop_corpus_index(root: str):
+    """丢弃目录的索引，例如批量执行中任务的工作目录删除之后；文件的索引仍然缓存在磁盘上"""
+    with _corpora_lock:
+        _corpora.pop(os.path.abspath(root), None)
+
+
+def _location(metadata: dict) -> str:
+    if "page" in metadata:
+        return f"第{metadata['page'] + 1}页"
+    if "sheet" in metadata:
+        return f"工作表“{metadata['sheet']}”第{metadata['row']}行起"
+    return ""
+
+
+def search_documents(query: str, path: str, k: int = 5) -> str:
+    """在目录下的所有文档中检索与问题相关的段落"""
+    corpus = get_corpus_index(path)
+    results = corpus.search(query, k)
+    if not results:
+        return f"在 {path} 下没有找到与问题相关的内容"
+    passages = []
+    for i, (document, score) in enumerate(results):
+        source = os.path.relpath(document.metadata.get("source", ""), corpus.root)
+        passages.append(
+            f"[{i + 1}] {source} {_location(document.metadata)}（相关度 {score:.2f}）\n{document.page_content}"
+        )
+    return "\n\n".join(passages)
@@ -0,0 +1,294 @@
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from langchain.schema import Document
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+
+from .BM25Index import INDEX_FILE as BM25_INDEX_FILE, BM25Index
+from .DocumentIngestion import batched
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 上没有 fcntl，只保证同一进程内的一致性
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "doc_index")
+MANIFEST_FILE = "manifest.json"
+# 每次写入索引的分块数
+ADD_BATCH_SIZE = 256
+# 命中时 last_access 的更新间隔（秒），淘汰顺序只需要粗略的时间，不必每次命中都重写清单
+ACCESS_UPDATE_INTERVAL = 300
+
+
+def file_sha256(filename: str, block_size: int = 1 << 20) -> str:
+    """计算文件内容的sha256"""
+    sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class DocumentIndexCache:
+    """
+    文档向量索引的磁盘缓存。
+
+    索引以 (文件内容hash, 切分参数, 向量模型) 为键持久化到 cache_dir 下，
+    同一文件未修改时直接加载已有索引，跳过解析、切分与向量化。
+    文件修改后旧索引失效并被删除，条目数超过 max_entries 时按最近使用时间淘汰。
+    批量执行时多个进程共用 cache_dir，清单在文件锁内重新读取并合并本进程的修改后再写回。
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_entries: int = 32):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._manifest = None
+        # 上次写回之后本进程对清单的修改，写回时合并到磁盘上的最新版本
+        self._changed_files: Dict[str, dict] = {}
+        self._changed_entries: Dict[str, dict] = {}
+        self._removed_entries = set()
+        # deferred_saves() 期间只记录修改，退出时一次写回
+        self._defer_depth = 0
+        self._save_pending = False
+
+    def _manifest_path(self):
+        return os.path.join(self.cache_dir, MANIFEST_FILE)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> dict:
+        manifest = {"files": {}, "entries": {}}
+        if os.path.exists(self._manifest_path()):
+            try:
+                with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                pass
+        return manifest
+
+    def _load_manifest(self) -> dict:
+        if self._manifest is None:
+            self._manifest = self._read_manifest()
+        return self._manifest
+
+    def _set_entry(self, key: str, entry: dict):
+        self._load_manifest()["entries"][key] = entry
+        self._changed_entries[key] = entry
+        self._removed_entries.discard(key)
+
+    def _save_manifest(self):
+        """
+        在文件锁内重新读取清单，合并本进程的修改（文件hash、新增和访问过的条目、删除的条目）后写回，
+        其他进程同时写入的条目不会被覆盖；合并后的条目数超过容量时在锁内淘汰
+        """
+        if self._defer_depth:
+            self._save_pending = True
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._file_lock():
+            manifest = self._read_manifest()
+            manifest["files"].update(self._changed_files)
+            for key in self._removed_entries:
+                manifest["entries"].pop(key, None)
+            manifest["entries"].update(self._changed_entries)
+            self._manifest = manifest
+            self._evict()
+            tmp_path = self._manifest_path() + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp_path, self._manifest_path())
+        self._changed_files.clear()
+        self._changed_entries.clear()
+        self._removed_entries.clear()
+
+    @contextlib.contextmanager
+    def deferred_saves(self):
+        """
+        在这个范围内构建的多个索引只在退出时写回一次清单，例如扫描目录时逐个文件建索引，
+        不必每个文件都重新读取、合并并重写整个清单
+        """
+        with self._lock:
+            self._defer_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._defer_depth -= 1
+                if not self._defer_depth and self._save_pending:
+                    self._save_pending = False
+                    self._save_manifest()
+
+    def _content_hash(self, filename: str) -> str:
+        """
+        文件的mtime和大小未变时复用已记录的hash，避免重复读取大文件。
+        以真实路径为键，批量任务工作目录中的符号链接共用原文件的记录
+        """
+        path = os.path.realpath(filename)
+        stat = os.stat(path)
+        files = self._load_manifest()["files"]
+        record = files.get(path)
+        if record and record["mtime"] == stat.st_mtime_ns and record["size"] == stat.st_size:
+            return record["sha256"]
+        sha = file_sha256(path)
+        files[path] = self._changed_files[path] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha}
+        return sha
+
+    @staticmethod
+    def make_key(content_hash: str, settings: dict) -> str:
+        settings_str = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(f"{content_hash}|{settings_str}".encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _remove_entry(self, key: str):
+        self._load_manifest()["entries"].pop(key, None)
+        self._changed_entries.pop(key, None)
+        self._removed_entries.add(key)
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def _invalidate_stale(self, path: str, content_hash: str):
+        """删除同一文件旧版本留下的索引"""
+        entries = self._load_manifest()["entries"]
+        stale = [k for k, e in entries.items() if e["source"] == path and e["sha256"] != content_hash]
+        for k in stale:
+            self._remove_entry(k)
+
+    def _evict(self):
+        """按最近使用时间淘汰超出容量的索引，并删除已经不存在或者没有索引的文件的记录"""
+        manifest = self._load_manifest()
+        entries = manifest["entries"]
+        if len(entries) > self.max_entries:
+            by_access = sorted(entries.items(), key=lambda item: item[1]["last_access"])
+            for k, _ in by_access[:len(entries) - self.max_entries]:
+                self._remove_entry(k)
+        sources = {entry["source"] for entry in entries.values()}
+        manifest["files"] = {
+            path: record for path, record in manifest["files"].items()
+            if path in sources and os.path.exists(path)
+        }
+
+    def _get_or_build(self, filename: str, settings: dict, load, build):
+        """
+        同一个键只构建一次，其他线程等待构建完成后直接加载。
+        load(entry_dir) 加载已有的索引；build(entry_dir) 构建并持久化，返回 None 表示没有内容，不缓存。
+        """
+        path = os.path.realpath(filename)
+        with self._lock:
+            content_hash = self._content_hash(path)
+            file_record = self._load_manifest()["files"][path]
+            key = self.make_key(content_hash, settings)
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                entry = self._load_manifest()["entries"].get(key)
+                if entry is not None and os.path.isdir(self._entry_dir(key)):
+                    now = time.time()
+                    if now - entry["last_access"] > ACCESS_UPDATE_INTERVAL:
+                        self._set_entry(key, dict(entry, last_access=now))
+                        self._save_manifest()
+                    return load(self._entry_dir(key))
+
+            entry_dir = self._entry_dir(key)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            try:
+                index = build(entry_dir)
+            except BaseException:
+                # 构建中断时不留下不完整的索引
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                raise
+            if index is None:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                return None
+
+            with self._lock:
+                now = time.time()
+                # 构建期间写回清单时，还没有索引的文件记录已被清理，和新条目一起重新写入
+                self._changed_files[path] = file_record
+                self._set_entry(key, {
+                    "source": path,
+                    "sha256": content_hash,
+                    "settings": settings,
+                    "created": now,
+                    "last_access": now,
+                })
+                self._invalidate_stale(path, content_hash)
+                self._save_manifest()
+            return index
+
+    def get_or_build(
+            self,
+            filename: str,
+            embedding: Embeddings,
+            settings: dict,
+            load_documents: Callable[[], Iterable[Document]],
+    ) -> Optional[Chroma]:
+        """
+        取得文件对应的向量索引，缓存未命中时调用 load_documents 构建并持久化。
+        load_documents 可以返回生成器，分块按批写入索引，不需要一次性全部放在内存中。
+        没有任何分块时不缓存，返回None。
+        """
+
+        def build(entry_dir):
+            batches = batched(load_documents(), ADD_BATCH_SIZE)
+            first = next(batches, None)
+            if first is None:
+                return None
+            db = Chroma(persist_directory=entry_dir, embedding_function=embedding)
+            for batch in itertools.chain([first], batches):
+                db.add_documents(batch)
+            db.persist()
+            return db
+
+        return self._get_or_build(
+            filename,
+            settings,
+            load=lambda entry_dir: Chroma(persist_directory=entry_dir, embedding_function=embedding),
+            build=build,
+        )
+
+    def get_or_build_bm25(
+            self,
+            filename: str,
+            settings: dict,
+            load_documents: Callable[[], Iterable[Document]],
+    ) -> Optional[BM25Index]:
+        """与 get_or_build 相同，但构建的是不需要 embedding 的 BM25 倒排索引，settings 中应包含 "index": "bm25" """
+
+        def build(entry_dir):
+            index = BM25Index.build(load_documents())
+            if not len(index):
+                return None
+            os.makedirs(entry_dir, exist_ok=True)
+            index.save(os.path.join(entry_dir, BM25_INDEX_FILE))
+            return index
+
+        return self._get_or_build(
+            filename,
+            settings,
+            load=lambda entry_dir: BM25Index.load(os.path.join(entry_dir, BM25_INDEX_FILE)),
+            build=build,
+        )
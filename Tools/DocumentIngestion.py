@@ -0,0 +1,186 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from langchain.schema import Document
+
+T = TypeVar("T")
+
+# 每个任务提取的页数，以及同时在进程池中的任务数；内存中最多保留 PAGES_PER_TASK * WINDOW 页的文本
+PAGES_PER_TASK = 8
+WINDOW = 4
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+# 表格每多少行作为一段文本
+ROWS_PER_CHUNK = 10
+
+# 进程内共享的提取进程池，第一次解析大文档时创建
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 主进程中有 embedding 等后台线程，用 spawn 而不是 fork
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool():
+    """工作进程崩溃后进程池不可再用，下次使用时重新创建"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def shutdown():
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown)
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# 工作进程中最近打开的文档，同一文档的后续任务不再重新解析文件结构
+_worker_reader: Optional[Tuple[tuple, object]] = None
+
+
+def _open_pdf(filename: str):
+    from pypdf import PdfReader
+
+    return PdfReader(filename)
+
+
+def _read_pages(reader, start: int, stop: int) -> List[Tuple[int, str]]:
+    return [(i, reader.pages[i].extract_text()) for i in range(start, stop)]
+
+
+def _extract_pages(filename: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """在工作进程中执行：提取 [start, stop) 页的文本"""
+    global _worker_reader
+    stat = os.stat(filename)
+    key = (filename, stat.st_mtime_ns, stat.st_size)
+    if _worker_reader is None or _worker_reader[0] != key:
+        _worker_reader = (key, _open_pdf(filename))
+    return _read_pages(_worker_reader[1], start, stop)
+
+
+def iter_pdf_pages(
+        filename: str,
+        workers: int = DEFAULT_WORKERS,
+        pages_per_task: int = PAGES_PER_TASK,
+        window: int = WINDOW,
+) -> Iterator[Document]:
+    """
+    按页的顺序产生 PDF 每一页的 Document，metadata 与 PyPDFLoader 相同。
+
+    页面分成每 pages_per_task 页一个任务，在进程池中并行提取，同时最多提交 window 个任务；
+    消费者处理当前页面（切分、embedding）时，后面的页面已经在提取。只有一个任务的小文档直接在当前进程中提取。
+    """
+    reader = _open_pdf(filename)
+    page_count = len(reader.pages)
+    ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+    def to_documents(pages):
+        for i, text in pages:
+            yield Document(page_content=text, metadata={"source": filename, "page": i})
+
+    if len(ranges) <= 1 or workers <= 1:
+        for start, stop in ranges:
+            yield from to_documents(_read_pages(reader, start, stop))
+        return
+
+    # 工作进程各自打开文档，当前进程不再需要
+    del reader
+    pool = _get_pool(workers)
+    remaining = iter(ranges)
+    pending = deque(pool.submit(_extract_pages, filename, start, stop)
+                    for start, stop in itertools.islice(remaining, window))
+    try:
+        while pending:
+            try:
+                pages = pending.popleft().result()
+            except BrokenProcessPool:
+                _reset_pool()
+                raise
+            next_range = next(remaining, None)
+            if next_range is not None:
+                pending.append(pool.submit(_extract_pages, filename, *next_range))
+            yield from to_documents(pages)
+    finally:
+        # 消费者提前停止时取消还没有开始的任务
+        for future in pending:
+            future.cancel()
+
+
+def iter_workbook_rows(filename: str, rows_per_chunk: int = ROWS_PER_CHUNK) -> Iterator[Document]:
+    """
+    以只读模式逐行读取 xlsx 的每个工作表，每 rows_per_chunk 行写成一段 "列名: 值" 的文本，
+    metadata 中记录工作表名和起始行号（表头为第1行）
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filename, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            header = [str(name) if name is not None else f"列{i + 1}" for i, name in enumerate(header)]
+            for start, group in enumerate(batched(rows, rows_per_chunk)):
+                lines = [
+                    ", ".join(f"{name}: {value}" for name, value in zip(header, row) if value is not None)
+                    for row in group
+                ]
+                text = "\n".join(line for line in lines if line)
+                if text:
+                    yield Document(page_content=text, metadata={
+                        "source": filename, "sheet": sheet.title, "row": start * rows_per_chunk + 2,
+                    })
+    finally:
+        workbook.close()
+
+
+def iter_pages(filename: str, **kwargs) -> Iterator[Document]:
+    """
+    按页产生文档内容，PDF 并行提取；Word 文档没有页的结构，由 unstructured 在当前进程中解析；
+    xlsx 每个工作表按行分段
+    """
+    ext = filename.split(".")[-1].lower()
+    if ext == "pdf":
+        return iter_pdf_pages(filename, **kwargs)
+    elif ext == "docx" or ext == "doc":
+        from langchain_community.document_loaders.word_document import UnstructuredWordDocumentLoader
+
+        # 这个版本的 Word loader 没有实现 lazy_load，只能一次性解析
+        return iter(UnstructuredWordDocumentLoader(filename).load())
+    elif ext == "xlsx":
+        return iter_workbook_rows(filename)
+    else:
+        raise NotImplementedError(f"File extension {ext} not supported.")
+
+
+def iter_chunks(pages: Iterable[Document], text_splitter) -> Iterator[Document]:
+    """逐页切分，已经切分的页面不再保留在内存中"""
+    for page in pages:
+        yield from text_splitter.split_documents([page])
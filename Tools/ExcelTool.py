@@ -19,17 +19,15 @@
 
 
 # !pip install openpyxl
-import pandas as pd
-
 from Utils.PrintUtils import color_print
+from .WorkbookPreview import preview_sheet
 
 
 def get_sheet_names(
         file_name: str,
 ) -> str:
     """取得excel中所有表的名称"""
-    excel_file = pd.ExcelFile(file_name)
-    sheet_names = excel_file.sheet_names
+    sheet_names = list(preview_sheet(file_name, 0, 0).sheet_names)
     return f"这是 '{file_name}' 文件的工作表名称：\n\n{sheet_names}"
 
 
@@ -38,9 +36,8 @@ def get_column_names(
         sheet_index: int = 0,
 ) -> str:
     """取得excel中所有列的名称"""
-    df = pd.read_excel(file_name, sheet_name=sheet_index)
     column_names = '\n'.join(
-        df.columns.tolist()
+        preview_sheet(file_name, sheet_index, 0).columns
     )
 
     result = f"这是 '{file_name}' 文件的第 {sheet_index} 个工作表的列名称：\n\n{column_names}"
@@ -48,18 +45,23 @@ def get_column_names(
 
 
 def get_first_n_rows(
-        file_name,
+        file_name: str,
         sheet_index: int = 0,
         n: int = 3,
 ) -> str:
     """获取excel 文件中表格的前n行数据"""
-    result = get_sheet_names(file_name) + "\n\n"
-    result += get_column_names(file_name, sheet_index) + "\n\n"
+    # 只读取表头和前n行，表名和行列数来自工作簿的元数据，不解析整个工作表
+    preview = preview_sheet(file_name, sheet_index, n)
+
+    result = f"这是 '{file_name}' 文件的工作表名称：\n\n{list(preview.sheet_names)}\n\n"
+    column_names = '\n'.join(preview.columns)
+    result += f"这是 '{file_name}' 文件的第 {sheet_index} 个工作表的列名称：\n\n{column_names}\n\n"
 
-    df = pd.read_excel(file_name, sheet_name=sheet_index)
+    if preview.n_rows is not None:
+        result += f"这个工作表共有 {preview.n_rows} 行数据，{preview.n_columns} 列。\n\n"
 
     n_lines = "\n".join(
-        df.head(n).to_string(index=False, header=True).split("\n")
+        preview.to_frame().to_string(index=False, header=True).split("\n")
     )
 
     result += f"这是 '{file_name}' 文件的第 {sheet_index} 个工作表的前 {n} 行数据：\n\n{n_lines}"
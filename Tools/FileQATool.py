@@ -1,60 +1,89 @@
-from typing import List
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.schema import Document
+import os
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import Chroma
-from langchain.document_loaders import PyPDFLoader
-from langchain.document_loaders.word_document import UnstructuredWordDocumentLoader
 from langchain.chains import RetrievalQA
 from langchain.llms import OpenAI
 
-class FileLoadFactory:
-    @staticmethod
-    def get_loader(filename: str):
-        ext = get_file_extension(filename)
-        if ext == "pdf":
-            return PyPDFLoader(filename)
-        elif ext == "docx" or ext == "doc":
-            return UnstructuredWordDocumentLoader(filename)
-        else:
-            raise NotImplementedError(f"File extension {ext} not supported.")
+from Utils.EmbeddingService import DEFAULT_MODEL, get_embedding_service
+from Utils.LLMCache import cached
+from .BM25Index import BM25Retriever
+from .DocumentIndexCache import DocumentIndexCache
+from .DocumentIngestion import iter_chunks, iter_pages
 
-def get_file_extension(filename: str) -> str:
-    return filename.split(".")[-1]
+EMBEDDING_MODEL = DEFAULT_MODEL
+CHUNK_SIZE = 200
+CHUNK_OVERLAP = 100
+# 检索方式：vector 为全文 embedding 的向量检索；bm25 为本地倒排索引，不需要 embedding；
+# hybrid 先用 BM25 取 BM25_CANDIDATES 个候选，只对候选计算 embedding 重排，候选不足时退回向量检索
+RETRIEVAL_MODES = ("vector", "bm25", "hybrid")
+RETRIEVAL_MODE = os.getenv("DOCUMENT_RETRIEVAL_MODE", "vector")
+BM25_CANDIDATES = 20
 
-def load_docs(filename: str) -> List[Document]:
-    file_loader = FileLoadFactory.get_loader(filename)
-    pages = file_loader.load_and_split()
-    return pages
+# 进程内共享的文档索引缓存，索引持久化在磁盘上，跨会话复用
+_index_cache = DocumentIndexCache()
 
 def ask_docment(
         filename: str,
         query: str,
 ) -> str:
     """根据一个PDF文档的内容，回答一个问题"""
+    if RETRIEVAL_MODE not in RETRIEVAL_MODES:
+        raise ValueError(f"unknown retrieval mode {RETRIEVAL_MODE}, expected one of {RETRIEVAL_MODES}")
 
-    raw_docs = load_docs(filename)
-    if len(raw_docs) == 0:
-        return "抱歉，文档内容为空"
-    text_splitter = RecursiveCharacterTextSplitter(
-                        chunk_size=200,
-                        chunk_overlap=100,
-                        length_function=len,
-                        add_start_index=True,
-                    )
-    documents = text_splitter.split_documents(raw_docs)
-    if documents is None or len(documents) == 0:
+    def load_documents():
+        text_splitter = RecursiveCharacterTextSplitter(
+                            chunk_size=CHUNK_SIZE,
+                            chunk_overlap=CHUNK_OVERLAP,
+                            length_function=len,
+                            add_start_index=True,
+                        )
+        # 页面在进程池中并行提取，逐页切分后按批写入索引，embedding 与后面页面的提取同时进行
+        return iter_chunks(iter_pages(filename), text_splitter)
+
+    def vector_retriever():
+        db = _index_cache.get_or_build(
+            filename,
+            # 与长时记忆共用的 embedding 服务，相同文本（例如重叠的分块）只计算一次
+            embedding=get_embedding_service(),
+            settings={
+                "chunk_size": CHUNK_SIZE,
+                "chunk_overlap": CHUNK_OVERLAP,
+                "embedding_model": EMBEDDING_MODEL,
+            },
+            load_documents=load_documents,
+        )
+        return db.as_retriever() if db is not None else None
+
+    # 同一文件（内容不变）的第二次提问直接复用磁盘上的索引
+    if RETRIEVAL_MODE == "vector":
+        retriever = vector_retriever()
+    else:
+        index = _index_cache.get_or_build_bm25(
+            filename,
+            settings={
+                "index": "bm25",
+                "chunk_size": CHUNK_SIZE,
+                "chunk_overlap": CHUNK_OVERLAP,
+            },
+            load_documents=load_documents,
+        )
+        retriever = BM25Retriever(
+            index=index,
+            embedding=get_embedding_service() if RETRIEVAL_MODE == "hybrid" else None,
+            candidates=BM25_CANDIDATES,
+            # 向量索引只在 BM25 召回不足时才构建
+            fallback=vector_retriever if RETRIEVAL_MODE == "hybrid" else None,
+        ) if index is not None else None
+    if retriever is None:
         return "无法读取文档内容"
-    db = Chroma.from_documents(documents, OpenAIEmbeddings(model="text-embedding-ada-002"))
     qa_chain = RetrievalQA.from_chain_type(
-        llm=OpenAI(
+        llm=cached(OpenAI(
             temperature=0,
             model_kwargs={
                 "seed": 42
             },
-        ),  # 语言模型
+        )),  # 语言模型
         chain_type="stuff",  # prompt的组织方式，后面细讲
-        retriever=db.as_retriever()  # 检索器
+        retriever=retriever  # 检索器
     )
     response = qa_chain.run(query+"(请用中文回答)")
     return response
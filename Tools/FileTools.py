@@ -1,4 +1,4 @@
-#  Copyright 2021-2099 the original author or authors.
+﻿#  Copyright 2021-2099 the original author or authors.
 #
 #  @File: FileTools.py
 #  @Author: thirdlucky
@@ -17,12 +17,147 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import fnmatch
 import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Iterator, List, NamedTuple, Optional, Tuple
 
+SORT_KEYS = ("name", "size", "mtime")
 
-def list_files_in_directory(path: str) -> str:
-    """List all file names in the directory"""
-    file_names = os.listdir(path)
 
-    # Join the file names into a single string, separated by a newline
-    return "\n".join(file_names)
+class Entry(NamedTuple):
+    name: str
+    is_dir: bool
+    size: int
+    mtime: float
+    # 符号链接的类型、大小和修改时间取自它指向的文件或文件夹
+    is_link: bool = False
+
+
+class DirectorySnapshot:
+    """
+    目录内容的缓存。每个目录以它自己的 mtime 为版本，目录中增删或重命名文件时 mtime 变化，只重新扫描这一层；
+    没有变化的目录直接使用缓存的条目。文件内容被修改不会改变目录的 mtime，所以缓存中文件的大小和修改时间
+    可能落后，直到这个目录本身发生变化。最多缓存 max_dirs 个目录，按最近使用淘汰。
+    """
+
+    def __init__(self, max_dirs: int = 10000):
+        self.max_dirs = max_dirs
+        self._dirs: "OrderedDict[str, Tuple[int, List[Entry]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def entries(self, path: str) -> List[Entry]:
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._dirs.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._dirs.move_to_end(path)
+                self.stats["hits"] += 1
+                return cached[1]
+
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    # 批量任务的工作目录中全是符号链接，按链接指向的目标报告；指向不存在的目标时跳过
+                    is_dir = entry.is_dir()
+                    stat = entry.stat()
+                    is_link = entry.is_symlink()
+                except OSError:
+                    continue
+                entries.append(Entry(entry.name, is_dir, 0 if is_dir else stat.st_size, stat.st_mtime, is_link))
+
+        with self._lock:
+            self.stats["scans"] += 1
+            self._dirs[path] = (mtime, entries)
+            self._dirs.move_to_end(path)
+            while len(self._dirs) > self.max_dirs:
+                self._dirs.popitem(last=False)
+        return entries
+
+    def walk(self, path: str, depth: int = 1) -> Iterator[Tuple[str, Entry]]:
+        """
+        产生 (相对路径, 条目)，depth=1 只列出 path 的直接内容；跳过以 . 开头的隐藏文件和文件夹。
+        指向文件夹的符号链接会列出，但不进入，避免链接成环时无限递归
+        """
+        stack = [("", 1)]
+        while stack:
+            relative, level = stack.pop()
+            try:
+                entries = self.entries(os.path.join(path, relative))
+            except OSError:
+                if not relative:
+                    raise
+                continue
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                child = os.path.join(relative, entry.name)
+                yield child, entry
+                if entry.is_dir and not entry.is_link and level < depth:
+                    stack.append((child, level + 1))
+
+
+# 进程内共享的目录快照
+_snapshot = DirectorySnapshot()
+
+
+def _format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+def _format_entry(relative: str, entry: Entry) -> str:
+    modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.mtime))
+    if entry.is_dir:
+        return f"{relative}/\t文件夹\t{modified}"
+    return f"{relative}\t{_format_size(entry.size)}\t{modified}"
+
+
+def list_files_in_directory(
+        path: str,
+        depth: int = 1,
+        pattern: Optional[str] = None,
+        sort: str = "name",
+        limit: int = 100,
+        cursor: int = 0,
+) -> str:
+    """
+    列出文件夹的内容：每行是相对路径（文件夹以 / 结尾）、大小和修改时间。
+    depth 为递归深度，pattern 是文件名的通配符（例如 *.xlsx），sort 可以是 name、size（从大到小）或 mtime（从新到旧），
+    每次最多返回 limit 项，还有更多时在结尾给出下一页的 cursor。
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"sort must be one of {SORT_KEYS}")
+    items = [
+        (relative, entry) for relative, entry in _snapshot.walk(path, max(depth, 1))
+        if pattern is None or fnmatch.fnmatch(entry.name, pattern)
+    ]
+    if sort == "name":
+        items.sort(key=lambda item: item[0])
+    elif sort == "size":
+        items.sort(key=lambda item: item[1].size, reverse=True)
+    else:
+        items.sort(key=lambda item: item[1].mtime, reverse=True)
+
+    cursor = max(cursor, 0)
+    # limit 小于1时下一页的 cursor 不会前进，至少返回一项
+    limit = max(limit, 1)
+    page = items[cursor:cursor + limit]
+    lines = [_format_entry(relative, entry) for relative, entry in page]
+    if cursor + limit < len(items):
+        lines.append(
+            f"（共 {len(items)} 项，当前为第 {cursor + 1}-{cursor + len(page)} 项，"
+            f"使用 cursor={cursor + limit} 查看下一页）"
+        )
+    elif not items:
+        lines.append("（没有匹配的文件）")
+    elif not page:
+        lines.append(f"（没有更多条目，共 {len(items)} 项，cursor 从 0 开始）")
+    return "\n".join(lines)
@@ -1,13 +1,17 @@
 import re
+from typing import Callable, Union
+
 from langchain.tools import StructuredTool
 from langchain_core.output_parsers import BaseOutputParser
 
+from Utils.LLMCache import cached
 from Utils.PrintUtils import color_print, CODE_COLOR
 from Utils.PromptTemplateBuilder import PromptTemplateBuilder
 # from Utils.PythonExecUtil import execute_python_code
 from langchain_openai import ChatOpenAI
+from .AnalysisCodeCache import AnalysisCodeCache
+from .CodeExecutor import CodeExecutor, InProcessExecutor
 from .ExcelTool import get_first_n_rows, get_column_names
-from langchain_experimental.utilities import PythonREPL
 
 
 class PythonCodeParser(BaseOutputParser):
@@ -36,16 +40,41 @@ class PythonCodeParser(BaseOutputParser):
 
 class ExcelAnalyser:
 
-    def __init__(self, prompts_path, prompt_file="excel_analyser.json", verbose=False):
+    def __init__(self, prompts_path, prompt_file="excel_analyser.json", verbose=False,
+                 executor: Union[CodeExecutor, Callable[[], CodeExecutor]] = None, timeout=None,
+                 code_cache: AnalysisCodeCache = None):
+        """
+        executor 执行生成的代码，默认在当前进程中执行；WorkerPoolExecutor 在预热的进程池中执行。
+        也可以传入创建 executor 的函数，工具第一次执行、实例化这个类时才调用，启动时不创建进程池
+        code_cache 缓存执行成功的代码，同样的问题和同样结构的文件不再调用llm生成代码
+        """
         self.prompt = PromptTemplateBuilder(prompts_path, prompt_file).build()
         self.verbose = verbose
+        if executor is not None and not isinstance(executor, CodeExecutor):
+            executor = executor()
+        self.executor = executor or InProcessExecutor()
+        self.timeout = timeout
+        self.code_cache = code_cache
 
-    def analyse(self, query, filename):
+    def analyse(self, query: str, filename: str):
 
         """分析一个结构化文件（例如excel文件）的内容。"""
 
+        cache_key = None
+        if self.code_cache is not None:
+            cache_key = self.code_cache.key(query, filename)
+            code = self.code_cache.get(cache_key, filename)
+            if code is not None:
+                if self.verbose:
+                    color_print("\n# 复用缓存的分析代码\n" + code, CODE_COLOR)
+                result = self.executor.execute(code, timeout=self.timeout)
+                if result.ok:
+                    return result.output
+                # 缓存的代码不适用于这个文件，删除后重新生成
+                self.code_cache.evict(cache_key)
+
         # columns = get_column_names(filename)
-        inspections = get_first_n_rows(filename, 3)
+        inspections = get_first_n_rows(filename, n=3)
 
         llm = ChatOpenAI(
             model="gpt-3.5-turbo",
@@ -56,7 +85,7 @@ class ExcelAnalyser:
             },
         )
 
-        chain = self.prompt | llm | PythonCodeParser()
+        chain = self.prompt | cached(llm) | PythonCodeParser()
 
         code = ""
 
@@ -73,8 +102,11 @@ class ExcelAnalyser:
             code += c
 
         if code:
-            ans = PythonREPL().run(code)
-            return ans
+            # 生成的代码中的 pd.read_excel 复用已经解析好的数据
+            result = self.executor.execute(code, timeout=self.timeout)
+            if result.ok and self.code_cache is not None:
+                self.code_cache.put(cache_key, filename, code)
+            return result.output
         else:
             return "没有找到可执行的Python代码"
 
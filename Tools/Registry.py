@@ -0,0 +1,194 @@
+import importlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# 参数没有默认值时使用的标记
+REQUIRED = ...
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", dict: "object", list: "array"}
+
+
+@dataclass(frozen=True)
+class ToolArg:
+    name: str
+    type: type = str
+    default: Any = REQUIRED
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """
+    工具的静态描述：名称、说明、参数，以及实现的位置 "模块:属性"。
+    只读取这些信息不会导入实现模块；target 是类时，用 init_kwargs 实例化后取 method 作为工具函数。
+    """
+    name: str
+    description: str
+    target: str
+    args: Tuple[ToolArg, ...] = ()
+    method: Optional[str] = None
+    returns: Optional[type] = str
+
+    @property
+    def signature(self) -> str:
+        """与 StructuredTool.from_function 生成的描述保持一致，例如 AskDocument(filename: str, query: str) -> str"""
+        params = []
+        for arg in self.args:
+            param = f"{arg.name}: {arg.type.__name__}"
+            if arg.default is not REQUIRED:
+                param += f" = {arg.default!r}"
+            params.append(param)
+        returns = f" -> {self.returns.__name__}" if self.returns is not None else ""
+        return f"{self.name}({', '.join(params)}){returns}"
+
+    @property
+    def args_schema(self) -> Dict[str, dict]:
+        """参数的 json schema（与 BaseTool.args 格式相同）"""
+        schema = {}
+        for arg in self.args:
+            prop = {"title": arg.name.replace("_", " ").title(), "type": _JSON_TYPES.get(arg.type, "string")}
+            if arg.default is not REQUIRED:
+                prop["default"] = arg.default
+            schema[arg.name] = prop
+        return schema
+
+
+TOOL_SPECS: Dict[str, ToolSpec] = {spec.name: spec for spec in [
+    ToolSpec(
+        name="AskDocument",
+        description="根据一个Word或PDF文档的内容，回答一个问题。考虑上下文信息，确保问题对相关概念的定义表述完整。",
+        target="Tools.FileQATool:ask_docment",
+        args=(ToolArg("filename"), ToolArg("query")),
+    ),
+    ToolSpec(
+        name="GenerateDocument",
+        description="根据需求描述生成一篇正式文档",
+        target="Tools.WriterTool:write",
+        args=(ToolArg("query"),),
+        returns=None,
+    ),
+    ToolSpec(
+        name="SendEmail",
+        description="给指定的邮箱发送邮件。确保邮箱地址是xxx@xxx.xxx的格式。多个邮箱地址以';'分割。",
+        target="Tools.EmailTool:send_email",
+        args=(ToolArg("to"), ToolArg("subject"), ToolArg("body"), ToolArg("cc", default=None),
+              ToolArg("bcc", default=None)),
+    ),
+    ToolSpec(
+        name="InspectExcel",
+        description="探查表格文件的内容和结构，展示它的列名和前n行，n默认为3",
+        target="Tools.ExcelTool:get_first_n_rows",
+        args=(ToolArg("file_name"), ToolArg("sheet_index", int, 0), ToolArg("n", int, 3)),
+    ),
+    ToolSpec(
+        name="ListDirectory",
+        description="探查文件夹的内容和结构，展示文件和文件夹的名称、大小和修改时间。depth是递归的层数，"
+                    "pattern是文件名的通配符（例如*.pdf），sort可以是name、size或mtime，每次最多返回limit项，"
+                    "结果不完整时用返回的cursor查看下一页",
+        target="Tools.FileTools:list_files_in_directory",
+        args=(ToolArg("path"), ToolArg("depth", int, 1), ToolArg("pattern", default=None),
+              ToolArg("sort", default="name"), ToolArg("limit", int, 100), ToolArg("cursor", int, 0)),
+    ),
+    ToolSpec(
+        name="FINISH",
+        description="用于表示任务完成的占位符工具",
+        target="Tools.Registry:finish",
+        returns=None,
+    ),
+    ToolSpec(
+        name="AnalyseExcel",
+        description="通过程序脚本分析一个结构化文件（例如excel文件）的内容。输人中必须包含文件的完整路径和具体分析方式和分析依据，阈值常量等。如果输入信息不完整，你可以拒绝回答。",
+        target="Tools.PythonTool:ExcelAnalyser",
+        method="analyse",
+        args=(ToolArg("query"), ToolArg("filename")),
+        returns=None,
+    ),
+    ToolSpec(
+        name="SearchDocuments",
+        description="在一个文件夹下所有的PDF、Word和Excel文件中检索与问题相关的段落，按相关度返回段落及其所在的文件和页码（或工作表和行号）。"
+                    "不确定信息在哪个文件中，或者问题涉及多个文件时使用。path是要检索的文件夹，k是返回的段落数",
+        target="Tools.CorpusIndex:search_documents",
+        args=(ToolArg("query"), ToolArg("path"), ToolArg("k", int, 5)),
+    ),
+    ToolSpec(
+        name="ReadObservation",
+        description="按页查看一个被截断的工具结果的完整内容。handle是结果中给出的文件路径，page从1开始",
+        target="AutoAgent.ObservationStore:read_observation",
+        args=(ToolArg("handle"), ToolArg("page", int, 1)),
+    ),
+]}
+
+
+# fast_finish 模式下使用的 FINISH：answer 会直接作为回复，只有这时才在提示词中说明这个参数
+FINISH_WITH_ANSWER = ToolSpec(
+    name="FINISH",
+    description="用于表示任务完成的占位符工具。如果已经得到了可以直接回复用户的完整答案，把答案放在answer中，否则省略answer",
+    target="Tools.Registry:finish",
+    args=(ToolArg("answer", default=None),),
+    returns=None,
+)
+
+
+def finish(answer: Optional[str] = None):
+    """FINISH 占位符工具的实现，answer 由 AutoGPT 在 fast_finish 模式下直接作为回复"""
+    return None
+
+
+class _LazyCallable:
+    """第一次调用时才导入工具的实现模块"""
+
+    def __init__(self, spec: ToolSpec, init_kwargs: Dict[str, Any]):
+        self.spec = spec
+        self.init_kwargs = init_kwargs
+        self._func = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        with self._lock:
+            if self._func is None:
+                module_name, attr = self.spec.target.split(":")
+                target = getattr(importlib.import_module(module_name), attr)
+                if self.spec.method is not None:
+                    target = getattr(target(**self.init_kwargs), self.spec.method)
+                self._func = target
+            return self._func
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+
+def tool_names() -> List[str]:
+    return list(TOOL_SPECS)
+
+
+def get_tool(name: str, **init_kwargs):
+    """
+    按名称构建工具。返回的 StructuredTool 带有完整的名称、描述和参数 schema，
+    但实现模块（以及 Chroma、pandas 等重量级依赖）要到第一次执行时才导入。
+    init_kwargs 用于实例化以类实现的工具，例如 AnalyseExcel 的 prompts_path。
+    """
+    return build_tool(TOOL_SPECS[name], **init_kwargs)
+
+
+def build_tool(spec: ToolSpec, **init_kwargs):
+    """按 ToolSpec 构建工具，用于不在 TOOL_SPECS 中的变体，例如 FINISH_WITH_ANSWER"""
+    from langchain_core.pydantic_v1 import create_model
+    from langchain_core.tools import StructuredTool
+
+    fields = {
+        arg.name: (Optional[arg.type] if arg.default is None else arg.type, arg.default)
+        for arg in spec.args
+    }
+    return StructuredTool(
+        name=spec.name,
+        description=f"{spec.signature} - {spec.description}",
+        func=_LazyCallable(spec, init_kwargs),
+        args_schema=create_model(f"{spec.name}Schema", **fields),
+    )
+
+
+def preload(*names: str):
+    """导入工具的实现模块，用于对比懒加载节省的启动时间"""
+    for name in names or tool_names():
+        spec = TOOL_SPECS[name]
+        importlib.import_module(spec.target.split(":")[0])
@@ -1,49 +1,23 @@
 import warnings
 
-from pydantic import Field
+warnings.filterwarnings("ignore")
+from .Registry import FINISH_WITH_ANSWER, build_tool, get_tool
 
-from .FileTools import list_files_in_directory
+# 工具的实现模块在第一次执行时才导入，见 Registry.py
+document_qa_tool = get_tool("AskDocument")
 
-warnings.filterwarnings("ignore")
-from langchain.agents import Tool
-from langchain.tools import StructuredTool
-from .FileQATool import ask_docment
-from .WriterTool import write
-from .EmailTool import send_email
-from .ExcelTool import get_first_n_rows, get_column_names
-
-document_qa_tool = StructuredTool.from_function(
-    func=ask_docment,
-    name="AskDocument",
-    description="根据一个Word或PDF文档的内容，回答一个问题。考虑上下文信息，确保问题对相关概念的定义表述完整。",
-)
-
-document_generation_tool = StructuredTool.from_function(
-    func=write,
-    name="GenerateDocument",
-    description="根据需求描述生成一篇正式文档",
-)
-
-email_tool = StructuredTool.from_function(
-    func=send_email,
-    name="SendEmail",
-    description="给指定的邮箱发送邮件。确保邮箱地址是xxx@xxx.xxx的格式。多个邮箱地址以';'分割。",
-)
-
-excel_inspection_tool = StructuredTool.from_function(
-    func=get_first_n_rows,
-    name="InspectExcel",
-    description="探查表格文件的内容和结构，展示它的列名和前n行，n默认为3",
-)
-
-directory_inspection_tool = StructuredTool.from_function(
-    func=list_files_in_directory,
-    name="ListDirectory",
-    description="探查文件夹的内容和结构，展示它的文件名和文件夹名",
-)
-
-finish_placeholder = StructuredTool.from_function(
-    func=lambda: None,
-    name="FINISH",
-    description="用于表示任务完成的占位符工具"
-)
+corpus_search_tool = get_tool("SearchDocuments")
+
+document_generation_tool = get_tool("GenerateDocument")
+
+email_tool = get_tool("SendEmail")
+
+excel_inspection_tool = get_tool("InspectExcel")
+
+directory_inspection_tool = get_tool("ListDirectory")
+
+finish_placeholder = get_tool("FINISH")
+
+finish_with_answer_placeholder = build_tool(FINISH_WITH_ANSWER)
+
+observation_reader_tool = get_tool("ReadObservation")
@@ -0,0 +1,132 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Union
+
+import pandas as pd
+
+# 保存原始的 read_excel，打补丁期间缓存本身仍需要真正读取文件
+_pd_read_excel = pd.read_excel
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class WorkbookCache:
+    """
+    进程内共享的excel解析结果缓存。
+
+    以 (文件绝对路径, mtime, 工作表名) 为键缓存解析后的 DataFrame，
+    总内存超过 max_bytes 时按最近最少使用淘汰。文件被修改后 mtime 变化，旧条目自动失效。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()
+        self._sizes = {}
+        self._sheet_names = {}
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._patch_depth = 0
+
+    @staticmethod
+    def _file_key(file_name):
+        path = os.path.abspath(file_name)
+        return path, os.stat(path).st_mtime_ns
+
+    def _purge_stale(self, path, mtime):
+        """删除同一文件旧版本的缓存"""
+        for key in [k for k in self._frames if k[0] == path and k[1] != mtime]:
+            self._drop(key)
+        for key in [k for k in self._sheet_names if k[0] == path and k[1] != mtime]:
+            del self._sheet_names[key]
+
+    def _drop(self, key):
+        self._frames.pop(key)
+        self._total_bytes -= self._sizes.pop(key)
+
+    def _store(self, key, df: pd.DataFrame):
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return
+        self._frames[key] = df
+        self._sizes[key] = size
+        self._total_bytes += size
+        while self._total_bytes > self.max_bytes:
+            self._drop(next(iter(self._frames)))
+
+    def _load(self, path, mtime, sheet):
+        """只打开一次工作簿，同时取得工作表名称和指定工作表的数据"""
+        with pd.ExcelFile(path) as excel_file:
+            sheet_names = excel_file.sheet_names
+            self._sheet_names[(path, mtime)] = sheet_names
+            if sheet is None:
+                return sheet_names, None
+            sheet_name = sheet_names[sheet] if isinstance(sheet, int) else sheet
+            df = excel_file.parse(sheet_name=sheet_name)
+        self._store((path, mtime, sheet_name), df)
+        return sheet_names, df
+
+    def sheet_names(self, file_name: str) -> List[str]:
+        """取得工作簿中所有工作表的名称"""
+        path, mtime = self._file_key(file_name)
+        with self._lock:
+            self._purge_stale(path, mtime)
+            if (path, mtime) in self._sheet_names:
+                return self._sheet_names[(path, mtime)]
+            sheet_names, _ = self._load(path, mtime, None)
+            return sheet_names
+
+    def get_frame(self, file_name: str, sheet: Union[int, str] = 0) -> pd.DataFrame:
+        """
+        取得工作表解析后的 DataFrame，sheet 可以是下标或名称。
+        返回的是缓存中的对象，调用方不可修改。
+        """
+        path, mtime = self._file_key(file_name)
+        with self._lock:
+            self._purge_stale(path, mtime)
+            sheet_names = self._sheet_names.get((path, mtime))
+            if sheet_names is not None:
+                sheet_name = sheet_names[sheet] if isinstance(sheet, int) else sheet
+                key = (path, mtime, sheet_name)
+                if key in self._frames:
+                    self._frames.move_to_end(key)
+                    return self._frames[key]
+            _, df = self._load(path, mtime, sheet)
+            return df
+
+    def read_excel(self, io, sheet_name=0, *args, **kwargs):
+        """
+        与 pd.read_excel 兼容的读取函数。
+        只有按路径读取单个工作表、且没有其他解析参数时才走缓存，并返回副本以免污染缓存。
+        """
+        if args or kwargs or not isinstance(io, (str, os.PathLike)) \
+                or not isinstance(sheet_name, (int, str)):
+            return _pd_read_excel(io, sheet_name, *args, **kwargs)
+        return self.get_frame(os.fspath(io), sheet_name).copy()
+
+    @contextmanager
+    def patched_read_excel(self):
+        """在上下文中把 pd.read_excel 替换为缓存版本，供执行生成的分析代码时使用"""
+        with self._lock:
+            if self._patch_depth == 0:
+                pd.read_excel = self.read_excel
+            self._patch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._patch_depth -= 1
+                if self._patch_depth == 0:
+                    pd.read_excel = _pd_read_excel
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._sizes.clear()
+            self._sheet_names.clear()
+            self._total_bytes = 0
+
+
+# 进程级共享实例，InspectExcel、AnalyseExcel 以及 REPL 中的代码都从这里取数据
+workbook_cache = WorkbookCache()
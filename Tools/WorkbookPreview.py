@@ -0,0 +1,107 @@
+import functools
+import os
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+# openpyxl 可以只读流式读取的格式，其他格式（xls、ods）仍由 pandas 完整解析
+STREAMING_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+@dataclass(frozen=True)
+class SheetPreview:
+    sheet_names: Tuple[str, ...]
+    sheet_name: str
+    columns: Tuple[str, ...]
+    rows: Tuple[Tuple[Any, ...], ...]
+    # 工作表元数据中记录的数据行数（不含表头）和列数，没有记录或记录不可靠时为 None
+    n_rows: Optional[int]
+    n_columns: Optional[int]
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(list(self.rows), columns=list(self.columns))
+
+
+def _column_names(header) -> List[str]:
+    """与 pd.read_excel 的列名一致：空列名为 Unnamed: i，重复的列名加 .1、.2 后缀"""
+    names = []
+    seen = {}
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _read_head(sheet, n: int):
+    rows = sheet.iter_rows(max_row=n + 1, values_only=True)
+    header = next(rows, ())
+    columns = _column_names(header)
+    width = len(columns)
+    # 没有 dimension 记录时行不会补齐到同样的列数
+    data = tuple(tuple(row[:width]) + (None,) * (width - len(row)) for row in rows)
+    return header, columns, data
+
+
+def _dimension_reliable(sheet) -> bool:
+    """ 有的程序不写 dimension 记录，或者只写 A1 """
+    return sheet.max_row is not None and sheet.max_column is not None and (sheet.max_row, sheet.max_column) != (1, 1)
+
+
+@functools.lru_cache(maxsize=64)
+def _preview_xlsx(path: str, mtime: int, sheet_index: int, n: int) -> SheetPreview:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[sheet_index]
+        # 只读模式下 max_row / max_column 来自工作表的 dimension 记录，不需要遍历数据。
+        # iter_rows 也按记录截断列，记录不可靠时先去掉记录再读取，行列数不再报告
+        reliable = _dimension_reliable(sheet)
+        if not reliable:
+            sheet.reset_dimensions()
+        header, columns, data = _read_head(sheet, n)
+        if reliable and len(data) + 1 > sheet.max_row:
+            # 读到的行比记录的还多，记录已经过期
+            reliable = False
+            sheet.reset_dimensions()
+            header, columns, data = _read_head(sheet, n)
+        return SheetPreview(
+            sheet_names=tuple(workbook.sheetnames),
+            sheet_name=sheet.title,
+            columns=tuple(columns),
+            rows=data,
+            n_rows=sheet.max_row - 1 if reliable and header else None,
+            n_columns=sheet.max_column if reliable else None,
+        )
+    finally:
+        workbook.close()
+
+
+def preview_sheet(file_name: str, sheet_index: int = 0, n: int = 3) -> SheetPreview:
+    """
+    读取工作表的表头和前 n 行，以及元数据中的行列数。
+    xlsx 以 openpyxl 只读模式逐行读取，耗时和内存与表格大小无关；结果按 (文件, mtime, 工作表, n) 缓存，
+    文件以真实路径为键，批量任务工作目录中的符号链接共用原文件的缓存。
+    """
+    path = os.path.realpath(file_name)
+    if path.lower().endswith(STREAMING_EXTENSIONS):
+        return _preview_xlsx(path, os.stat(path).st_mtime_ns, sheet_index, n)
+
+    from .WorkbookCache import workbook_cache
+
+    sheet_names = workbook_cache.sheet_names(path)
+    df = workbook_cache.get_frame(path, sheet_index)
+    return SheetPreview(
+        sheet_names=tuple(sheet_names),
+        sheet_name=sheet_names[sheet_index],
+        columns=tuple(str(column) for column in df.columns),
+        rows=tuple(df.head(n).itertuples(index=False, name=None)),
+        n_rows=len(df),
+        n_columns=len(df.columns),
+    )
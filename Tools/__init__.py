@@ -18,9 +18,19 @@
 #  limitations under the License.
 from .Tools import (
     document_qa_tool,
+    corpus_search_tool,
     document_generation_tool,
     email_tool,
     excel_inspection_tool,
     directory_inspection_tool,
     finish_placeholder,
-)
\ No newline at end of file
+    finish_with_answer_placeholder,
+    observation_reader_tool,
+)
+from .Registry import (
+    TOOL_SPECS,
+    ToolSpec,
+    build_tool,
+    get_tool,
+    tool_names,
+)
@@ -0,0 +1,169 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Dict, Optional, Set, Tuple
+
+
+def _flush_at_exit(ref):
+    """ 进程退出前写入还在缓冲中的修改；缓存已经被回收时什么都不做 """
+    flush = ref()
+    if flush is not None:
+        flush()
+
+
+class DiskCache:
+    """
+    key-value store on a local sqlite file with ttl and size bounded lru eviction.
+
+    values are strings, callers serialise their own payloads (json, text). reads refresh the access time, entries
+    older than ttl seconds are dropped when read, and once there are more than max_entries rows the least
+    recently accessed ones are deleted. safe to share between threads; several processes may open the same file.
+
+    reads don't write to the file: access times and expired keys are kept in memory. they are written together
+    with new values in one transaction once flush_every changes are buffered or flush_interval seconds have passed,
+    and on flush(), stats(), close() and at exit. other processes see new values after that flush.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: int = 10000,
+                 flush_every: int = 32, flush_interval: float = 1.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # 还没有写入文件的修改：新的值、读取时刷新的访问时间、读取时发现过期的键
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._accessed: Dict[str, float] = {}
+        self._expired: Set[str] = set()
+        self._last_flush = time.monotonic()
+        self._closed = False
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        atexit.register(_flush_at_exit, weakref.WeakMethod(self.flush))
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            if key in self._pending:
+                value, created = self._pending[key]
+                row = (value, created)
+            elif key in self._expired:
+                row = None
+            else:
+                row = self._conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._pending.pop(key, None)
+                self._expired.add(key)
+                row = None
+            if row is None:
+                self.misses += 1
+            else:
+                self._accessed[key] = now
+                self.hits += 1
+            self._maybe_flush()
+            return row[0] if row is not None else None
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._pending[key] = (value, now)
+            self._accessed.pop(key, None)
+            self._expired.discard(key)
+            self._maybe_flush()
+
+    def _maybe_flush(self):
+        changes = len(self._pending) + len(self._accessed) + len(self._expired)
+        if changes and (changes >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval):
+            self._flush()
+
+    def flush(self) -> None:
+        """ write the buffered values, access times and expired keys in one transaction """
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if self._closed or not (self._pending or self._accessed or self._expired):
+            return
+        with self._conn:
+            self._conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in self._expired])
+            self._conn.executemany(
+                "UPDATE cache SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._conn.executemany(
+                "INSERT INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, created = excluded.created, "
+                "accessed = excluded.accessed",
+                [(key, value, created, created) for key, (value, created) in self._pending.items()],
+            )
+            if self._pending or self._expired:
+                self._count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if self._count > self.max_entries:
+                self._evict()
+        self._pending.clear()
+        self._accessed.clear()
+        self._expired.clear()
+
+    def _evict(self):
+        """ delete the least recently accessed rows, the count is re-read since other processes may write too """
+        self._count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        excess = self._count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)", (excess,)
+            )
+            self._count -= excess
+            self.evictions += excess
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            self._accessed.pop(key, None)
+            self._expired.discard(key)
+            if self._conn.execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount:
+                self._count -= 1
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._accessed.clear()
+            self._expired.clear()
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+            self._count = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._flush()
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._count,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._closed = True
+            self._conn.close()
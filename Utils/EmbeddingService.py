@@ -0,0 +1,215 @@
+import base64
+import hashlib
+import os
+import queue
+import threading
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Union
+
+from langchain_core.embeddings import Embeddings
+
+from Utils.DiskCache import DiskCache
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "embeddings.sqlite")
+DEFAULT_MODEL = "text-embedding-ada-002"
+
+# 进程内共享的服务，长时记忆和文档问答使用同一个
+_default_service: Optional["EmbeddingService"] = None
+_default_lock = threading.Lock()
+
+
+def _openai_embeddings() -> Embeddings:
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(model=DEFAULT_MODEL)
+
+
+def configure_embedding_service(embedding: Optional[Embeddings] = None, **kwargs) -> "EmbeddingService":
+    """ create the shared service, embedding defaults to OpenAIEmbeddings with DEFAULT_MODEL created on first use """
+    global _default_service
+    if embedding is None:
+        embedding = _openai_embeddings
+        kwargs.setdefault("model_name", DEFAULT_MODEL)
+    with _default_lock:
+        _default_service = EmbeddingService(embedding, **kwargs)
+        return _default_service
+
+
+def get_embedding_service() -> "EmbeddingService":
+    """ the shared service, configured with the defaults on first use """
+    with _default_lock:
+        service = _default_service
+    return service if service is not None else configure_embedding_service()
+
+
+def _encode(vector: List[float]) -> str:
+    return base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+
+
+def _decode(value: str) -> List[float]:
+    vector = array("f")
+    vector.frombytes(base64.b64decode(value))
+    return vector.tolist()
+
+
+class EmbeddingService(Embeddings):
+    """
+    embedding with a content hash keyed disk cache, request coalescing and micro batching.
+
+    every text is looked up in the cache first; a text that is already being embedded shares the pending result
+    instead of being sent again. the remaining texts from all concurrent callers are queued, a background thread
+    groups them into batches of up to max_batch_size (waiting at most max_wait seconds for a batch to fill) and
+    at most max_concurrency batches are sent to the underlying model at the same time. stats() reports the hit
+    rate and batch sizes.
+
+    embedding can also be a factory, called when the first text has to be embedded; model_name is then required
+    since it is part of the cache key.
+    """
+
+    def __init__(
+            self,
+            embedding: Union[Embeddings, Callable[[], Embeddings]],
+            cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+            max_batch_size: int = 64,
+            max_concurrency: int = 4,
+            max_wait: float = 0.005,
+            max_entries: int = 200000,
+            model_name: Optional[str] = None,
+    ):
+        self._embedding = embedding
+        self._lock = threading.Lock()
+        if model_name is None:
+            model_name = getattr(self.embedding, "model", None) or type(self.embedding).__name__
+        self.model_name = model_name
+        self.cache = DiskCache(cache_path, max_entries=max_entries) if cache_path else None
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._inflight = {}
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embedding")
+        self._batcher = None
+        self._stats = Counter()
+        self._batch_sizes = Counter()
+
+    @property
+    def embedding(self) -> Embeddings:
+        with self._lock:
+            if not isinstance(self._embedding, Embeddings):
+                self._embedding = self._embedding()
+            return self._embedding
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _submit(self, text: str) -> Future:
+        key = self._key(text)
+        with self._lock:
+            self._stats["requests"] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future
+
+        value = self.cache.get(key) if self.cache is not None else None
+        if value is not None:
+            self._count("cache_hits")
+            future = Future()
+            future.set_result(_decode(value))
+            return future
+
+        with self._lock:
+            # 查询缓存期间可能已有相同文本进入队列
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future
+            future = Future()
+            self._inflight[key] = future
+            if self._batcher is None:
+                self._batcher = threading.Thread(target=self._run_batcher, name="embedding-batcher", daemon=True)
+                self._batcher.start()
+        self._queue.put((key, text, future))
+        return future
+
+    def _run_batcher(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # 并发数已满时在这里等待，期间到达的请求会进入下一个批次
+            self._slots.acquire()
+            try:
+                self._pool.submit(self._embed_batch, batch)
+            except Exception as e:
+                # 解释器退出时线程池已经关闭，等待结果的调用方不能一直阻塞
+                self._slots.release()
+                self._count("errors")
+                for key, _, future in batch:
+                    self._finish(key)
+                    future.set_exception(e)
+
+    def _embed_batch(self, batch):
+        try:
+            vectors = self.embedding.embed_documents([text for _, text, _ in batch])
+        except Exception as e:
+            self._count("errors")
+            for key, _, future in batch:
+                self._finish(key)
+                future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["embedded"] += len(batch)
+            self._batch_sizes[len(batch)] += 1
+        for (key, _, future), vector in zip(batch, vectors):
+            if self.cache is not None:
+                self.cache.set(key, _encode(vector))
+            self._finish(key)
+            future.set_result(vector)
+
+    def _finish(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        futures = [self._submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit(text).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            batch_sizes = dict(self._batch_sizes)
+        requests = stats.get("requests", 0)
+        batches = stats.get("batches", 0)
+        return {
+            "requests": requests,
+            "cache_hits": stats.get("cache_hits", 0),
+            "coalesced": stats.get("coalesced", 0),
+            "hit_rate": (stats.get("cache_hits", 0) + stats.get("coalesced", 0)) / requests if requests else None,
+            "embedded": stats.get("embedded", 0),
+            "batches": batches,
+            "mean_batch_size": stats.get("embedded", 0) / batches if batches else None,
+            "batch_sizes": batch_sizes,
+            "errors": stats.get("errors", 0),
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from Utils.DiskCache import DiskCache
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite")
+
+# 进程内默认的缓存，configure_llm_cache 之前 cached() 不做任何包装
+_default_cache: Optional[DiskCache] = None
+
+
+def configure_llm_cache(
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: Optional[float] = 7 * 24 * 3600,
+        max_entries: int = 10000,
+) -> DiskCache:
+    """ enable the response cache for every llm wrapped by cached() """
+    global _default_cache
+    _default_cache = DiskCache(path, ttl=ttl, max_entries=max_entries)
+    return _default_cache
+
+
+def llm_cache_stats() -> Optional[dict]:
+    """ hit/miss statistics of the default cache, None if it is not configured """
+    return _default_cache.stats() if _default_cache is not None else None
+
+
+def cached(llm, cache: Optional[DiskCache] = None):
+    """
+    wrap a chat model or completion llm with the response cache, returns llm unchanged if there is no cache or
+    the model is not deterministic (temperature other than 0)
+    """
+    cache = cache or _default_cache
+    if cache is None or getattr(llm, "temperature", 0) != 0:
+        return llm
+    return CachedLLM(llm, cache)
+
+
+class CachedLLM(Runnable):
+    """
+    exact match response cache in front of a language model, usable anywhere the model is used in a chain.
+
+    entries are keyed on the model, its parameters (temperature, seed ...), the stop words and the rendered prompt.
+    invoke and stream share entries; a hit on stream replays the cached text in small chunks so streaming consumers
+    (e.g. verbose color_print) behave the same. a stream that the consumer stops early is not cached, since the text
+    is incomplete; a caller that knows the prefix it received is a complete answer stores it with store().
+    """
+
+    def __init__(self, llm, cache: DiskCache, replay_chunk_size: int = 16):
+        self.llm = llm
+        self.cache = cache
+        self.replay_chunk_size = replay_chunk_size
+        self.is_chat_model = isinstance(llm, BaseChatModel)
+
+    def _key(self, input: Any, **kwargs) -> str:
+        prompt = self.llm._convert_input(input)
+        if self.is_chat_model:
+            rendered = [[m.type, m.content] for m in prompt.to_messages()]
+        else:
+            rendered = prompt.to_string()
+        params = sorted((k, repr(v)) for k, v in self.llm.dict().items())
+        payload = json.dumps([params, sorted((k, repr(v)) for k, v in kwargs.items()), rendered], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _output(self, text: str):
+        return AIMessage(content=text) if self.is_chat_model else text
+
+    def _chunk(self, text: str):
+        return AIMessageChunk(content=text) if self.is_chat_model else text
+
+    def _replay(self, text: str) -> Iterator:
+        for i in range(0, len(text), self.replay_chunk_size):
+            yield self._chunk(text[i:i + self.replay_chunk_size])
+
+    @staticmethod
+    def _text(output) -> str:
+        return output if isinstance(output, str) else output.content
+
+    def store(self, input: Any, text: str, **kwargs: Any):
+        """ cache text as the complete response to input, e.g. the accepted prefix of a stream that was stopped """
+        self.cache.set(self._key(input, **kwargs), text)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        key = self._key(input, **kwargs)
+        text = self.cache.get(key)
+        if text is None:
+            text = self._text(self.llm.invoke(input, config, **kwargs))
+            self.cache.set(key, text)
+        return self._output(text)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        key = self._key(input, **kwargs)
+        text = self.cache.get(key)
+        if text is None:
+            text = self._text(await self.llm.ainvoke(input, config, **kwargs))
+            self.cache.set(key, text)
+        return self._output(text)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator:
+        key = self._key(input, **kwargs)
+        text = self.cache.get(key)
+        if text is not None:
+            yield from self._replay(text)
+            return
+        received = []
+        # 调用方提前停止读取时 GeneratorExit 从 yield 处抛出，不会执行到最后的写入
+        for chunk in self.llm.stream(input, config, **kwargs):
+            received.append(self._text(chunk))
+            yield chunk
+        self.cache.set(key, "".join(received))
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator:
+        key = self._key(input, **kwargs)
+        text = self.cache.get(key)
+        if text is not None:
+            for chunk in self._replay(text):
+                yield chunk
+            return
+        received = []
+        async for chunk in self.llm.astream(input, config, **kwargs):
+            received.append(self._text(chunk))
+            yield chunk
+        self.cache.set(key, "".join(received))
@@ -22,28 +22,66 @@
 
 import json
 import os
-import tempfile
+import threading
 from typing import Optional, List
 
 from langchain.output_parsers import PydanticOutputParser
 from langchain.tools.render import render_text_description
 from langchain_core.output_parsers import BaseOutputParser
-from langchain_core.prompts import load_prompt, BasePromptTemplate, PipelinePromptTemplate
+from langchain_core.prompts import BasePromptTemplate, PipelinePromptTemplate
+from langchain_core.prompts.loading import load_prompt_from_config
 from langchain_core.tools import BaseTool, Tool
 
 from AutoAgent.Action import Action
 
+# 编译后的模板缓存：键为 (目录, 文件, 工具集, 输出解析器)，值为 (模板, 依赖文件签名)
+_compiled_templates = {}
+# 以文件 mtime 为版本的文件内容缓存
+_file_cache = {}
+# 以目录 mtime 为版本的目录文件列表缓存
+_dir_cache = {}
+# 工具描述与格式说明的渲染结果缓存
+_tools_prompts = {}
+_format_instructions = {}
+_cache_lock = threading.RLock()
+
+
+def _mtime(filename):
+    try:
+        return os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
 
 def _load_file(filename):
     """ Loads a file into a string."""
-    if not os.path.exists(filename):
+    mtime = _mtime(filename)
+    if mtime is None:
         raise FileExistsError(f"File {filename} not found.")
-    f = open(filename, 'r', encoding='utf-8')
-    s = f.read()
-    f.close()
+    with _cache_lock:
+        cached = _file_cache.get(filename)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    with open(filename, 'r', encoding='utf-8') as f:
+        s = f.read()
+    with _cache_lock:
+        _file_cache[filename] = (mtime, s)
     return s
 
 
+def _list_dir(path):
+    """ list file names in a directory, cached until the directory changes """
+    mtime = _mtime(path)
+    with _cache_lock:
+        cached = _dir_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    names = frozenset(os.listdir(path)) if mtime is not None else frozenset()
+    with _cache_lock:
+        _dir_cache[path] = (mtime, names)
+    return names
+
+
 def _chinese_friendly(param):
     """ make sure that you can't transfer chinese char to 0xxxx """
     lines = param.split("\n")
@@ -56,82 +94,132 @@ def _chinese_friendly(param):
     return "\n".join(lines)
 
 
+def _tools_key(tools):
+    if tools is None:
+        return None
+    return tuple((tool.name, tool.description, str(tool.args)) for tool in tools)
+
+
+def _parser_key(parser):
+    if parser is None:
+        return None
+    return type(parser), getattr(parser, "pydantic_object", None) or id(parser)
+
+
+def _render_tools(tools):
+    """ render the tools description once per tool set """
+    key = _tools_key(tools)
+    with _cache_lock:
+        if key not in _tools_prompts:
+            _tools_prompts[key] = render_text_description(tools)
+        return _tools_prompts[key]
+
+
+def _render_format_instructions(parser):
+    """ render the format instructions once per parser type """
+    key = _parser_key(parser)
+    with _cache_lock:
+        if key not in _format_instructions:
+            _format_instructions[key] = _chinese_friendly(parser.get_format_instructions())
+        return _format_instructions[key]
+
+
 class PromptTemplateBuilder:
     def __init__(self,
                  prompt_path: str,
-                 prompt_file: str):
+                 prompt_file: str,
+                 variant: Optional[str] = None):
+        """ variant selects {var}_{variant}.txt / .json over {var}.txt / .json for the sub templates that have one """
         self.prompt_path = prompt_path
         self.prompt_file = prompt_file
+        self.variant = variant
 
-    def _check_or_redirect(self, prompt_file):
-        """ if you use a relative path, it will be redirected to an absolute path"""
-
-        with open(prompt_file, 'r', encoding="utf-8") as f:
-            config = json.load(f)
+    def _load_config(self, prompt_file, dependencies):
+        """ load the json config, the relative template path is loaded into memory instead of a temp file """
+        config = json.loads(_load_file(prompt_file))
+        dependencies.append(prompt_file)
         if "template_path" in config:
+            template_path = config.pop("template_path")
             # 如果是相对路径，则转换为绝对路径
-            if not os.path.isabs(config["template_path"]):
-                config["template_path"] = os.path.join(
-                    self.prompt_path,
-                    config["template_path"])
-                # 生成临时文件
-                tmp_file = tempfile.NamedTemporaryFile(
-                    suffix=".json",
-                    mode="w",
-                    encoding="utf-8",
-                    delete=False)
-                tmp_file.write(json.dumps(config, ensure_ascii=False))
-                tmp_file.close()
-                return tmp_file.name
-        return prompt_file
-
-    def  build(
+            if not os.path.isabs(template_path):
+                template_path = os.path.join(self.prompt_path, template_path)
+            config["template"] = _load_file(template_path)
+            dependencies.append(template_path)
+        return config
+
+    def build(
             self,
             tools: Optional[List[BaseTool]] = None,
             parser: Optional[BaseOutputParser] = None
     ) -> BasePromptTemplate:
-        """ Builds a prompt template. from tools & output parser """
-
+        """ Builds a prompt template. from tools & output parser, compiled templates are cached until files change """
+
+        key = (
+            os.path.abspath(self.prompt_path),
+            self.prompt_file,
+            self.variant,
+            _tools_key(tools),
+            _parser_key(parser),
+        )
+        with _cache_lock:
+            cached = _compiled_templates.get(key)
+        if cached is not None:
+            template, signature = cached
+            if all(_mtime(f) == mtime for f, mtime in signature):
+                return template
+
+        dependencies = [self.prompt_path]
+        template = self._compile(tools, parser, dependencies)
+        signature = tuple((f, _mtime(f)) for f in dependencies)
+        with _cache_lock:
+            _compiled_templates[key] = (template, signature)
+        return template
+
+    def _compile(self, tools, parser, dependencies) -> BasePromptTemplate:
         main_file = os.path.join(self.prompt_path, self.prompt_file)
-        main_prompt_template = load_prompt(
-            self._check_or_redirect(main_file)
+        main_prompt_template = load_prompt_from_config(
+            self._load_config(main_file, dependencies)
         )
 
         variables = main_prompt_template.input_variables
         partial_variables = {}
         recursive_templates = []
+        prompt_files = _list_dir(self.prompt_path)
 
         # 遍历所有变量，检查是否存在对应的模板文件
         for var in variables:
+            name = var
+            # 有对应变体的子模板优先使用变体，例如 constraints_parallel.txt
+            if self.variant is not None and (f"{var}_{self.variant}.json" in prompt_files
+                                             or f"{var}_{self.variant}.txt" in prompt_files):
+                name = f"{var}_{self.variant}"
             # 是否存在嵌套模板
-            if os.path.exists(os.path.join(self.prompt_path, f"{var}.json")):
+            if f"{name}.json" in prompt_files:
                 sub_template = PromptTemplateBuilder(
                     self.prompt_path,
-                    f"{var}.json"
-                ).build(
+                    f"{name}.json",
+                    self.variant,
+                )._compile(
                     tools=tools,
-                    parser=parser
+                    parser=parser,
+                    dependencies=dependencies,
                 )
-                recursive_templates.append(var, sub_template)
-            elif os.path.exists(os.path.join(self.prompt_path, f"{var}.txt")):
-                var_str = _load_file(
-                    os.path.join(self.prompt_path, f"{var}.txt")
-                )
-                partial_variables[var] = var_str
+                recursive_templates.append((var, sub_template))
+            elif f"{name}.txt" in prompt_files:
+                var_file = os.path.join(self.prompt_path, f"{name}.txt")
+                partial_variables[var] = _load_file(var_file)
+                dependencies.append(var_file)
 
         if tools is not None and "tools" in variables:
-            tools_prompt = render_text_description(tools)
-            partial_variables["tools"] = tools_prompt
+            partial_variables["tools"] = _render_tools(tools)
 
         if parser is not None and "format_instructions" in variables:
-            partial_variables["format_instructions"] = _chinese_friendly(
-                parser.get_format_instructions()
-            )
+            partial_variables["format_instructions"] = _render_format_instructions(parser)
 
         if recursive_templates:
             main_prompt_template = PipelinePromptTemplate(
                 final_prompt=main_prompt_template,
-                pipeline_prompt=recursive_templates
+                pipeline_prompts=recursive_templates
             )
         # 将有值的变量填充到模板中
         main_prompt_template = main_prompt_template.partial(**partial_variables)
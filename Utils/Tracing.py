@@ -0,0 +1,183 @@
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+# 当前任务和步骤的标签，随 contextvars 传递到协程以及用 copy_context 提交到线程池的工具调用中
+_tags: contextvars.ContextVar = contextvars.ContextVar("trace_tags", default={})
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def new_task_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class Span:
+    """ 一段计时，退出时交给 tracer 记录；set() 添加属性，异常会记录为 error 属性 """
+
+    __slots__ = ("tracer", "name", "attrs", "start", "_t0")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self._t0 = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def __enter__(self):
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.elapsed(), start=self.start, **self.attrs)
+        return False
+
+
+class Tracer:
+    """
+    记录带有 task_id / step 标签的计时片段。
+
+    每个片段写成 jsonl 的一行（path 为 None 时不写文件），同时按名称累计到直方图中，
+    计数器（例如 token 数）按标签累计；prometheus_text() 输出 Prometheus 文本格式的指标快照。
+    """
+
+    enabled = True
+
+    def __init__(self, path: Optional[str] = None, buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 namespace: str = "autogpt"):
+        self.path = path
+        self.buckets = buckets
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1) if path else None
+        # span 名称 -> [每个桶的计数, 总耗时, 次数]
+        self._histograms: Dict[str, list] = {}
+        self._counters: Dict[Tuple[str, Tuple], float] = defaultdict(float)
+
+    def tag(self, **tags) -> contextvars.Token:
+        """ 为当前上下文中之后的片段添加标签，返回的 token 交给 reset() 恢复 """
+        return _tags.set({**_tags.get(), **tags})
+
+    def reset(self, token: contextvars.Token):
+        _tags.reset(token)
+
+    def span(self, name: str, **attrs) -> Span:
+        return Span(self, name, attrs)
+
+    def record(self, name: str, duration: float, start: Optional[float] = None, **attrs):
+        """ 记录一段已经测量好的耗时 """
+        event = {"name": name, **_tags.get(), "start": start if start is not None else time.time() - duration,
+                 "duration": duration, **attrs}
+        line = json.dumps(event, ensure_ascii=False, default=str) if self._file is not None else None
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += duration
+            histogram[2] += 1
+            if line is not None:
+                self._file.write(line + "\n")
+
+    def count(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def prometheus_text(self) -> str:
+        lines = []
+        with self._lock:
+            histograms = {name: ([*counts], total, n) for name, (counts, total, n) in self._histograms.items()}
+            counters = dict(self._counters)
+
+        metric = f"{self.namespace}_span_seconds"
+        lines.append(f"# HELP {metric} Duration of agent spans.")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, (counts, total, n) in sorted(histograms.items()):
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{metric}_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{span="{name}",le="+Inf"}} {n}')
+            lines.append(f'{metric}_sum{{span="{name}"}} {total}')
+            lines.append(f'{metric}_count{{span="{name}"}} {n}')
+
+        for name in sorted({name for name, _ in counters}):
+            metric = f"{self.namespace}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+                    lines.append(f"{metric}{{{label_text}}} {value:g}" if label_text else f"{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def elapsed(self) -> float:
+        return 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullTracer:
+    """ 不记录任何内容的 tracer，没有配置 tracer 时使用，开销只有一次方法调用 """
+
+    enabled = False
+
+    def tag(self, **tags):
+        return None
+
+    def reset(self, token):
+        pass
+
+    def span(self, name: str, **attrs):
+        return _NULL_SPAN
+
+    def record(self, name: str, duration: float, start: Optional[float] = None, **attrs):
+        pass
+
+    def count(self, name: str, value: float = 1, **labels):
+        pass
+
+    def prometheus_text(self) -> str:
+        return ""
+
+    def close(self):
+        pass
+
+
+NULL_TRACER = NullTracer()
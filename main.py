@@ -18,18 +18,45 @@
 #  limitations under the License.
 # 加载环境变量
 
+import argparse
+import functools
+import sys
+import time
+
+# 启动计时的起点，用于 --profile-startup
+_START = time.perf_counter()
+
 from dotenv import load_dotenv, find_dotenv
 _ = load_dotenv(find_dotenv())
 
 from AutoAgent.AutoGPT import AutoGPT
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.schema import Document
+from AutoAgent.BatchRunner import BatchRunner
+from AutoAgent.Events import FinalChunk, TaskFinished, print_event
+from langchain_openai import ChatOpenAI
 from Tools import *
-from Tools.PythonTool import ExcelAnalyser
+from Tools.AnalysisCodeCache import AnalysisCodeCache
+from Tools.CodeExecutor import WorkerPoolExecutor
+from Tools.Registry import preload
+from Utils.EmbeddingService import configure_embedding_service, get_embedding_service
+from Utils.LLMCache import configure_llm_cache
+from Utils.Tracing import Tracer
+
+# 懒加载的重量级模块，--profile-startup 时检查它们是否在启动阶段被导入
+HEAVY_MODULES = [
+    "chromadb",
+    "langchain_community.vectorstores.chroma",
+    "langchain_community.document_loaders",
+    "langchain.chains",
+    "langchain_experimental",
+    "pandas",
+    "pypdf",
+]
 
+# 执行分析代码的工作进程数
+ANALYSIS_WORKERS = 2
 
-def launch_agent(agent: AutoGPT):
+
+def launch_agent(agent: AutoGPT, metrics_path: str = None):
     human_icon = "\U0001F468"
     ai_icon = "\U0001F916"
 
@@ -37,11 +64,44 @@ def launch_agent(agent: AutoGPT):
         task = input(f"{ai_icon}：有什么可以帮您？\n{human_icon}：")
         if task.strip().lower() == "quit":
             break
-        reply = agent.run(task, verbose=True)
-        print(f"{ai_icon}：{reply}\n")
+        # 事件边产生边输出，最终回复逐块打印；Ctrl+C 关闭事件流，取消当前任务
+        events = agent.stream_events(task)
+        streamed = False
+        try:
+            for event in events:
+                print_event(event)
+                if isinstance(event, FinalChunk):
+                    if not streamed:
+                        print(f"\n{ai_icon}：", end="")
+                        streamed = True
+                    print(event.text, end="", flush=True)
+                elif isinstance(event, TaskFinished):
+                    print("\n" if streamed else f"{ai_icon}：{event.reply}\n")
+        except KeyboardInterrupt:
+            events.close()
+            print(f"\n{ai_icon}：任务已取消\n")
+        if metrics_path:
+            agent.tracer.write_prometheus(metrics_path)
 
 
-def main():
+def build_long_term_memory():
+    """保存在本地磁盘的长时记忆，重启后仍然可用；第一次执行任务时才加载"""
+    from AutoAgent.LongTermMemory import LongTermMemory
+
+    return LongTermMemory(
+        embedding=get_embedding_service(),
+        path=".cache/long_term_memory",
+        k=1,
+    )
+
+
+def build_agent(verbose: bool = True, trace_path: str = None, metrics: bool = False,
+                fast_finish: bool = False) -> AutoGPT:
+
+    # temperature=0 且固定seed的调用结果可以复用，所有llm调用都经过本地的响应缓存
+    configure_llm_cache()
+    # 长时记忆和文档问答共用的 embedding 服务：磁盘缓存、合并相同请求、并发请求合成批次
+    configure_embedding_service(max_batch_size=64, max_concurrency=4)
 
     # 语言模型
     llm = ChatOpenAI(
@@ -53,25 +113,27 @@ def main():
         },
     )
 
-    # 存储长时记忆的向量数据库
-    db = Chroma.from_documents([Document(page_content="")], OpenAIEmbeddings(model="text-embedding-ada-002"))
-    retriever = db.as_retriever(
-        search_kwargs={"k": 1}
-    )
-
     # 自定义工具集
     tools = [
         document_qa_tool,
+        corpus_search_tool,
         document_generation_tool,
         email_tool,
         excel_inspection_tool,
         directory_inspection_tool,
-        finish_placeholder,
-        ExcelAnalyser(
+        # 只有 fast_finish 模式会直接使用 FINISH 的 answer，其他时候不在提示词中提供这个参数
+        finish_with_answer_placeholder if fast_finish else finish_placeholder,
+        observation_reader_tool,
+        get_tool(
+            "AnalyseExcel",
             prompts_path="./prompts/tools",
             prompt_file="excel_analyser.json",
-            verbose=True
-        ).as_tool()
+            verbose=verbose,
+            # 生成的分析代码在预热的进程池中执行，带超时和内存限制；第一次分析时才启动进程池
+            executor=functools.partial(WorkerPoolExecutor, workers=ANALYSIS_WORKERS, timeout=60),
+            # 同样的问题和同样结构的表格复用执行成功的代码
+            code_cache=AnalysisCodeCache(),
+        ),
     ]
 
     # 定义智能体
@@ -83,11 +145,73 @@ def main():
         main_prompt_file="main.json",
         final_prompt_file="final_step.json",
         max_thought_steps=20,
-        memory_retriever=retriever
+        long_term_memory=build_long_term_memory,
+        max_parallel_actions=4,
+        # 分析代码最多同时执行进程池大小个，邮件会打开浏览器，不能并发执行
+        tool_concurrency={
+            "AnalyseExcel": ANALYSIS_WORKERS,
+            "SendEmail": 1,
+        },
+        # 过长的工具结果只保留首尾，完整内容通过 ReadObservation 分页查看
+        observation_budget=2000,
+        observation_budgets={
+            "AnalyseExcel": 4000,
+        },
+        # 需要 trace 或指标时才记录，否则没有额外开销
+        tracer=Tracer(trace_path) if trace_path or metrics else None,
+        # FINISH 带有答案或者最后一次文档问答已经回答了任务时，不再调用最终步骤
+        fast_finish=fast_finish,
     )
+    return agent
+
+
+def profile_startup():
+    """打印启动耗时，以及如果立即导入所有工具实现需要额外付出的时间"""
+    imported = time.perf_counter()
+    build_agent()
+    ready = time.perf_counter()
+    print(f"imports: {imported - _START:.3f}s")
+    print(f"build_agent: {ready - imported:.3f}s")
+    print(f"startup total: {ready - _START:.3f}s")
+    print(f"heavy modules loaded at startup: {[m for m in HEAVY_MODULES if m in sys.modules]}")
+    preload()
+    print(f"eager tool imports would add: {time.perf_counter() - ready:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", help="任务文件（txt每行一个任务，或jsonl），批量执行后退出")
+    parser.add_argument("--output", default="batch_results.jsonl", help="批量执行结果的JSONL文件")
+    parser.add_argument("--workers", type=int, default=4, help="批量执行的进程数")
+    parser.add_argument("--profile-startup", action="store_true", help="测量启动耗时后退出")
+    parser.add_argument("--trace", help="把每一步的耗时片段写入这个JSONL文件")
+    parser.add_argument("--metrics", help="每个任务结束后把Prometheus文本格式的指标写入这个文件")
+    parser.add_argument("--fast-finish", action="store_true", help="答案已经得到时跳过最终的总结步骤")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    if args.batch:
+        if args.metrics:
+            # 每个工作进程的指标是分开的，批量执行的吞吐量和延迟统计在输出文件的最后一行
+            parser.error("--metrics 只能用于交互模式，批量执行的统计见 --output 文件的最后一行")
+        # --trace 的每个工作进程以追加方式写入同一个文件，每行带有 task_id
+        summary = BatchRunner(
+            agent_factory=functools.partial(
+                build_agent, verbose=False, trace_path=args.trace, fast_finish=args.fast_finish
+            ),
+            workers=args.workers,
+        ).run(args.batch, args.output)
+        print(summary)
+        return
 
     # 运行智能体
-    launch_agent(agent)
+    launch_agent(
+        build_agent(trace_path=args.trace, metrics=bool(args.metrics), fast_finish=args.fast_finish),
+        metrics_path=args.metrics,
+    )
 
 
 if __name__ == "__main__":
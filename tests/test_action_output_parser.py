@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from langchain.output_parsers import PydanticOutputParser
+from langchain_core.exceptions import OutputParserException
+
+from AutoAgent.Action import Action, ActionList
+from AutoAgent.ActionOutputParser import ActionOutputParser, coerce_action
+from Benchmarks.ScriptedChatModel import ScriptedChatModel
+
+THOUGHT = "思考: 查看表格\n"
+VALID = '{"name": "InspectExcel", "args": {"file_name": "a.xlsx"}}'
+
+
+def _parser(expect_list=False, responses=("不是json",)):
+    pydantic_object = ActionList if expect_list else Action
+    return ActionOutputParser(
+        PydanticOutputParser(pydantic_object=pydantic_object),
+        ScriptedChatModel(responses=list(responses)),
+    )
+
+
+ARGS = {"file_name": "a.xlsx"}
+
+
+@pytest.mark.parametrize("text, stage, args", [
+    (THOUGHT + VALID, "direct", ARGS),
+    (THOUGHT + "```json\n" + VALID + "\n```\n说明 {无关}", "code_fence", ARGS),
+    ("{'name': 'InspectExcel', 'args': {'file_name': 'a.xlsx'}} 然后 {}", "extract_object", ARGS),
+    # python 字面量也允许末尾的逗号，带有 json 的 true 时才需要这一步修复
+    ('{"name": "InspectExcel", "args": {"file_name": "a.xlsx", "header": true,},}', "trailing_comma",
+     {**ARGS, "header": True}),
+    ('{"name"： "InspectExcel"， "args"： {"file_name"： "a.xlsx"}}', "chinese_punctuation", ARGS),
+    ('{“name”: “InspectExcel”, “args”: {“file_name”: “a.xlsx”}}', "chinese_quotes", ARGS),
+])
+def test_each_repair_stage_is_counted(text, stage, args):
+    parser = _parser()
+
+    assert parser.try_parse(text) == [Action(name="InspectExcel", args=args)]
+    expected = {"direct": 1} if stage == "direct" else {"local_repair": 1, f"repair:{stage}": 1}
+    assert dict(parser.stats) == expected
+
+
+def test_coerce_unwraps_only_known_wrapper_keys():
+    action = {"name": "FINISH", "args": {}}
+
+    assert coerce_action({"action": action}, False) == action
+    assert coerce_action({"tool": action}, False) == action
+    assert coerce_action({"args": {"name": "x"}}, False) == {"args": {"name": "x"}}
+    assert coerce_action({"tool_name": "FINISH", "arguments": '{"a": 1}'}, False) == {"name": "FINISH", "args": {"a": 1}}
+
+
+def test_single_action_is_direct_when_a_list_is_expected():
+    parser = _parser(expect_list=True)
+
+    assert parser.try_parse(THOUGHT + VALID) == [Action(name="InspectExcel", args={"file_name": "a.xlsx"})]
+    assert dict(parser.stats) == {"direct": 1}
+
+
+def test_llm_fix_is_used_when_local_repair_fails():
+    parser = _parser(responses=['{"name": "FINISH", "args": {}}'])
+
+    assert parser.parse("完全不是动作的输出 1") == [Action(name="FINISH", args={})]
+    assert dict(parser.stats) == {"llm_fix": 1}
+
+
+def test_async_llm_fix_shares_the_counters():
+    parser = _parser(responses=["仍然不是json"])
+
+    with pytest.raises(OutputParserException):
+        asyncio.run(parser.aparse("完全不是动作的输出 2"))
+    assert dict(parser.stats) == {"failed": 1}
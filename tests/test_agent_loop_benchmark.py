@@ -0,0 +1,7 @@
+from Benchmarks.AgentLoopBenchmark import _make_tools
+
+
+def test_tool_descriptions_carry_the_signature_once():
+    for tool in _make_tools(3, 20):
+        assert tool.description.count(f"{tool.name}(") == 1
+        assert tool.run({"query": "x"}) == "01234567890123456789"
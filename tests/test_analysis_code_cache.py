@@ -0,0 +1,40 @@
+import pytest
+
+from Tools.AnalysisCodeCache import AnalysisCodeCache, schema_fingerprint
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+def _write_workbook(path, header, rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def test_fingerprint_depends_on_structure_not_data(tmp_path):
+    march = _write_workbook(tmp_path / "3月.xlsx", ["名称", "金额"], [["a", 1.5], ["b", 2.5]])
+    april = _write_workbook(tmp_path / "4月.xlsx", ["名称", "金额"], [["c", 3.5]] * 100)
+    renamed = _write_workbook(tmp_path / "other.xlsx", ["名称", "销售额"], [["a", 1.5]])
+
+    assert schema_fingerprint(march) == schema_fingerprint(april)
+    assert schema_fingerprint(march) != schema_fingerprint(renamed)
+
+
+def test_code_is_reused_for_a_file_with_the_same_structure(tmp_path):
+    march = _write_workbook(tmp_path / "3月.xlsx", ["名称", "金额"], [["a", 1.5]])
+    april = _write_workbook(tmp_path / "4月.xlsx", ["名称", "金额"], [["b", 2.5]])
+    cache = AnalysisCodeCache(str(tmp_path / "code.sqlite"))
+
+    key = cache.key("3月.xlsx 的金额合计是多少？", march)
+    assert cache.put(key, march, f"df = pd.read_excel('{march}')")
+
+    april_key = cache.key("4月.xlsx 的金额合计是多少", april)
+    assert april_key == key
+    assert cache.get(april_key, april) == f"df = pd.read_excel('{april}')"
+
+    cache.evict(april_key)
+    assert cache.get(april_key, april) is None
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+from langchain_core.tools import StructuredTool
+
+from AutoAgent.AutoGPT import AutoGPT
+from Benchmarks.AgentLoopBenchmark import PROMPTS_PATH, THOUGHT
+from Benchmarks.ScriptedChatModel import ScriptedChatModel
+from Tools import finish_placeholder
+
+
+def _actions(*actions):
+    return THOUGHT + json.dumps({"actions": [{"name": name, "args": args} for name, args in actions]})
+
+
+def _agent(tmp_path, responses, tools, **kwargs):
+    return AutoGPT(
+        llm=ScriptedChatModel(responses=responses),
+        prompts_path=PROMPTS_PATH,
+        tools=tools + [finish_placeholder],
+        work_dir=str(tmp_path),
+        main_prompt_file="main.json",
+        final_prompt_file="final_step.json",
+        max_parallel_actions=4,
+        **kwargs,
+    )
+
+
+def _counting_tool():
+    """ 原生异步的工具，记录同时执行的最大数量 """
+    running = {"now": 0, "max": 0}
+
+    async def query(text: str) -> str:
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        return text
+
+    tool = StructuredTool.from_function(coroutine=query, name="Query", description="查询")
+    return tool, running
+
+
+def _script():
+    return [_actions(*(("Query", {"text": str(i)}) for i in range(4))), _actions(("FINISH", {})), "最终回复"]
+
+
+def test_tool_concurrency_limits_coroutine_tools(tmp_path):
+    tool, running = _counting_tool()
+    agent = _agent(tmp_path, _script(), [tool], tool_concurrency={"Query": 1})
+
+    assert asyncio.run(agent.arun("查询")) == "最终回复"
+    assert running["max"] == 1
+
+
+def test_coroutine_tools_run_concurrently_without_a_limit(tmp_path):
+    tool, running = _counting_tool()
+    agent = _agent(tmp_path, _script(), [tool])
+
+    assert asyncio.run(agent.arun("查询")) == "最终回复"
+    assert running["max"] == 4
+
+
+def test_sync_and_async_loops_yield_the_same_events(tmp_path):
+    echo = StructuredTool.from_function(func=lambda text: text, name="Query", description="查询")
+
+    async def collect():
+        agent = _agent(tmp_path, _script(), [echo])
+        return [event async for event in agent.astream_events("查询")]
+
+    sync_events = list(_agent(tmp_path, _script(), [echo]).stream_events("查询"))
+
+    assert sync_events == asyncio.run(collect())
+    assert sync_events[-1].steps == 1
@@ -0,0 +1,83 @@
+import functools
+import json
+import os
+
+import pytest
+
+from AutoAgent.AutoGPT import TaskResult
+from AutoAgent.BatchRunner import BatchRunner, load_tasks
+
+
+class _StubAgent:
+    """代替 AutoGPT：回复任务内容和工作目录里的文件，任务 "boom" 抛出异常"""
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+
+    def run_task(self, task, work_dir=None):
+        if task == "boom":
+            raise RuntimeError("tool failed")
+        return TaskResult(reply=f"{task}:{os.path.basename(work_dir)}:{sorted(os.listdir(work_dir))}", steps=2)
+
+
+def _failing_factory():
+    raise RuntimeError("cannot build agent")
+
+
+def _read_results(path):
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    return [r for r in records if r["type"] == "result"], records[-1]
+
+
+def test_load_tasks_from_txt_and_jsonl(tmp_path):
+    txt = tmp_path / "tasks.txt"
+    txt.write_text("第一个任务\n\n第二个任务\n", encoding="utf-8")
+    jsonl = tmp_path / "tasks.jsonl"
+    jsonl.write_text('{"task": "查询", "id": "q1"}\n{"task": "汇总"}\n', encoding="utf-8")
+
+    assert load_tasks(str(txt)) == [{"task": "第一个任务", "id": 0}, {"task": "第二个任务", "id": 1}]
+    assert load_tasks(str(jsonl)) == [{"task": "查询", "id": "q1"}, {"task": "汇总", "id": 1}]
+
+
+def test_load_tasks_rejects_duplicate_ids(tmp_path):
+    jsonl = tmp_path / "tasks.jsonl"
+    jsonl.write_text('{"task": "a", "id": "x"}\n{"task": "b", "id": "x"}\n', encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        load_tasks(str(jsonl))
+
+
+def test_results_and_summary(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "report.xlsx").write_bytes(b"")
+    tasks = tmp_path / "tasks.jsonl"
+    tasks.write_text('{"task": "a", "id": "t/1"}\n{"task": "boom", "id": 2}\n', encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+    work_root = tmp_path / "work"
+
+    summary = BatchRunner(functools.partial(_StubAgent, str(data)), workers=2, work_root=str(work_root)).run(
+        str(tasks), str(output))
+
+    results, last = _read_results(output)
+    assert last == summary
+    assert (summary["tasks"], summary["succeeded"], summary["failed"], summary["steps_mean"]) == (2, 1, 1, 2)
+    by_id = {r["id"]: r for r in results}
+    # 工作目录只由任务 id 决定，包含原工作目录文件的链接，任务结束后删除
+    assert by_id["t/1"]["reply"] == "a:task-t_1:['report.xlsx']"
+    assert by_id[2]["error"] == "RuntimeError: tool failed"
+    assert os.listdir(work_root) == []
+
+
+def test_summary_is_written_when_workers_cannot_start(tmp_path):
+    tasks = tmp_path / "tasks.txt"
+    tasks.write_text("a\nb\n", encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+
+    summary = BatchRunner(_failing_factory, workers=1, work_root=str(tmp_path / "work")).run(str(tasks), str(output))
+
+    results, last = _read_results(output)
+    assert last == summary
+    assert summary["failed"] == 2
+    assert all(r["error"].startswith("BrokenProcessPool") for r in results)
@@ -0,0 +1,50 @@
+from typing import List
+
+from langchain.schema import Document
+from langchain_core.retrievers import BaseRetriever
+
+from Tools.BM25Index import BM25Index, BM25Retriever
+
+DOCUMENTS = [
+    Document(page_content="销售额达标的标准是每月不低于3万元。"),
+    Document(page_content="供应商必须具备合法有效的营业执照。"),
+    Document(page_content="差旅费用在出差结束后五个工作日内报销。"),
+]
+
+
+class _ListRetriever(BaseRetriever):
+    documents: List[Document]
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.documents
+
+
+def test_search_ranks_matching_chunk_first():
+    index = BM25Index.build(DOCUMENTS)
+
+    results = index.search("销售额的标准", k=2)
+
+    assert results[0][0] is DOCUMENTS[0]
+
+
+def test_fallback_when_bm25_finds_too_few_candidates():
+    calls = []
+
+    def fallback():
+        calls.append(1)
+        return _ListRetriever(documents=DOCUMENTS[2:])
+
+    retriever = BM25Retriever(index=BM25Index.build(DOCUMENTS), k=2, fallback=fallback)
+
+    # 换了说法的问题与原文没有共同的词项
+    assert retriever.get_relevant_documents("业绩要做到多少？") == DOCUMENTS[2:]
+    assert calls == [1]
+
+
+def test_no_fallback_when_bm25_finds_enough():
+    def fallback():
+        raise AssertionError("fallback should not be built")
+
+    retriever = BM25Retriever(index=BM25Index.build(DOCUMENTS), k=1, fallback=fallback)
+
+    assert retriever.get_relevant_documents("营业执照") == [DOCUMENTS[1]]
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from Tools.CodeExecutor import CodeExecutor, InProcessExecutor, WorkerPoolExecutor
+
+pytest.importorskip("pandas")
+
+
+def test_code_executor_is_abstract():
+    with pytest.raises(TypeError):
+        CodeExecutor()
+
+
+def test_in_process_executions_do_not_mix_output():
+    executor = InProcessExecutor()
+    code = "import time\nfor i in range(5):\n    print('{name}', i)\n    time.sleep(0.01)"
+    results = {}
+
+    def run(name):
+        results[name] = executor.execute(code.format(name=name))
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name in ("a", "b"):
+        assert results[name].ok
+        assert results[name].output == "".join(f"{name} {i}\n" for i in range(5))
+
+
+@pytest.fixture
+def pool():
+    executor = WorkerPoolExecutor(workers=1, timeout=30, max_tasks_per_worker=2)
+    yield executor
+    executor.close()
+
+
+def test_worker_pool_executes_and_reports_errors(pool):
+    assert pool.execute("print(1 + 1)").output == "2\n"
+    result = pool.execute("raise ValueError('bad column')")
+    assert not result.ok
+    assert "bad column" in result.output
+
+
+def test_timeout_replaces_the_worker(pool):
+    result = pool.execute("import time\ntime.sleep(30)", timeout=0.5)
+
+    assert not result.ok
+    assert "超过" in result.output
+    assert pool.stats["timeouts"] == 1
+    assert pool.execute("print('alive')").output == "alive\n"
+
+
+def test_crash_replaces_the_worker(pool):
+    result = pool.execute("import os\nos._exit(1)")
+
+    assert not result.ok
+    assert pool.stats["crashes"] == 1
+    assert pool.execute("print('alive')").output == "alive\n"
+
+
+def test_workers_are_recycled_after_max_tasks(pool):
+    pids = [pool.execute("import os\nprint(os.getpid())").output for _ in range(3)]
+
+    assert pool.stats["recycled"] == 1
+    assert pids[0] == pids[1] != pids[2]
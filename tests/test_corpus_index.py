@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from Tools import CorpusIndex as corpus_index
+from Tools.CorpusIndex import CorpusIndex, get_corpus_index, search_documents
+from Tools.DocumentIndexCache import DocumentIndexCache
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+def _write_workbook(path, rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["项目", "说明"])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    # 保证修改后 mtime 变化
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / "data"
+    (root / "sub").mkdir(parents=True)
+    _write_workbook(root / "sales.xlsx", [["销售额", "每月不低于3万元"]])
+    _write_workbook(root / "sub" / "suppliers.xlsx", [["供应商", "必须具备合法有效的营业执照"]])
+    (root / "notes.txt").write_text("不支持的格式", encoding="utf-8")
+    return CorpusIndex(str(root), cache=DocumentIndexCache(str(tmp_path / "cache")), refresh_interval=0)
+
+
+def _sources(results):
+    return [os.path.basename(document.metadata["source"]) for document, _ in results]
+
+
+def test_search_across_files(corpus):
+    assert _sources(corpus.search("营业执照", k=1)) == ["suppliers.xlsx"]
+    assert _sources(corpus.search("销售额", k=1)) == ["sales.xlsx"]
+    assert corpus.search("xyz") == []
+
+
+def test_refresh_only_indexes_changed_files(corpus):
+    corpus.refresh()
+    assert corpus.stats["indexed"] == 2
+
+    corpus.refresh(force=True)
+    assert corpus.stats["indexed"] == 2
+
+    _write_workbook(os.path.join(corpus.root, "sales.xlsx"), [["回款", "次月15日之前"]])
+    os.remove(os.path.join(corpus.root, "sub", "suppliers.xlsx"))
+    corpus.refresh(force=True)
+
+    assert corpus.stats["indexed"] == 3
+    assert corpus.stats["removed"] == 1
+    assert corpus.search("营业执照") == []
+    assert _sources(corpus.search("回款")) == ["sales.xlsx"]
+
+
+def test_first_scan_writes_the_manifest_once(corpus, monkeypatch):
+    reads = []
+    read_manifest = corpus.cache._read_manifest
+    monkeypatch.setattr(corpus.cache, "_read_manifest", lambda: reads.append(1) or read_manifest())
+
+    corpus.refresh()
+
+    # 一次加载清单，一次写回前的合并
+    assert len(reads) == 2
+
+
+def test_search_documents_formats_passages(corpus, monkeypatch):
+    monkeypatch.setattr(corpus_index, "get_corpus_index", lambda path: corpus)
+
+    text = search_documents("营业执照", corpus.root, k=1)
+
+    assert text.startswith(f"[1] {os.path.join('sub', 'suppliers.xlsx')} 工作表“Sheet”第2行起")
+    assert "营业执照" in text
+
+
+def test_corpora_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_index, "_corpora", corpus_index.OrderedDict())
+    monkeypatch.setattr(corpus_index, "MAX_CORPORA", 2)
+    first = get_corpus_index(str(tmp_path / "a"))
+    get_corpus_index(str(tmp_path / "b"))
+    assert get_corpus_index(str(tmp_path / "a")) is first
+
+    get_corpus_index(str(tmp_path / "c"))
+
+    assert list(corpus_index._corpora) == [str(tmp_path / "a"), str(tmp_path / "c")]
@@ -0,0 +1,100 @@
+import json
+import os
+
+from langchain.schema import Document
+
+from Tools.DocumentIndexCache import MANIFEST_FILE, DocumentIndexCache
+
+SETTINGS = {"index": "bm25", "chunk_size": 200, "chunk_overlap": 100}
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def _build(cache, filename):
+    def load_documents():
+        with open(filename, encoding="utf-8") as f:
+            return [Document(page_content=f.read(), metadata={"source": filename})]
+
+    return cache.get_or_build_bm25(filename, settings=SETTINGS, load_documents=load_documents)
+
+
+def _manifest_entries(cache_dir):
+    with open(os.path.join(cache_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)["entries"]
+
+
+def test_processes_sharing_a_cache_dir_keep_each_others_entries(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    plan = _write(tmp_path / "plan.txt", "销售额达标的标准是每月不低于3万元。")
+    rules = _write(tmp_path / "rules.txt", "供应商必须具备合法有效的营业执照。")
+    # 两个实例各自缓存清单，相当于两个批量执行的进程
+    first, second = DocumentIndexCache(cache_dir), DocumentIndexCache(cache_dir)
+    first._load_manifest()
+    second._load_manifest()
+
+    _build(first, plan)
+    _build(second, rules)
+
+    sources = sorted(entry["source"] for entry in _manifest_entries(cache_dir).values())
+    assert sources == sorted([os.path.abspath(plan), os.path.abspath(rules)])
+
+
+def test_eviction_counts_entries_from_other_processes(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    files = [_write(tmp_path / f"{i}.txt", f"第{i}份文档的内容") for i in range(3)]
+    first, second = DocumentIndexCache(cache_dir, max_entries=2), DocumentIndexCache(cache_dir, max_entries=2)
+
+    _build(first, files[0])
+    _build(second, files[1])
+    _build(first, files[2])
+
+    entries = _manifest_entries(cache_dir)
+    assert sorted(entry["source"] for entry in entries.values()) == sorted(os.path.abspath(f) for f in files[1:])
+    assert all(os.path.isdir(os.path.join(cache_dir, key)) for key in entries)
+
+
+def test_symlinked_files_share_the_record_of_their_target(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    plan = _write(tmp_path / "plan.txt", "销售额达标的标准是每月不低于3万元。")
+    task_dir = tmp_path / "task-1"
+    task_dir.mkdir()
+    os.symlink(plan, task_dir / "plan.txt")
+    cache = DocumentIndexCache(cache_dir)
+
+    _build(cache, plan)
+    _build(cache, str(task_dir / "plan.txt"))
+
+    with open(os.path.join(cache_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        assert list(json.load(f)["files"]) == [os.path.realpath(plan)]
+    assert len(_manifest_entries(cache_dir)) == 1
+
+
+def test_records_of_deleted_files_are_dropped(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    old = _write(tmp_path / "old.txt", "旧文档")
+    new = _write(tmp_path / "new.txt", "新文档")
+    cache = DocumentIndexCache(cache_dir)
+    _build(cache, old)
+    os.remove(old)
+
+    _build(cache, new)
+
+    with open(os.path.join(cache_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        assert list(json.load(f)["files"]) == [os.path.realpath(new)]
+
+
+def test_cache_hits_do_not_rewrite_the_manifest(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    plan = _write(tmp_path / "plan.txt", "销售额达标的标准是每月不低于3万元。")
+    cache = DocumentIndexCache(cache_dir)
+    _build(cache, plan)
+    saves = []
+    monkeypatch.setattr(cache, "_save_manifest", lambda: saves.append(1))
+
+    for _ in range(3):
+        assert _build(cache, plan) is not None
+
+    assert saves == []
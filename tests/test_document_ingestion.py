@@ -0,0 +1,75 @@
+import zipfile
+
+import pytest
+from langchain.schema import Document
+from langchain_community.document_loaders.base import BaseLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from Tools.DocumentIngestion import iter_chunks, iter_pages
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml"
+ ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+
+RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Target="word/document.xml"
+ Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>
+</Relationships>"""
+
+DOCUMENT = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>
+<w:p><w:r><w:t>销售额达标的标准是每月不低于3万元。</w:t></w:r></w:p>
+<w:p><w:r><w:t>供应商必须具备合法有效的营业执照。</w:t></w:r></w:p>
+</w:body></w:document>"""
+
+
+def _write_docx(path):
+    with zipfile.ZipFile(path, "w") as docx:
+        docx.writestr("[Content_Types].xml", CONTENT_TYPES)
+        docx.writestr("_rels/.rels", RELS)
+        docx.writestr("word/document.xml", DOCUMENT)
+
+
+def _splitter():
+    return RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=100, add_start_index=True)
+
+
+class _FakeWordLoader(BaseLoader):
+    """与 langchain_community 0.0.13 的 Word loader 一样只实现 load()，不需要安装 unstructured"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def load(self):
+        return [Document(page_content="销售额达标的标准是每月不低于3万元。", metadata={"source": self.file_path})]
+
+
+def test_word_document_uses_load(tmp_path, monkeypatch):
+    """BaseLoader.lazy_load 没有实现，iter_pages 必须通过 load() 读取 Word 文档"""
+    from langchain_community.document_loaders import word_document
+
+    filename = str(tmp_path / "plan.docx")
+    _write_docx(filename)
+    monkeypatch.setattr(word_document, "UnstructuredWordDocumentLoader", _FakeWordLoader)
+
+    chunks = list(iter_chunks(iter_pages(filename), _splitter()))
+
+    assert [chunk.page_content for chunk in chunks] == ["销售额达标的标准是每月不低于3万元。"]
+    assert chunks[0].metadata["source"] == filename
+
+
+def test_ingest_word_document(tmp_path):
+    pytest.importorskip("unstructured")
+    pytest.importorskip("docx")
+    filename = str(tmp_path / "plan.docx")
+    _write_docx(filename)
+
+    text = "\n".join(chunk.page_content for chunk in iter_chunks(iter_pages(filename), _splitter()))
+
+    assert "销售额达标的标准" in text
+    assert "营业执照" in text
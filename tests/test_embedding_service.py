@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from Utils.EmbeddingService import EmbeddingService
+
+
+class _ConstantEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def test_requests_fail_instead_of_hanging_after_shutdown():
+    service = EmbeddingService(_ConstantEmbeddings(), cache_path=None)
+    assert service.embed_query("第一条") == [1.0, 0.0]
+
+    # 与解释器退出时一样，线程池先于后台的批处理线程关闭
+    service._pool.shutdown()
+    with ThreadPoolExecutor(max_workers=1) as caller:
+        with pytest.raises(RuntimeError):
+            caller.submit(service.embed_query, "第二条").result(timeout=5)
+
+    assert service.stats()["errors"] == 1
@@ -0,0 +1,57 @@
+import json
+
+from langchain_core.tools import StructuredTool
+
+from AutoAgent.AutoGPT import AutoGPT
+from Benchmarks.AgentLoopBenchmark import PROMPTS_PATH, THOUGHT
+from Benchmarks.ScriptedChatModel import ScriptedChatModel
+from Tools import finish_placeholder, finish_with_answer_placeholder
+
+ask_document = StructuredTool.from_function(
+    func=lambda query: "销售额达标的标准是每月不低于3万元", name="AskDocument", description="根据文档回答问题",
+)
+
+
+def _action(name, **args):
+    return THOUGHT + json.dumps({"name": name, "args": args})
+
+
+def _run(tmp_path, responses):
+    agent = AutoGPT(
+        llm=ScriptedChatModel(responses=responses),
+        prompts_path=PROMPTS_PATH,
+        tools=[ask_document, finish_with_answer_placeholder],
+        work_dir=str(tmp_path),
+        main_prompt_file="main.json",
+        final_prompt_file="final_step.json",
+        fast_finish=True,
+    )
+    return agent.run_task("销售额达标的标准是多少？").reply, agent.finish_stats
+
+
+def test_answer_arg_only_on_fast_finish_placeholder():
+    assert "answer" not in finish_placeholder.args
+    assert "answer" in finish_with_answer_placeholder.args
+
+
+def test_single_round_observation_is_the_reply(tmp_path):
+    reply, stats = _run(tmp_path, [_action("AskDocument", query="标准"), _action("FINISH"), "最终回复"])
+
+    assert reply == "销售额达标的标准是每月不低于3万元"
+    assert stats == {"last_observation": 1}
+
+
+def test_several_rounds_use_the_final_step(tmp_path):
+    reply, stats = _run(tmp_path, [
+        _action("AskDocument", query="标准"), _action("AskDocument", query="期限"), _action("FINISH"), "最终回复",
+    ])
+
+    assert reply == "最终回复"
+    assert stats == {"final_step": 1}
+
+
+def test_finish_answer_is_the_reply(tmp_path):
+    reply, stats = _run(tmp_path, [_action("AskDocument", query="标准"), _action("FINISH", answer="3万元"), "最终回复"])
+
+    assert reply == "3万元"
+    assert stats == {"finish_answer": 1}
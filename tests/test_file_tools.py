@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from Tools.FileTools import DirectorySnapshot, list_files_in_directory
+
+
+def _touch(path, size=0, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "data"
+    _touch(root / "a.xlsx", size=10, mtime=1_600_000_000)
+    _touch(root / "b.pdf", size=3000, mtime=1_700_000_000)
+    _touch(root / "c.xlsx", size=500, mtime=1_650_000_000)
+    _touch(root / "reports" / "d.xlsx", size=20)
+    _touch(root / ".hidden" / "e.xlsx")
+    return root
+
+
+def _names(listing):
+    return [line.split("\t")[0] for line in listing.splitlines() if not line.startswith("（")]
+
+
+def test_depth_and_pattern(tree):
+    assert _names(list_files_in_directory(str(tree))) == ["a.xlsx", "b.pdf", "c.xlsx", "reports/"]
+    assert _names(list_files_in_directory(str(tree), depth=2, pattern="*.xlsx")) == \
+        ["a.xlsx", "c.xlsx", os.path.join("reports", "d.xlsx")]
+    assert list_files_in_directory(str(tree), pattern="*.docx") == "（没有匹配的文件）"
+
+
+def test_sort_by_size_and_mtime(tree):
+    files = "*.*"
+    assert _names(list_files_in_directory(str(tree), pattern=files, sort="size")) == ["b.pdf", "c.xlsx", "a.xlsx"]
+    assert _names(list_files_in_directory(str(tree), pattern=files, sort="mtime")) == ["b.pdf", "c.xlsx", "a.xlsx"]
+    with pytest.raises(ValueError):
+        list_files_in_directory(str(tree), sort="type")
+
+
+def test_pagination(tree):
+    first = list_files_in_directory(str(tree), limit=3)
+    assert _names(first) == ["a.xlsx", "b.pdf", "c.xlsx"]
+    assert "cursor=3" in first
+    assert _names(list_files_in_directory(str(tree), limit=3, cursor=3)) == ["reports/"]
+    assert "没有更多条目" in list_files_in_directory(str(tree), limit=3, cursor=4)
+    # limit 小于1时仍然前进
+    assert "cursor=1" in list_files_in_directory(str(tree), limit=0)
+
+
+def test_symlinks_report_their_targets_without_recursing(tree, tmp_path):
+    work_dir = tmp_path / "task-1"
+    work_dir.mkdir()
+    for name in ("b.pdf", "reports"):
+        os.symlink(tree / name, work_dir / name)
+    os.symlink(tmp_path / "missing.pdf", work_dir / "broken.pdf")
+
+    listing = list_files_in_directory(str(work_dir), depth=3)
+
+    assert _names(listing) == ["b.pdf", "reports/"]
+    assert "2.9KB" in listing
+
+
+def test_snapshot_rescans_only_changed_directories(tree):
+    snapshot = DirectorySnapshot()
+    list(snapshot.walk(str(tree), depth=2))
+    assert snapshot.stats["scans"] == 2
+
+    list(snapshot.walk(str(tree), depth=2))
+    assert (snapshot.stats["scans"], snapshot.stats["hits"]) == (2, 2)
+
+    _touch(tree / "reports" / "f.xlsx")
+    # 文件系统的时间精度较粗时，保证目录的 mtime 确实变化
+    os.utime(tree / "reports", ns=(0, os.stat(tree / "reports").st_mtime_ns + 1_000_000))
+    names = [relative for relative, _ in snapshot.walk(str(tree), depth=2)]
+    assert os.path.join("reports", "f.xlsx") in names
+    assert snapshot.stats["scans"] == 3
@@ -0,0 +1,112 @@
+import asyncio
+
+from Benchmarks.ScriptedChatModel import ScriptedChatModel
+from Utils.DiskCache import DiskCache
+from Utils.LLMCache import CachedLLM, cached
+
+
+class _Model(ScriptedChatModel):
+    """ 带有参数的脚本模型，参数是缓存键的一部分 """
+    temperature: float = 0.0
+    model_name: str = "scripted"
+
+    @property
+    def _identifying_params(self):
+        return {"temperature": self.temperature, "model_name": self.model_name}
+
+
+def _cache(tmp_path, **kwargs):
+    return DiskCache(str(tmp_path / "cache.sqlite"), **kwargs)
+
+
+def test_key_covers_prompt_params_and_stop(tmp_path):
+    cache = _cache(tmp_path)
+    model = _Model(responses=["一", "二", "三", "四", "五"])
+    llm = CachedLLM(model, cache)
+
+    assert llm.invoke("问题").content == "一"
+    assert llm.invoke("问题").content == "一"
+    assert llm.invoke("另一个问题").content == "二"
+    assert llm.invoke("问题", stop=["\n"]).content == "三"
+    assert CachedLLM(_Model(responses=["四"], model_name="other"), cache).invoke("问题").content == "四"
+    assert model.i == 3
+
+
+def test_non_deterministic_models_are_not_wrapped(tmp_path):
+    cache = _cache(tmp_path)
+
+    assert isinstance(cached(_Model(responses=["a"]), cache), CachedLLM)
+    assert not isinstance(cached(_Model(responses=["a"], temperature=0.7), cache), CachedLLM)
+
+
+def test_stopped_stream_is_not_cached(tmp_path):
+    model = _Model(responses=["完整的回复文本"], chars_per_token=2)
+    llm = CachedLLM(model, _cache(tmp_path))
+
+    stream = llm.stream("问题")
+    next(stream)
+    stream.close()
+    assert "".join(chunk.content for chunk in llm.stream("问题")) == "完整的回复文本"
+    assert model.i == 2
+    # 完整读完的流已经缓存，重放时不再调用模型
+    assert "".join(chunk.content for chunk in llm.stream("问题")) == "完整的回复文本"
+    assert model.i == 2
+
+
+def test_async_stream_is_cached_on_completion(tmp_path):
+    model = _Model(responses=["异步回复"])
+    llm = CachedLLM(model, _cache(tmp_path))
+
+    async def read():
+        return "".join([chunk.content async for chunk in llm.astream("问题")])
+
+    assert asyncio.run(read()) == asyncio.run(read()) == "异步回复"
+    assert model.i == 1
+
+
+def test_store_caches_the_accepted_prefix(tmp_path):
+    model = _Model(responses=["动作 {...} 多余的文本"])
+    llm = CachedLLM(model, _cache(tmp_path))
+
+    llm.store("问题", "动作 {...}")
+
+    assert llm.invoke("问题").content == "动作 {...}"
+    assert model.i == 0
+
+
+def test_reads_do_not_write(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set("k", "v")
+    cache.flush()
+    changes = cache._conn.total_changes
+
+    assert cache.get("k") == "v"
+    assert cache.get("missing") is None
+    assert cache._conn.total_changes == changes
+    assert cache.stats()["hits"] == 1
+
+
+def test_writes_are_batched(tmp_path):
+    cache = _cache(tmp_path, flush_every=3, flush_interval=3600)
+    other = _cache(tmp_path)
+
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert other.get("a") is None
+    assert cache.get("a") == "1"
+
+    # 访问时间的更新也算一次修改，第三次修改时一起写入
+    assert other.get("a") == "1" and other.get("b") == "2"
+
+
+def test_ttl_and_eviction_after_flush(tmp_path):
+    cache = _cache(tmp_path, ttl=0, max_entries=2, flush_every=1)
+    cache.set("a", "1")
+    assert cache.get("a") is None
+
+    cache = _cache(tmp_path, max_entries=2, flush_every=1)
+    for key in "xyz":
+        cache.set(key, key)
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] >= 1
+    assert cache.get("x") is None and cache.get("z") == "z"
@@ -0,0 +1,85 @@
+import os
+import threading
+
+from AutoAgent.LongTermMemory import HashingEmbeddings, LongTermMemory
+
+
+def _remember(memory, task, reply):
+    memory.save_context({"input": task}, {"output": reply})
+
+
+def test_add_flush_search_and_reload(tmp_path):
+    path = str(tmp_path / "memory")
+    memory = LongTermMemory(HashingEmbeddings(), path=path, k=1)
+    _remember(memory, "统计供应商名单中的供应商数量", "共有12家供应商")
+    _remember(memory, "查询3月份的销售额", "3月份销售额为35万元")
+    # 缓冲区中的记忆在 flush 之前不能被检索，也不写入磁盘
+    assert memory.search("销售额") == []
+    assert not os.path.exists(os.path.join(path, "records.jsonl"))
+
+    memory.flush()
+
+    assert memory.search("3月份的销售额是多少")[0]["output"] == "3月份销售额为35万元"
+    reloaded = LongTermMemory(HashingEmbeddings(), path=path, k=2)
+    assert len(reloaded) == 2
+    assert reloaded.load_memory_variables({"prompt": "供应商数量"})["history"].startswith(
+        "input: 统计供应商名单中的供应商数量\noutput: 共有12家供应商")
+
+
+def test_same_memory_is_saved_once(tmp_path):
+    memory = LongTermMemory(HashingEmbeddings(), path=str(tmp_path))
+    for _ in range(2):
+        _remember(memory, "任务", "回复")
+        memory.flush()
+
+    assert len(LongTermMemory(HashingEmbeddings(), path=str(tmp_path))) == 1
+
+
+def test_interrupted_write_is_truncated_on_load(tmp_path):
+    memory = LongTermMemory(HashingEmbeddings(dim=8), path=str(tmp_path))
+    _remember(memory, "任务一", "回复一")
+    _remember(memory, "任务二", "回复二")
+    memory.flush()
+    # 模拟第二条记录写了一半时进程退出
+    with open(tmp_path / "records.jsonl", "r+", encoding="utf-8") as f:
+        first_line = f.readline()
+        f.truncate(len(first_line.encode("utf-8")) + 5)
+
+    reloaded = LongTermMemory(HashingEmbeddings(dim=8), path=str(tmp_path))
+
+    assert len(reloaded) == 1
+    assert os.path.getsize(tmp_path / "vectors.f32") == 8 * 4
+
+
+class _BlockingEmbeddings(HashingEmbeddings):
+    """embed_documents 等待 release，用来模拟很慢的网络请求"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def embed_documents(self, texts):
+        self.started.set()
+        self.release.wait(5)
+        return super().embed_documents(texts)
+
+
+def test_search_is_not_blocked_by_flush(tmp_path):
+    embedding = _BlockingEmbeddings()
+    memory = LongTermMemory(embedding, path=str(tmp_path))
+    _remember(memory, "任务", "回复")
+    flushing = threading.Thread(target=memory.flush)
+    flushing.start()
+    assert embedding.started.wait(5)
+
+    searching = threading.Thread(target=memory.search, args=("任务",))
+    searching.start()
+    searching.join(1)
+    blocked = searching.is_alive()
+    embedding.release.set()
+    flushing.join()
+    searching.join()
+
+    assert not blocked
+    assert memory.search("任务")[0]["output"] == "回复"
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from AutoAgent import ObservationStore as observation_module
+from AutoAgent.ObservationStore import PAGE_SIZE, ObservationStore, read_observation
+
+
+@pytest.fixture(autouse=True)
+def spill_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / "observations")
+    monkeypatch.setattr(observation_module, "SPILL_DIR", path)
+    return path
+
+
+def _handle(bounded):
+    return next(word for word in bounded.replace("，", " ").split() if word.endswith(".txt"))
+
+
+def test_observations_within_budget_are_unchanged():
+    store = ObservationStore(budget=100, budgets={"Big": 10})
+
+    assert store.bound("Small", "x" * 100) == "x" * 100
+    assert store.bound("ReadObservation", "x" * 1000) == "x" * 1000
+    assert store.bound("Big", "x" * 11) != "x" * 11
+
+
+def test_long_observation_keeps_head_and_tail(spill_dir):
+    text = "".join(f"第{i}行\n" for i in range(2000))
+    store = ObservationStore(budget=300)
+
+    bounded = store.bound("AnalyseExcel", text)
+
+    assert len(bounded) < 500
+    assert bounded.startswith("第0行\n") and bounded.endswith("第1999行\n")
+    handle = _handle(bounded)
+    assert os.path.dirname(handle) == spill_dir
+    assert os.path.basename(handle).startswith(f"AnalyseExcel-{store.task_id}-0")
+    assert f"共 {len(text)} 个字符" in bounded
+
+
+def test_read_observation_pages_through_the_full_result():
+    text = "".join(chr(ord("a") + i % 26) for i in range(PAGE_SIZE * 2 + 10))
+    store = ObservationStore(budget=100)
+    handle = _handle(store.bound("Tool", text))
+
+    pages = [read_observation(handle, page) for page in (1, 2, 3)]
+
+    assert pages[0] == f"第 1/3 页：\n{text[:PAGE_SIZE]}"
+    assert pages[2] == f"第 3/3 页：\n{text[PAGE_SIZE * 2:]}"
+    assert "".join(page.split("：\n", 1)[1] for page in pages) == text
+    assert read_observation(handle, 4).startswith("Error: 页码 4 超出范围")
+
+    store.close()
+    assert "不存在或已过期" in read_observation(handle)
+
+
+def test_read_observation_only_reads_spill_files(tmp_path):
+    other = tmp_path / "secret.txt"
+    other.write_text("secret", encoding="utf-8")
+
+    assert "不是有效的结果句柄" in read_observation(str(other))
@@ -0,0 +1,36 @@
+from langchain.output_parsers import PydanticOutputParser
+from langchain_core.tools import Tool
+
+from AutoAgent.Action import Action, ActionList
+from Benchmarks.AgentLoopBenchmark import PROMPTS_PATH
+from Utils.PromptTemplateBuilder import PromptTemplateBuilder
+
+TOOLS = [Tool(name="FINISH", func=lambda: None, description="任务完成")]
+ONE_TOOL_RULE = "每次你的决策只是用一种工具"
+ONE_STEP_RULE = "PLAN ONE STEP ONLY"
+
+
+def _render(variant, pydantic_object):
+    prompt_template = PromptTemplateBuilder(PROMPTS_PATH, "main.json", variant).build(
+        tools=TOOLS, parser=PydanticOutputParser(pydantic_object=pydantic_object),
+    )
+    return prompt_template.format(task_description="解决问题", work_dir=".", short_term_memory="",
+                                  long_term_memory="")
+
+
+def test_single_action_prompt_keeps_the_one_step_rules():
+    prompt = _render(None, Action)
+
+    assert ONE_TOOL_RULE in prompt
+    assert ONE_STEP_RULE in prompt
+
+
+def test_parallel_prompt_allows_several_actions():
+    prompt = _render("parallel", ActionList)
+
+    assert ONE_TOOL_RULE not in prompt
+    assert ONE_STEP_RULE not in prompt
+    assert "并行执行" in prompt
+    # 工具列表和格式说明与单动作的模板相同
+    assert "FINISH: 任务完成" in prompt
+    assert '"actions"' in prompt
@@ -0,0 +1,50 @@
+from AutoAgent.ShortTermMemory import ShortTermMemory
+
+
+def _memory(limit):
+    # 每个字符一个 token，便于计算
+    return ShortTermMemory(max_token_limit=limit, token_counter=len)
+
+
+def test_turns_are_rendered_in_order():
+    memory = _memory(100)
+    memory.save_context({"input": "思考1"}, {"output": "结果1"})
+    memory.add_turn("思考2", "结果2")
+
+    assert memory.buffer_as_str == "思考1\n结果1\n思考2\n结果2"
+    assert memory.load_memory_variables({}) == {"history": memory.buffer_as_str}
+    assert memory.total_tokens == 14 and len(memory) == 2
+
+
+def test_oldest_turns_are_trimmed_at_the_token_limit():
+    memory = _memory(20)
+    for i in range(10):
+        # 每个 turn 7 个 token
+        memory.add_turn(f"思考{i}", f"结果{i}")
+        assert memory.total_tokens <= 20
+        assert memory.buffer_as_str.endswith(f"思考{i}\n结果{i}")
+
+    assert len(memory) == 2
+    assert memory.buffer_as_str == "思考8\n结果8\n思考9\n结果9"
+    assert memory.total_tokens == 14
+
+
+def test_latest_turn_is_kept_even_over_the_limit():
+    memory = _memory(5)
+    memory.add_turn("短", "短")
+    memory.add_turn("很长的思考过程", "很长的结果")
+
+    assert memory.buffer_as_str == "很长的思考过程\n很长的结果"
+    assert len(memory) == 1 and memory.total_tokens == 13
+
+
+def test_trimmed_turns_are_dropped_from_the_parts():
+    memory = _memory(7)
+    for i in range(100):
+        memory.add_turn(f"思考{i}", f"结果{i}")
+
+    assert len(memory._turns) <= 3
+    assert memory.buffer_as_str == "思考99\n结果99"
+
+    memory.clear()
+    assert memory.buffer_as_str == "" and len(memory) == 0 and memory.total_tokens == 0
@@ -0,0 +1,45 @@
+import importlib
+import inspect
+import typing
+
+import pytest
+
+from Tools.Registry import FINISH_WITH_ANSWER, REQUIRED, TOOL_SPECS
+
+
+def _implementation(spec):
+    module_name, attr = spec.target.split(":")
+    target = getattr(importlib.import_module(module_name), attr)
+    if spec.method is not None:
+        target = getattr(target, spec.method)
+    parameters = dict(inspect.signature(target).parameters)
+    parameters.pop("self", None)
+    return target, parameters
+
+
+def _unwrap_optional(annotation):
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+        return args[0]
+    return annotation
+
+
+@pytest.mark.parametrize("spec", [*TOOL_SPECS.values(), FINISH_WITH_ANSWER], ids=lambda spec: spec.signature)
+def test_spec_matches_the_implementation(spec):
+    """ 参数是手写在 ToolSpec 中的，实现改变时这里会失败 """
+    target, parameters = _implementation(spec)
+
+    for arg in spec.args:
+        assert arg.name in parameters, f"{spec.name}: {arg.name} is not a parameter of {spec.target}"
+        parameter = parameters[arg.name]
+        assert _unwrap_optional(parameter.annotation) is arg.type, f"{spec.name}.{arg.name}"
+        default = REQUIRED if parameter.default is inspect.Parameter.empty else parameter.default
+        assert default == arg.default, f"{spec.name}.{arg.name}"
+
+    # 实现可以有规格中没有的可选参数（例如普通 FINISH 的 answer），必填参数都要在规格中
+    declared = {arg.name for arg in spec.args}
+    for name, parameter in parameters.items():
+        assert parameter.default is not inspect.Parameter.empty or name in declared, f"{spec.name}: {name}"
+
+    if spec.returns is not None:
+        assert inspect.signature(target).return_annotation is spec.returns
@@ -0,0 +1,93 @@
+import os
+import re
+import zipfile
+
+import pytest
+
+pytest.importorskip("openpyxl")
+pytest.importorskip("pandas")
+
+from openpyxl import Workbook
+
+from Tools import WorkbookPreview
+from Tools.ExcelTool import get_first_n_rows
+from Tools.WorkbookCache import workbook_cache
+from Tools.WorkbookPreview import preview_sheet
+
+
+def _write(path, rows=10, start=0):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "销售"
+    sheet.append(["月份", "销售额", "销售额"])
+    for i in range(start, start + rows):
+        sheet.append([i, i * 100, None])
+    workbook.create_sheet("备注")
+    workbook.save(path)
+    return str(path)
+
+
+def _set_dimension(src, dst, ref):
+    """ 改写第一个工作表的 dimension 记录，ref 为 None 时删除记录 """
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, "w") as zout:
+        for item in zin.infolist():
+            data = zin.read(item.filename)
+            if item.filename == "xl/worksheets/sheet1.xml":
+                new = b"" if ref is None else b'<dimension ref="%s"/>' % ref.encode()
+                data = re.sub(rb'<dimension ref="[^"]*" ?/>', new, data)
+            zout.writestr(item, data)
+    return str(dst)
+
+
+def test_xlsx_preview_reads_the_head_and_the_dimension(tmp_path):
+    preview = preview_sheet(_write(tmp_path / "a.xlsx"), 0, 3)
+
+    assert preview.sheet_names == ("销售", "备注")
+    assert preview.columns == ("月份", "销售额", "销售额.1")
+    assert preview.rows == ((0, 0, None), (1, 100, None), (2, 200, None))
+    assert (preview.n_rows, preview.n_columns) == (10, 3)
+
+
+@pytest.mark.parametrize("ref", ["A1", None, "A1:C3"])
+def test_unreliable_dimension_is_not_reported(tmp_path, ref):
+    path = _set_dimension(_write(tmp_path / "a.xlsx"), tmp_path / "b.xlsx", ref)
+
+    preview = preview_sheet(path, 0, 3)
+
+    assert preview.columns == ("月份", "销售额", "销售额.1")
+    assert len(preview.rows) == 3
+    assert preview.n_rows is None and preview.n_columns is None
+    assert "共有" not in get_first_n_rows(path)
+
+
+def test_xlsx_cache_is_invalidated_when_the_file_changes(tmp_path):
+    path = _write(tmp_path / "a.xlsx")
+    assert preview_sheet(path, 0, 1).rows == ((0, 0, None),)
+
+    _write(path, rows=5, start=7)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    preview = preview_sheet(path, 0, 1)
+    assert preview.rows == ((7, 700, None),)
+    assert preview.n_rows == 5
+
+
+def test_other_formats_are_read_through_the_workbook_cache(tmp_path, monkeypatch):
+    # 没有 xls / ods 的读取库时，把 xlsx 当作非流式格式，走 pandas 的完整读取
+    monkeypatch.setattr(WorkbookPreview, "STREAMING_EXTENSIONS", ())
+    path = _write(tmp_path / "a.xlsx")
+
+    preview = preview_sheet(path, 0, 2)
+
+    assert preview.sheet_names == ("销售", "备注")
+    assert preview.columns == ("月份", "销售额", "销售额.1")
+    assert [row[:2] for row in preview.rows] == [(0, 0), (1, 100)]
+    assert (preview.n_rows, preview.n_columns) == (10, 3)
+
+    _write(path, rows=5, start=7)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert preview_sheet(path, 0, 1).rows[0][:2] == (7, 700)
+    workbook_cache.clear()